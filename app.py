@@ -1,36 +1,71 @@
+import time
+RUN_STARTED = time.perf_counter()
 import streamlit as st
-import streamlit.components.v1 as components
 import pandas as pd
-import altair as alt
+import numpy as np
 import json
 import os
-import time
 import io
 import re
 import glob
 import math
 import hashlib
 import textwrap
+import sqlite3
+import threading
+import atexit
+import copy
+import random
 from urllib.parse import quote, unquote
 from datetime import datetime
 from dataclasses import dataclass
+from collections import Counter
 import warnings
+import sys
+import importlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # 시스템 경고(Warning) 도스창 도배 차단
 warnings.filterwarnings('ignore')
 pd.options.mode.chained_assignment = None
 
-# Firebase Admin SDK 관련 임포트
+# 시트 파싱 프로세스 풀(spawn)의 워커도 파서 정의를 얻으려고 시작할 때 이 파일을 한 번 실행합니다.
+# 워커에서는 클라우드에 연결하지 않고 원장을 저장하지 않습니다. (엑셀 시트 병렬 파싱 섹션 참고)
+IN_POOL_WORKER = multiprocessing.parent_process() is not None
+
+# -----------------------------------------------------------------------------
+# 지연 임포트(Lazy import) & 성능 기록
+# - Firebase SDK, Altair, 엑셀 엔진(openpyxl), HTML 컴포넌트는 그것이 필요한 화면/작업에서만
+#   불러옵니다. HOME 과 조회 화면은 무거운 모듈 없이 먼저 그려집니다.
+# - 각 모듈을 처음 불러올 때 걸린 시간과 화면별 렌더링 시간은 사이드바 '성능 진단'에 표시됩니다.
+# -----------------------------------------------------------------------------
+# Firebase Admin SDK 설치 여부만 확인합니다. (실제 임포트는 get_firestore_client 에서)
 # - 회사 PC/로컬 실행에서는 Firebase 설정이 없는 경우가 많으므로 앱이 죽지 않도록 로컬 모드로 자동 전환
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    FIREBASE_AVAILABLE = True
-except ImportError:
-    firebase_admin = None
-    credentials = None
-    firestore = None
-    FIREBASE_AVAILABLE = False
+FIREBASE_AVAILABLE = importlib.util.find_spec("firebase_admin") is not None
+
+@st.cache_resource
+def get_perf_log():
+    """프로세스 공용 성능 기록. {"imports": {모듈: 초}, "renders": {화면: 초}}"""
+    return {"imports": {}, "renders": {}}
+
+def lazy_import(module_name):
+    """모듈을 처음 필요할 때 불러오고, 처음 불러온 시간을 기록합니다."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    get_perf_log()["imports"][module_name] = time.perf_counter() - start
+    return module
+
+def ensure_excel_engine():
+    """엑셀 읽기/쓰기 직전에 openpyxl 을 불러옵니다. (pandas 가 내부에서 쓰는 엔진)"""
+    return lazy_import("openpyxl")
+
+def record_render_time(page):
+    get_perf_log()["renders"][page] = time.perf_counter() - RUN_STARTED
 
 # -----------------------------------------------------------------------------
 # 1. 페이지 설정
@@ -192,75 +227,40 @@ def render_overview_quick_exec_card(category, q1_actual, h1_actual, conf):
     </div>
     """).strip()
 
-BUDGET_MAPPING = {
-    "101-01": ("인건비", "보수"), "101-03": ("인건비", "공무직(무기계약)근로자보수"), "101-04": ("인건비", "기간제근로자등보수"),
-    "107-03": ("퇴직급여", "퇴직급여"), "109-01": ("평가급및성과금등", "일반직평가급등"), "109-02": ("평가급및성과금등", "공무직(무기계약)근로자평가급등"),
-    "201-01": ("일반운영비", "사무관리비"), "201-02": ("일반운영비", "공공운영비"), "201-03": ("일반운영비", "행사운영비"),
-    "201-11": ("일반운영비", "지급수수료"), "201-12": ("일반운영비", "교육훈련비"), "201-13": ("일반운영비", "임차료"),
-    "201-14": ("일반운영비", "회의비"), "201-15": ("일반운영비", "복리후생비"), "201-21": ("일반운영비", "공공요금및제세"),
-    "202-01": ("여비", "국내여비"), "202-08": ("여비", "공무직(무기계약직)근로자등여비"),
-    "204-02": ("직무수행경비", "직급보조비"), "206-01": ("재료비", "일반재료비"), "207-02": ("연구개발비", "전산개발비"),
-    "214-05": ("수선유지교체비", "수선유지비"), "215": ("동력비", "동력비"),
-    "217-01": ("관서업무비", "정원가산업무비"), "217-02": ("관서업무비", "부서업무비"), "233": ("상품매입비", "상품매입비"),
-    "301-09": ("일반보전금", "행사실비지원금"), "304-01": ("연금부담금등", "연금부담금"),
-    "304-02": ("연금부담금등", "국민건강보험부담금등"), "304-03": ("연금부담금등", "공무직(무기계약)부담금관련"),
-    "304-05": ("연금부담금등", "기간제근로자부담금관련"), "802-11": ("반환금기타", "대행사업비반환금"),
-    "405-12": ("자산취득비", "수탁자산취득비")
-}
-
-
-ASSET_ACQUISITION_KEYWORDS = [
-    "수탁자산취득비", "자산취득비", "405-12", "조달구매", "조달수수료",
-    "자동심장충격기", "심장충격기", "AED", "포충기", "방화벽", "보안장비",
-    "DDOS", "디도스", "CCTV", "장비구매"
-]
-
+# -----------------------------------------------------------------------------
+# 분류 규칙 조회
+# - 예산과목 코드표, 자산취득 키워드, 일괄 지급건 귀속월 보정, 수동 반영분은 모두 규칙 파일(category_rules.json)에만 있고,
+#   여기서는 RULES(현재 규칙 묶음)를 거쳐 읽습니다. (규칙 파일 섹션 참고)
+# -----------------------------------------------------------------------------
 def is_asset_acquisition_text(*values):
     """적요/세목/예산과목 중 수탁자산취득비성 지출 여부를 판단합니다."""
-    text = " ".join([str(v) for v in values if v is not None]).replace(" ", "").upper()
-    if not text or text in ["NAN", "NAT", "NONE"]:
-        return False
-    return any(str(k).replace(" ", "").upper() in text for k in ASSET_ACQUISITION_KEYWORDS)
-
+    return RULES.is_asset_text(*values)
 
-def is_known_laundry_accrual_case(desc="", amount=0):
-    """2026년 세탁용역 1~2월분 일괄 지급건 판정.
 
-    실제 지급은 3월 4,781,810원이지만 항목별 분석에서는
-    1월 1,908,830원 / 2월 2,872,980원으로 귀속 반영합니다.
-    문서제목에 세탁이라는 단어가 누락되어도 금액 기준으로 잡습니다.
-    """
+def forced_category_for_amount(amount, rules=None):
+    """규칙 파일 accruals 의 금액과 같은 지급건이면 그 관리항목. (문서제목과 무관하게 금액으로 판정)"""
     try:
         amt = int(round(float(clean_numeric(amount))))
     except Exception:
         amt = 0
-    text = str(desc).replace(" ", "")
-    return amt == 4781810 or ("세탁" in text and amt == 4781810)
+    return (rules or RULES).forced_amount_categories.get(amt)
 
 def force_mapped_category_for_known_cases(desc, row_cat="", budget_subj="", amount=0):
     """예산과목/세목이 비어 있거나 엑셀 양식이 달라도 반드시 잡아야 하는 예외 분류."""
-    if is_known_laundry_accrual_case(desc, amount):
-        return "세탁용역"
+    forced = forced_category_for_amount(amount)
+    if forced:
+        return forced
     if is_asset_acquisition_text(desc, row_cat, budget_subj):
         return "수탁자산취득비"
     return None
 
 
-# [V11] 수탁자산취득비 수동 반영 데이터
-# 이 항목은 사용자가 제공한 지출일자/적요/지급명령금액 기준으로
+# [V11] 수탁자산취득비 수동 반영분 (규칙 파일 manual_asset_rows)
+# 사용자가 제공한 지출일자/적요/지급명령금액 기준으로
 # 일상경비 동기화 업로드 여부와 무관하게 항목별 지출 분석에 반영합니다.
-MANUAL_ASSET_ACQUISITION_ROWS = [
-    {"집행일자": "2026-02-25", "적요": "정약용 펀그라운드 자동심장충격기 조달구매_조달수수료", "집행금액": 1990690, "세목": "수탁자산취득비", "예산과목": "수탁자산취득비", "업로드구분": "수동입력_수탁자산취득비"},
-    {"집행일자": "2026-03-31", "적요": "정약용 펀그라운드 포충기 조달구매", "집행금액": 967180, "세목": "수탁자산취득비", "예산과목": "수탁자산취득비", "업로드구분": "수동입력_수탁자산취득비"},
-    {"집행일자": "2026-04-14", "적요": "나라장터 이용수수료(2026년 정약용 펀그라운드 조달구매)", "집행금액": 20000, "세목": "수탁자산취득비", "예산과목": "수탁자산취득비", "업로드구분": "수동입력_수탁자산취득비"},
-    {"집행일자": "2026-04-16", "적요": "남양주도시공사 차세대 방화벽 조달구매_정편", "집행금액": 1094000, "세목": "수탁자산취득비", "예산과목": "수탁자산취득비", "업로드구분": "수동입력_수탁자산취득비"},
-    {"집행일자": "2026-04-20", "적요": "남양주도시공사 웹 방화벽 조달구매_정편", "집행금액": 1509000, "세목": "수탁자산취득비", "예산과목": "수탁자산취득비", "업로드구분": "수동입력_수탁자산취득비"},
-    {"집행일자": "2026-04-24", "적요": "남양주도시공사 DDoS 보안장비 조달구매_정편", "집행금액": 1841000, "세목": "수탁자산취득비", "예산과목": "수탁자산취득비", "업로드구분": "수동입력_수탁자산취득비"},
-]
-
-def get_manual_asset_monthly_sums():
+def manual_monthly_sums(rows):
     monthly = {}
-    for row in MANUAL_ASSET_ACQUISITION_ROWS:
+    for row in rows:
         try:
             month = int(str(row.get("집행일자", ""))[5:7])
             amount = float(clean_numeric(row.get("집행금액", 0)))
@@ -270,6 +270,9 @@ def get_manual_asset_monthly_sums():
             monthly[month] = monthly.get(month, 0.0) + amount
     return monthly
 
+def get_manual_asset_monthly_sums():
+    return dict(RULES.manual_asset_monthly)
+
 def add_manual_asset_to_sums_map(sums_map):
     if 2026 not in sums_map:
         sums_map[2026] = {}
@@ -279,25 +282,12 @@ def add_manual_asset_to_sums_map(sums_map):
         sums_map[2026]["수탁자산취득비"][month] = sums_map[2026]["수탁자산취득비"].get(month, 0.0) + amount
     return sums_map
 
-# [V12] 세탁용역 귀속월 수동 반영 데이터
+# [V12] 세탁용역 귀속월 수동 반영분 (규칙 파일 manual_laundry_rows)
 # 실제 지급은 3월 4,781,810원이지만, 항목별 지출 분석에서는
 # 1월 1,908,830원 / 2월 2,872,980원으로 귀속월 기준 반영합니다.
-MANUAL_LAUNDRY_ACCRUAL_ROWS = [
-    {"집행일자": "2026-01-01", "적요": "세탁용역 1월분 (3월 일괄 지급 4,781,810원 중 귀속월 보정)", "집행금액": 1908830, "세목": "세탁용역", "예산과목": "세탁용역", "업로드구분": "수동입력_세탁용역귀속"},
-    {"집행일자": "2026-02-01", "적요": "세탁용역 2월분 (3월 일괄 지급 4,781,810원 중 귀속월 보정)", "집행금액": 2872980, "세목": "세탁용역", "예산과목": "세탁용역", "업로드구분": "수동입력_세탁용역귀속"},
-]
-
+# 같은 금액의 지급건은 accruals 규칙으로 문서제목과 무관하게 세탁용역으로 분류하고 귀속월로 나눕니다.
 def get_manual_laundry_monthly_sums():
-    monthly = {}
-    for row in MANUAL_LAUNDRY_ACCRUAL_ROWS:
-        try:
-            month = int(str(row.get("집행일자", ""))[5:7])
-            amount = float(clean_numeric(row.get("집행금액", 0)))
-        except Exception:
-            continue
-        if 1 <= month <= 12:
-            monthly[month] = monthly.get(month, 0.0) + amount
-    return monthly
+    return dict(RULES.manual_laundry_monthly)
 
 def add_manual_laundry_to_sums_map(sums_map):
     if 2026 not in sums_map:
@@ -311,12 +301,10 @@ def add_manual_laundry_to_sums_map(sums_map):
         sums_map[2026]["세탁용역"][month] = max(float(current), float(amount))
     return sums_map
 
-def apply_manual_laundry_to_master_data(data):
-    """세탁용역 1~2월 귀속월 보정분을 master records에 반영합니다."""
-    data = ensure_data_integrity(data)
-    manual_sums = get_manual_laundry_monthly_sums()
+def raise_to_manual_sums(data, category, manual_sums):
+    """2026년 category 셀이 수동 반영분(월별 합계)보다 작으면 수동 반영분으로 올립니다. (누락 셀 보충은 하지 않음)"""
     for r in data.get("records", []):
-        if r.get("year") == 2026 and r.get("category") == "세탁용역" and r.get("month") in manual_sums:
+        if r.get("year") == 2026 and r.get("category") == category and r.get("month") in manual_sums:
             manual = float(manual_sums[r.get("month")])
             current = float(clean_numeric(r.get("amount", 0)))
             if current < manual:
@@ -324,21 +312,6 @@ def apply_manual_laundry_to_master_data(data):
                 r["status"] = "지출"
     return data
 
-def apply_manual_asset_to_master_data(data):
-    """수동 수탁자산취득비를 master records에 반영합니다.
-    저장 데이터가 0원이어도 화면과 신속집행 대시보드에서 즉시 보이도록 보정합니다.
-    """
-    data = ensure_data_integrity(data)
-    manual_sums = get_manual_asset_monthly_sums()
-    for r in data.get("records", []):
-        if r.get("year") == 2026 and r.get("category") == "수탁자산취득비" and r.get("month") in manual_sums:
-            current = float(clean_numeric(r.get("amount", 0)))
-            manual = float(manual_sums[r.get("month")])
-            if current < manual:
-                r["amount"] = manual
-                r["status"] = "지출"
-    return data
-
 # 2024~2025 유실 데이터 영구 복구용 내장 데이터
 HISTORICAL_DATA = {
     2024: {
@@ -359,45 +332,835 @@ HISTORICAL_DATA = {
 # -----------------------------------------------------------------------------
 # 3. Firebase 서비스 초기화 (Quota 방어 포함)
 # -----------------------------------------------------------------------------
-if 'quota_exceeded' not in st.session_state:
-    st.session_state['quota_exceeded'] = False
-
-if FIREBASE_AVAILABLE:
+# - Firebase 설정(secrets)이 없으면 SDK 를 아예 불러오지 않고 로컬 저장소 모드로 실행합니다.
+# - 클라이언트와 문서 참조는 서버 프로세스당 한 번만 만듭니다.
+@st.cache_resource
+def get_firestore_client():
+    if not FIREBASE_AVAILABLE or IN_POOL_WORKER:
+        return None
     try:
-        firebase_admin.get_app()
-    except ValueError:
-        try:
-            if "firebase" in st.secrets:
-                fb_creds = dict(st.secrets["firebase"])
-                if "private_key" in fb_creds:
-                    fb_creds["private_key"] = fb_creds["private_key"].replace("\\n", "\n")
-                cred = credentials.Certificate(fb_creds)
-                firebase_admin.initialize_app(cred)
-        except Exception:
-            # secrets 미설정/인증 실패 시 로컬 JSON 저장 모드로 계속 실행
-            pass
+        has_secrets = "firebase" in st.secrets
+    except Exception:
+        has_secrets = False
+    preloaded = sys.modules.get("firebase_admin")
+    if not has_secrets and not (preloaded and preloaded._apps):
+        return None
+    try:
+        firebase_admin = lazy_import("firebase_admin")
+        firestore = lazy_import("firebase_admin.firestore")
+        if not firebase_admin._apps:
+            fb_creds = dict(st.secrets["firebase"])
+            if "private_key" in fb_creds:
+                fb_creds["private_key"] = fb_creds["private_key"].replace("\\n", "\n")
+            firebase_admin.initialize_app(lazy_import("firebase_admin.credentials").Certificate(fb_creds))
+        return firestore.client()
+    except Exception:
+        # secrets 미설정/인증 실패 시 로컬 저장소(SQLite) 모드로 계속 실행
+        return None
+
+@st.cache_resource
+def get_cloud_refs(_db, app_id):
+    base = _db.collection('artifacts').document(app_id).collection('public').document('data')
+    facility = base.collection('facility_data')
+    return (
+        facility.document('master'),
+        facility.document('daily_expenses'),
+        facility.document('rapid_monthly_v3'),
+        base.collection('quantitative_monthly'),
+    )
 
-db = firestore.client() if (FIREBASE_AVAILABLE and firebase_admin and firebase_admin._apps) else None
+db = get_firestore_client()
 try:
     appId = st.secrets.get("app_id", "facility-ledger-2026-v1")
 except Exception:
     appId = "facility-ledger-2026-v1"
 
-doc_ref = db.collection('artifacts').document(appId).collection('public').document('data').collection('facility_data').document('master') if db else None
-daily_ref = db.collection('artifacts').document(appId).collection('public').document('data').collection('facility_data').document('daily_expenses') if db else None
-rapid_monthly_ref = db.collection('artifacts').document(appId).collection('public').document('data').collection('facility_data').document('rapid_monthly_v3') if db else None
-quant_base_ref = db.collection('artifacts').document(appId).collection('public').document('data').collection('quantitative_monthly') if db else None
+doc_ref, daily_ref, rapid_monthly_ref, quant_base_ref = get_cloud_refs(db, appId) if db else (None, None, None, None)
 
 # -----------------------------------------------------------------------------
-# 4. Quota Exceeded (429) & Timeout 방어 엔진
+# 4. Firestore 회로 차단기 & 일일 Quota 예산
+# - 모든 Firestore 호출은 cloud_call() 을 거치며, 차단기는 서버 프로세스 전체가 공유합니다.
+# - Quota 초과(429)가 오거나 일시 장애(timeout 등)가 연속되면 차단(open)하고,
+#   점점 늘어나는 대기 시간(+무작위 편차)이 지나면 1건만 시험 호출(half-open)합니다.
+#   시험 호출이 성공하면 자동으로 클라우드 모드로 돌아옵니다.
+# - 하루 읽기/쓰기 건수를 로컬 저장소에 누적해, 무료 한도에 가까워지면 미리 로컬 모드로 전환합니다.
+#   (Firestore 무료 한도는 미국 태평양 시간 자정 = 한국 시간 오후 4~5시에 초기화)
 # -----------------------------------------------------------------------------
-def check_quota_error(e):
+BREAKER_FAILURE_THRESHOLD = 3      # 일시 장애가 이 횟수만큼 연속되면 차단
+BREAKER_BASE_SECONDS = 5.0
+BREAKER_MAX_SECONDS = 900.0
+DAILY_READ_BUDGET = 45000          # 무료 한도 50,000 읽기/일에서 여유분을 남긴 값
+DAILY_WRITE_BUDGET = 18000         # 무료 한도 20,000 쓰기/일 (삭제 포함)
+BUDGET_PERSIST_SECONDS = 10.0
+BUDGET_RECHECK_SECONDS = 300.0
+
+QUOTA_ERROR_MARKERS = ("quota exceeded", "resource_exhausted", "resource exhausted", "429")
+TRANSIENT_ERROR_MARKERS = ("timeout", "timed out", "deadline", "unavailable", "503")
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    QUOTA_TZ = None
+
+class CloudUnavailable(Exception):
+    """차단 중이거나 오늘 예산을 다 써서 클라우드 호출을 건너뛸 때 발생합니다."""
+
+def classify_cloud_error(e):
     err_str = str(e).lower()
-    if "quota exceeded" in err_str or "429" in err_str or "timeout" in err_str:
-        st.session_state['quota_exceeded'] = True
-        st.toast("🚨 Firebase 일일 무료 용량 소진! 앱 멈춤을 방지하기 위해 로컬 백업 모드로 전환되었습니다.", icon="⚠️")
+    if any(k in err_str for k in QUOTA_ERROR_MARKERS): return "quota"
+    if any(k in err_str for k in TRANSIENT_ERROR_MARKERS): return "transient"
+    return None
+
+def quota_day():
+    return datetime.now(QUOTA_TZ).strftime("%Y-%m-%d") if QUOTA_TZ else datetime.now().strftime("%Y-%m-%d")
+
+class CloudCircuitBreaker:
+    """프로세스 공용 Firestore 회로 차단기. closed → open → half_open → closed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opens = 0
+        self.trips = 0
+        self.recoveries = 0
+        self.open_until = 0.0
+        self.last_error = None
+        self.last_kind = None
+        self._probing = False
+        self._store = None
+        self._usage = {"day": quota_day(), "reads": 0, "writes": 0}
+        self._persisted_at = 0.0
+        atexit.register(self.persist_usage)
+
+    # --- 일일 사용량 예산 ------------------------------------------------------
+    def bind_store(self, store):
+        """사용량을 보관할 로컬 저장소를 연결하고, 오늘 누적값을 불러옵니다."""
+        with self._lock:
+            if self._store is not None:
+                return
+            self._store = store
+            try:
+                saved = json.loads(store.get_meta("cloud_budget") or "null")
+                if isinstance(saved, dict) and saved.get("day") == self._usage["day"]:
+                    self._usage["reads"] += int(saved.get("reads", 0))
+                    self._usage["writes"] += int(saved.get("writes", 0))
+            except Exception: pass
+
+    def _usage_today(self):
+        day = quota_day()
+        if self._usage["day"] != day:
+            self._usage = {"day": day, "reads": 0, "writes": 0}
+        return self._usage
+
+    def _over_budget(self, reads=0, writes=0):
+        usage = self._usage_today()
+        return usage["reads"] + reads > DAILY_READ_BUDGET or usage["writes"] + writes > DAILY_WRITE_BUDGET
+
+    def persist_usage(self):
+        with self._lock:
+            store, usage = self._store, dict(self._usage_today())
+            self._persisted_at = time.monotonic()
+        if store is None:
+            return
+        try: store.set_meta("cloud_budget", json.dumps(usage))
+        except Exception: pass
+
+    # --- 차단 상태 ---------------------------------------------------------------
+    def allow(self, reads=0, writes=0):
+        """이번 호출을 클라우드로 보내도 되는지 판단합니다. half-open 에서는 시험 호출 1건만 통과."""
+        with self._lock:
+            if self._over_budget(reads, writes):
+                return False
+            if self.state == "open" and time.monotonic() >= self.open_until:
+                self.state, self._probing = "half_open", False
+            if self.state == "half_open":
+                if self._probing:
+                    return False
+                self._probing = True
+            return self.state != "open"
+
+    def next_attempt_at(self):
+        """클라우드 호출을 다시 시도해 볼 수 있는 시각 (time.monotonic 기준)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._over_budget():
+                return now + BUDGET_RECHECK_SECONDS
+            if self.state == "open":
+                return max(now, self.open_until)
+            if self.state == "half_open" and self._probing:
+                return now + 1.0
+            return now
+
+    def record_success(self, reads=0, writes=0):
+        with self._lock:
+            usage = self._usage_today()
+            usage["reads"] += reads
+            usage["writes"] += writes
+            if self.state != "closed": self.recoveries += 1
+            self.state, self._probing = "closed", False
+            self.failures = self.opens = 0
+            persist = time.monotonic() - self._persisted_at >= BUDGET_PERSIST_SECONDS
+        if persist:
+            self.persist_usage()
+
+    def record_failure(self, e):
+        kind = classify_cloud_error(e)
+        with self._lock:
+            self.last_error, self._probing = e, False
+            if kind is None:
+                # 권한/데이터 오류 등은 서비스가 응답한 것이므로 차단하지 않습니다.
+                if self.state == "half_open":
+                    self.state = "closed"
+                    self.recoveries += 1
+                return kind
+            self.failures += 1
+            if kind == "quota" or self.state == "half_open" or self.failures >= BREAKER_FAILURE_THRESHOLD:
+                delay = min(BREAKER_MAX_SECONDS, BREAKER_BASE_SECONDS * (2 ** self.opens))
+                self.open_until = time.monotonic() + delay * random.uniform(0.5, 1.0)
+                self.state, self.last_kind = "open", kind
+                self.opens += 1
+                self.trips += 1
+        return kind
+
+    def call(self, fn, reads=0, writes=0):
+        if not self.allow(reads, writes):
+            raise CloudUnavailable("cloud circuit open or daily budget exhausted")
+        try:
+            result = fn()
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(reads, writes)
+        return result
+
+    def status(self):
+        with self._lock:
+            usage = self._usage_today()
+            return {
+                "state": self.state,
+                "kind": self.last_kind,
+                "retry_in": max(0.0, self.open_until - time.monotonic()),
+                "reads": usage["reads"],
+                "writes": usage["writes"],
+                "over_budget": self._over_budget(),
+            }
+
+@st.cache_resource
+def get_cloud_breaker():
+    return CloudCircuitBreaker()
+
+cloud_breaker = get_cloud_breaker()
+
+def cloud_call(fn, reads=0, writes=0):
+    """Firestore 호출을 회로 차단기로 감쌉니다. 차단 중이면 CloudUnavailable."""
+    return cloud_breaker.call(fn, reads=reads, writes=writes)
+
+def cloud_offline():
+    status = cloud_breaker.status()
+    return status["state"] == "open" or status["over_budget"]
+
+def probe_cloud():
+    """차단 대기 시간이 지났는데 다른 호출이 없으면 가벼운 읽기 1건으로 복구 여부를 확인합니다."""
+    status = cloud_breaker.status()
+    if doc_ref is None or status["state"] == "closed" or status["retry_in"] > 0 or status["over_budget"]:
+        return
+    try: cloud_call(lambda: doc_ref.get(timeout=3.0), reads=1)
+    except Exception: pass
+
+def check_quota_error(e):
+    """클라우드 호출 실패를 현재 세션에 알립니다. (차단 여부는 회로 차단기가 결정)"""
+    kind = classify_cloud_error(e)
+    if kind and cloud_breaker.trips != st.session_state.get('cloud_trip_seen', 0):
+        st.session_state['cloud_trip_seen'] = cloud_breaker.trips
+        if kind == "quota":
+            st.toast("🚨 Firebase 일일 무료 용량 소진! 복구될 때까지 로컬 저장소로 작업합니다.", icon="⚠️")
+        else:
+            st.toast("⚠️ 클라우드 응답 지연으로 잠시 로컬 저장소로 작업합니다. 복구되면 자동으로 다시 연결됩니다.", icon="⚠️")
         return True
-    return False
+    return bool(kind)
+
+# -----------------------------------------------------------------------------
+# 5. 클라우드 지연 쓰기(Write-behind) 큐
+# - save_* 함수는 로컬 저장 후 클라우드 쓰기를 큐에 넣고 바로 반환합니다.
+# - 같은 문서에 대한 연속 쓰기는 짧은 대기 시간 안에서 1건으로 합쳐지고,
+#   백그라운드 스레드가 여러 문서를 한 번의 batch commit 으로 기록합니다.
+# - 실패한 쓰기는 점점 늘어나는 간격으로 재시도하고, 회로 차단 중에는 복구 시점까지 보류합니다.
+#   여러 문서 batch 가 실패하면 한 건씩 다시 기록해, 실패한 문서만 재시도합니다. (한 건의 영구 오류가 나머지를 막지 않도록)
+# - WRITE_MAX_ATTEMPTS 번 실패한 쓰기는 재시도를 멈추고 dead_letters 로 옮겨 사이드바에 알립니다. (로컬 저장은 이미 끝난 상태)
+# - 대기 중인 쓰기는 로컬 저장소 cloud_outbox 표에도 적어 두어, 차단 중에 서버가 재시작되어도 다음 실행에서 이어서 기록합니다.
+# -----------------------------------------------------------------------------
+WRITE_COALESCE_SECONDS = 0.8
+WRITE_MAX_DELAY_SECONDS = 3.0
+WRITE_RETRY_MAX_SECONDS = 60.0
+WRITE_MAX_ATTEMPTS = 8
+WRITE_DEAD_LETTER_KEEP = 50
+
+def _apply_field_updates(payload, updates):
+    """set 대기 문서에 뒤따른 update(field path)를 미리 반영합니다."""
+    from google.cloud.firestore_v1.field_path import FieldPath
+    merged = copy.deepcopy(payload)
+    for path, value in updates.items():
+        parts = FieldPath.from_api_repr(path).parts
+        cur = merged
+        for part in parts[:-1]:
+            if not isinstance(cur.get(part), dict):
+                cur[part] = {}
+            cur = cur[part]
+        cur[parts[-1]] = value
+    return merged
+
+def _coalesce_write(old_op, new_op):
+    """같은 문서에 대한 두 쓰기를 순서대로 적용한 것과 같은 1건으로 합칩니다."""
+    if old_op is None or new_op[0] in ("set", "delete"):
+        return new_op
+    if old_op[0] == "update":
+        return ("update", {**old_op[1], **new_op[1]})
+    if old_op[0] == "set":
+        return ("set", _apply_field_updates(old_op[1], new_op[1]))
+    # 삭제된 문서에 대한 update 는 어차피 실패하므로 삭제를 유지합니다.
+    return old_op
+
+class CloudWriteQueue:
+    """프로세스 공용 Firestore 지연 쓰기 큐."""
+
+    def __init__(self, client, breaker, coalesce_seconds=WRITE_COALESCE_SECONDS, max_delay_seconds=WRITE_MAX_DELAY_SECONDS,
+                 max_attempts=WRITE_MAX_ATTEMPTS, retry_max_seconds=WRITE_RETRY_MAX_SECONDS):
+        self.client = client
+        self.breaker = breaker
+        self.coalesce_seconds = coalesce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.max_attempts = max_attempts
+        self.retry_max_seconds = retry_max_seconds
+        self.last_error = None
+        self.error_seq = 0
+        self.written = 0
+        self.dead_letters = []  # 재시도를 멈춘 최근 쓰기 [{"path", "kind", "attempts", "error", "at"}]
+        self.dead_count = 0
+        self._store = None
+        self._cond = threading.Condition()
+        self._pending = {}   # 문서 경로 -> {"ref", "op", "due", "first", "attempts"}
+        self._inflight = set()
+        self._thread = threading.Thread(target=self._run, name="cloud-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.drain, 5.0)
+
+    def bind_store(self, store):
+        """대기 쓰기를 보관할 로컬 저장소를 연결하고, 지난 실행에서 남은 쓰기를 다시 넣습니다."""
+        with self._cond:
+            if self._store is not None:
+                return
+            self._store = store
+            now = time.monotonic()
+            for path, kind, payload, attempts in store.load_outbox():
+                entry = {"ref": self.client.document(path), "op": (kind, payload), "first": now, "due": now, "attempts": attempts}
+                newer = self._pending.get(path)
+                if newer is not None:
+                    newer["op"] = _coalesce_write(entry["op"], newer["op"])
+                else:
+                    self._pending[path] = entry
+            self._persist(self._pending.values())
+            self._cond.notify_all()
+
+    def _persist(self, entries):
+        """대기 쓰기를 로컬 저장소 cloud_outbox 에 적습니다. (호출자가 self._cond 를 잡고 있어야 함)"""
+        if self._store is None:
+            return
+        try: self._store.put_outbox([(e["ref"].path, e["op"][0], e["op"][1], e["attempts"]) for e in entries])
+        except Exception: pass
+
+    def _forget(self, paths):
+        """기록을 끝냈거나 포기한 문서를 cloud_outbox 에서 지웁니다. 그 사이 새 쓰기가 들어온 문서는 남깁니다."""
+        if self._store is None:
+            return
+        paths = [p for p in paths if p not in self._pending]
+        try: self._store.drop_outbox(paths)
+        except Exception: pass
+
+    def enqueue(self, ref, kind, payload=None):
+        self.enqueue_many([(ref, kind, payload)])
+
+    def enqueue_many(self, writes):
+        """여러 문서 쓰기를 같은 시점에 넣어 한 batch 로 기록되게 합니다."""
+        now = time.monotonic()
+        with self._cond:
+            due = now + self.coalesce_seconds
+            entries = []
+            for ref, kind, payload in writes:
+                entry = self._pending.get(ref.path)
+                if entry is None:
+                    entry = {"ref": ref, "op": None, "first": now, "attempts": 0}
+                    self._pending[ref.path] = entry
+                entry["ref"] = ref
+                entry["op"] = _coalesce_write(entry["op"], (kind, payload))
+                entries.append(entry)
+                due = min(due, entry["first"] + self.max_delay_seconds)
+            for entry in entries:
+                entry["due"] = due
+            self._persist(entries)
+            self._cond.notify_all()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending) + len(self._inflight)
+
+    def flush(self, paths=None):
+        """대기 중인 쓰기를 즉시 처리하도록 예약합니다. (완료를 기다리지 않음)"""
+        now = time.monotonic()
+        with self._cond:
+            for path, entry in self._pending.items():
+                if paths is None or path in paths:
+                    entry["due"] = now
+            self._cond.notify_all()
+
+    def drain(self, timeout=10.0, paths=None):
+        """대기 중인 쓰기를 즉시 처리하고 끝날 때까지 기다립니다. 모두 끝나면 True."""
+        self.flush(paths)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                busy = [p for p in list(self._pending) + list(self._inflight) if paths is None or p in paths]
+                if not busy:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.2))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [p for p, e in self._pending.items() if e["due"] <= now]
+                    if due:
+                        break
+                    next_due = min((e["due"] for e in self._pending.values()), default=None)
+                    self._cond.wait(None if next_due is None else max(next_due - now, 0.01))
+                batch = [self._pending.pop(p) for p in due[:400]]
+                self._inflight.update(e["ref"].path for e in batch)
+            failures = self._write(batch)
+            with self._cond:
+                self._inflight.difference_update(e["ref"].path for e in batch)
+                failed = {id(entry) for entry, _ in failures}
+                self._forget([e["ref"].path for e in batch if id(e) not in failed])
+                for entry, error in failures:
+                    if isinstance(error, CloudUnavailable):
+                        self._requeue(entry, self.breaker.next_attempt_at())
+                    else:
+                        self.last_error = error
+                        self.error_seq += 1
+                        self._requeue(entry, error=error)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        """batch 를 기록하고 실패한 [(entry, 오류)] 를 돌려줍니다.
+        여러 문서 batch 가 차단·Quota·일시 장애가 아닌 오류로 실패하면 한 건씩 다시 기록해 실패한 문서만 가려냅니다.
+        """
+        try:
+            self.breaker.call(lambda: self._commit(batch), writes=len(batch))
+        except Exception as e:
+            if len(batch) == 1 or isinstance(e, CloudUnavailable) or classify_cloud_error(e):
+                return [(entry, e) for entry in batch]
+        else:
+            self.written += len(batch)
+            return []
+        failures = []
+        for entry in batch:
+            failures += self._write([entry])
+        return failures
+
+    def _requeue(self, entry, resume_at=None, error=None):
+        """실패한 쓰기를 다시 넣습니다. resume_at 이 있으면(회로 차단) 재시도 횟수를 늘리지 않고 그때까지 보류.
+        재시도 한도에 닿은 쓰기는 dead_letters 로 옮기고 다시 넣지 않습니다. (같은 문서의 더 새 쓰기는 그대로 진행)
+        """
+        if resume_at is None:
+            entry["attempts"] += 1
+        path = entry["ref"].path
+        newer = self._pending.get(path)
+        if entry["attempts"] >= self.max_attempts:
+            self.dead_letters.append({"path": path, "kind": entry["op"][0], "attempts": entry["attempts"],
+                                      "error": f"{type(error).__name__}: {error}", "at": datetime.now()})
+            del self.dead_letters[:-WRITE_DEAD_LETTER_KEEP]
+            self.dead_count += 1
+            self._forget([path])
+            return
+        if newer is not None:
+            newer["op"] = _coalesce_write(entry["op"], newer["op"])
+            newer["attempts"] = entry["attempts"]
+            if resume_at is not None:
+                newer["due"] = max(newer["due"], resume_at)
+            self._persist([newer])
+            return
+        entry["first"] = time.monotonic()
+        entry["due"] = resume_at if resume_at is not None else entry["first"] + min(self.retry_max_seconds, 2.0 ** entry["attempts"])
+        self._pending[path] = entry
+        self._persist([entry])
+
+    def _commit(self, entries):
+        if len(entries) == 1:
+            (kind, payload), ref = entries[0]["op"], entries[0]["ref"]
+            if kind == "set": ref.set(payload, timeout=4.0)
+            elif kind == "update": ref.update(payload, timeout=4.0)
+            else: ref.delete(timeout=4.0)
+            return
+        batch = self.client.batch()
+        for entry in entries:
+            kind, payload = entry["op"]
+            if kind == "set": batch.set(entry["ref"], payload)
+            elif kind == "update": batch.update(entry["ref"], payload)
+            else: batch.delete(entry["ref"])
+        batch.commit(timeout=6.0)
+
+@st.cache_resource
+def get_cloud_write_queue(_client, _breaker):
+    return CloudWriteQueue(_client, _breaker)
+
+cloud_write_queue = get_cloud_write_queue(db, cloud_breaker) if db else None
+
+def queue_cloud_write(ref, kind, payload=None):
+    """클라우드 쓰기를 큐에 넣습니다. 큐가 없으면(로컬 모드) False."""
+    if cloud_write_queue is None or ref is None:
+        return False
+    cloud_write_queue.enqueue(ref, kind, payload)
+    return True
+
+def queue_cloud_writes(writes):
+    """[(ref, kind, payload), ...] 를 한 batch 로 묶어 큐에 넣습니다."""
+    if cloud_write_queue is None:
+        return False
+    if writes:
+        cloud_write_queue.enqueue_many(writes)
+    return True
+
+def wait_cloud_writes(*refs, timeout=3.0):
+    """클라우드에서 다시 읽기 전에 해당 문서의 대기 중인 쓰기를 먼저 처리합니다.
+    차단 중이라 밀린 쓰기가 남아 있으면 False (클라우드 값이 로컬보다 오래됐으므로 읽지 않음).
+    """
+    if cloud_write_queue is None:
+        return True
+    return cloud_write_queue.drain(timeout=0.0 if cloud_offline() else timeout, paths={r.path for r in refs if r is not None})
+
+def report_cloud_write_errors():
+    """백그라운드 쓰기 실패를 현재 세션에 알립니다. (스레드에서는 UI 를 쓸 수 없음)"""
+    if cloud_write_queue is None:
+        return
+    if 'cloud_write_error_seen' not in st.session_state:
+        st.session_state['cloud_write_error_seen'] = cloud_write_queue.error_seq
+    if cloud_write_queue.error_seq != st.session_state['cloud_write_error_seen']:
+        st.session_state['cloud_write_error_seen'] = cloud_write_queue.error_seq
+        check_quota_error(cloud_write_queue.last_error)
+    dead_seen = st.session_state.setdefault('cloud_write_dead_seen', 0)
+    if cloud_write_queue.dead_count != dead_seen:
+        st.session_state['cloud_write_dead_seen'] = cloud_write_queue.dead_count
+        st.toast(f"🚨 클라우드에 기록하지 못한 쓰기 {cloud_write_queue.dead_count - dead_seen}건의 재시도를 멈췄습니다. 로컬에는 저장되어 있습니다. ({cloud_write_queue.last_error})", icon="⚠️")
+
+# -----------------------------------------------------------------------------
+# 5-1. 로컬 저장소 (SQLite WAL)
+# - local_master.json / local_daily.json / local_rapid.json / local_quant_*.json 을
+#   하나의 SQLite 파일로 대체합니다. WAL 모드라 여러 세션이 읽는 동안 한 세션이 쓸 수 있습니다.
+# - 기존 JSON 파일이 있으면 최초 1회 자동으로 가져옵니다. (원본 파일은 그대로 둠)
+# -----------------------------------------------------------------------------
+LOCAL_DB_PATH = "local_store.db"
+
+LOCAL_DB_SCHEMA = [
+    # v1
+    """
+    CREATE TABLE IF NOT EXISTS ledger_cells (
+        year INTEGER NOT NULL, month INTEGER NOT NULL, category TEXT NOT NULL,
+        amount REAL NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT '미지출',
+        PRIMARY KEY (year, month, category)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS daily_expenses (
+        pos INTEGER PRIMARY KEY, exec_date TEXT, semok TEXT, amount REAL, data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_daily_exec_date ON daily_expenses (exec_date);
+    CREATE TABLE IF NOT EXISTS rapid_plan (
+        pos INTEGER PRIMARY KEY, semok TEXT, month_label TEXT, data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS quant_rows (
+        year INTEGER NOT NULL, month INTEGER NOT NULL, pos INTEGER NOT NULL, data TEXT NOT NULL,
+        PRIMARY KEY (year, month, pos)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT);
+    """,
+    # v2: 일상경비를 행 키(병합 키 + 같은 키 안의 순번)로 보관해 바뀐 행만 고쳐 씁니다.
+    #     옛 표의 행은 _copy_daily_v1 이 새 표로 옮깁니다.
+    """
+    ALTER TABLE daily_expenses RENAME TO daily_expenses_v1;
+    DROP INDEX IF EXISTS idx_daily_exec_date;
+    CREATE TABLE daily_expenses (
+        row_key TEXT PRIMARY KEY, seq INTEGER NOT NULL, exec_date TEXT, semok TEXT, amount REAL,
+        digest TEXT NOT NULL, data TEXT NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_daily_order ON daily_expenses (exec_date DESC, seq);
+    """,
+    # v3: 클라우드로 아직 보내지 못한 쓰기 (CloudWriteQueue 가 재시작 뒤 이어서 기록)
+    """
+    CREATE TABLE IF NOT EXISTS cloud_outbox (
+        path TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT, attempts INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    """,
+]
+
+def daily_store_keys(rows):
+    """일상경비 행마다 저장 키를 만듭니다. 같은 병합 키가 여러 번 나오면 순번(#0, #1, ...)으로 구분합니다."""
+    seen = Counter()
+    keys = []
+    for r in rows:
+        k = expense_merge_key(r)
+        keys.append(f"{k}#{seen[k]}")
+        seen[k] += 1
+    return keys
+
+class LocalStore:
+    """오프라인/Quota 대비 로컬 저장소. 스레드마다 별도 연결을 사용합니다."""
+
+    def __init__(self, path=LOCAL_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        version = self.conn().execute("PRAGMA user_version").fetchone()[0]
+        if version < len(LOCAL_DB_SCHEMA):
+            self.write(lambda conn: self._migrate(conn, version))
+
+    def _migrate(self, conn, version):
+        """스키마 변경, 자료 옮기기, user_version 갱신을 한 트랜잭션에서 처리합니다.
+        (중간에 실패하면 모두 되돌리고 다음 실행 때 처음부터 다시 시도합니다)"""
+        for script in LOCAL_DB_SCHEMA[version:]:
+            for stmt in script.split(";"):
+                if stmt.strip():
+                    conn.execute(stmt)
+        if version < 2:
+            self._copy_daily_v1(conn)
+        if version < 1:
+            self._import_legacy_json()
+        conn.execute(f"PRAGMA user_version = {len(LOCAL_DB_SCHEMA)}")
+
+    def _copy_daily_v1(self, conn):
+        rows = [json.loads(d) for (d,) in conn.execute("SELECT data FROM daily_expenses_v1 ORDER BY pos")]
+        self.replace_daily(rows)
+        conn.execute("DROP TABLE daily_expenses_v1")
+
+    def conn(self):
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = c
+        return c
+
+    def write(self, fn):
+        """한 트랜잭션 안에서 fn(conn) 을 실행합니다. (이미 트랜잭션 안이면 그 트랜잭션에 함께 묶습니다)"""
+        with self._write_lock:
+            c = self.conn()
+            if c.in_transaction:
+                return fn(c)
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(c)
+                c.execute("COMMIT")
+                return result
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+
+    # --- master ledger -----------------------------------------------------
+    def has_master(self):
+        return self.conn().execute("SELECT 1 FROM ledger_cells LIMIT 1").fetchone() is not None
+
+    def load_master_records(self):
+        rows = self.conn().execute("SELECT year, month, category, amount, status FROM ledger_cells").fetchall()
+        return [{"year": y, "month": m, "category": c, "amount": a, "status": s} for y, m, c, a, s in rows]
+
+    def upsert_master_cells(self, cells, replace=False):
+        rows = [(c["year"], c["month"], c["category"], c["amount"], c["status"]) for c in cells.values()]
+        def _run(conn):
+            if replace:
+                conn.execute("DELETE FROM ledger_cells")
+            conn.executemany("INSERT OR REPLACE INTO ledger_cells (year, month, category, amount, status) VALUES (?, ?, ?, ?, ?)", rows)
+        self.write(_run)
+
+    # --- daily expenses ----------------------------------------------------
+    # 일상경비 목록은 늘 집행일자 내림차순(같은 날짜는 먼저 들어온 행부터)이므로, 행마다 처음 들어온
+    # 순번(seq)을 보관해 두고 (exec_date DESC, seq) 순으로 읽으면 저장한 목록 순서 그대로 돌아옵니다.
+    def load_daily(self):
+        return [json.loads(d) for (d,) in self.conn().execute("SELECT data FROM daily_expenses ORDER BY exec_date DESC, seq")]
+
+    def replace_daily(self, rows):
+        """목록과 저장된 행을 행 키로 맞춰 보고, 없어진 행은 지우고 새로 들어오거나 내용이 바뀐 행만 씁니다."""
+        wanted = {}
+        for key, r in zip(daily_store_keys(rows), rows):
+            data = json.dumps(r, ensure_ascii=False)
+            wanted[key] = (str(r.get("집행일자", "")), str(r.get("세목", "")), float(clean_numeric(r.get("집행금액", 0))),
+                           hashlib.md5(data.encode("utf-8")).hexdigest(), data)
+        def _run(conn):
+            stored = dict(conn.execute("SELECT row_key, digest FROM daily_expenses"))
+            stale = [(k,) for k in stored if k not in wanted]
+            changed = [k for k, v in wanted.items() if stored.get(k) != v[3]]
+            next_seq = (conn.execute("SELECT MAX(seq) FROM daily_expenses").fetchone()[0] or 0) + 1
+            conn.executemany("DELETE FROM daily_expenses WHERE row_key = ?", stale)
+            conn.executemany(
+                "INSERT INTO daily_expenses (row_key, seq, exec_date, semok, amount, digest, data) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(row_key) DO UPDATE SET exec_date = excluded.exec_date, semok = excluded.semok, "
+                "amount = excluded.amount, digest = excluded.digest, data = excluded.data",
+                [(k, next_seq + i, *wanted[k]) for i, k in enumerate(changed)],
+            )
+            return len(stale), len(changed)
+        return self.write(_run)
+
+    # --- rapid plan --------------------------------------------------------
+    def load_rapid(self):
+        return [json.loads(d) for (d,) in self.conn().execute("SELECT data FROM rapid_plan ORDER BY pos")]
+
+    def replace_rapid(self, rows):
+        params = [(i, str(r.get("세목", "")), str(r.get("월", "")), json.dumps(r, ensure_ascii=False)) for i, r in enumerate(rows)]
+        def _run(conn):
+            conn.execute("DELETE FROM rapid_plan")
+            conn.executemany("INSERT INTO rapid_plan (pos, semok, month_label, data) VALUES (?, ?, ?, ?)", params)
+        self.write(_run)
+
+    # --- quantitative monthly ----------------------------------------------
+    def load_quant(self, year, month):
+        cur = self.conn().execute("SELECT data FROM quant_rows WHERE year = ? AND month = ? ORDER BY pos", (int(year), int(month)))
+        return [json.loads(d) for (d,) in cur]
+
+    def replace_quant(self, year, month, rows):
+        params = [(int(year), int(month), i, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(rows)]
+        def _run(conn):
+            conn.execute("DELETE FROM quant_rows WHERE year = ? AND month = ?", (int(year), int(month)))
+            conn.executemany("INSERT INTO quant_rows (year, month, pos, data) VALUES (?, ?, ?, ?)", params)
+        self.write(_run)
+
+    # --- 클라우드 대기 쓰기 -----------------------------------------------------
+    def load_outbox(self):
+        rows = self.conn().execute("SELECT path, kind, payload, attempts FROM cloud_outbox").fetchall()
+        return [(path, kind, json.loads(payload), attempts) for path, kind, payload, attempts in rows]
+
+    def put_outbox(self, entries):
+        params = [(path, kind, json.dumps(payload, ensure_ascii=False), int(attempts)) for path, kind, payload, attempts in entries]
+        if params:
+            self.write(lambda conn: conn.executemany("INSERT OR REPLACE INTO cloud_outbox (path, kind, payload, attempts) VALUES (?, ?, ?, ?)", params))
+
+    def drop_outbox(self, paths):
+        if paths:
+            self.write(lambda conn: conn.executemany("DELETE FROM cloud_outbox WHERE path = ?", [(p,) for p in paths]))
+
+    # --- 기타 설정값 ---------------------------------------------------------------
+    def get_meta(self, key):
+        row = self.conn().execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.write(lambda conn: conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value)))
+
+    # --- 기존 JSON 파일 가져오기 ------------------------------------------------
+    def _import_legacy_json(self):
+        def _read(path, key):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f).get(key)
+            except Exception:
+                return None
+
+        if os.path.exists("local_master.json"):
+            with open("local_master.json", "r", encoding="utf-8") as f:
+                try:
+                    doc = json.load(f)
+                except Exception:
+                    doc = {}
+            cells = doc.get("cells") if isinstance(doc.get("cells"), dict) else {
+                f"{r.get('year')}_{r.get('month')}_{r.get('category')}": r for r in doc.get("records", []) if isinstance(r, dict)
+            }
+            rows = []
+            for c in cells.values():
+                try:
+                    amount = float(clean_numeric(c.get("amount", 0)))
+                    rows.append((int(c["year"]), int(c["month"]), str(c["category"]), amount, c.get("status") or ("지출" if amount > 0 else "미지출")))
+                except Exception:
+                    continue
+            self.write(lambda conn: conn.executemany("INSERT OR REPLACE INTO ledger_cells (year, month, category, amount, status) VALUES (?, ?, ?, ?, ?)", rows))
+        daily = _read("local_daily.json", "expenses")
+        if isinstance(daily, list):
+            self.replace_daily(daily)
+        rapid = _read("local_rapid.json", "data")
+        if isinstance(rapid, list):
+            self.replace_rapid(rapid)
+        for path in glob.glob("local_quant_*_*.json"):
+            m = re.match(r"local_quant_(\d{4})_(\d{1,2})\.json$", os.path.basename(path))
+            rows = _read(path, "data")
+            if m and isinstance(rows, list):
+                self.replace_quant(int(m.group(1)), int(m.group(2)), rows)
+
+@st.cache_resource
+def get_local_store():
+    return LocalStore(LOCAL_DB_PATH)
+
+# -----------------------------------------------------------------------------
+# 5-2. 세션 공용 원장 캐시
+# - master / 일상경비 / 신속집행 데이터를 서버 프로세스당 한 벌만 읽어 모든 접속자가 공유합니다.
+# - save_* 로 저장할 때마다 원장 버전(version)이 올라가고, 각 세션은 자신이 마지막으로
+#   본 버전과 다를 때만 캐시에서 다시 가져옵니다. (저장소 재조회 없음)
+# - 캐시 값은 여러 세션이 함께 참조하므로 직접 고치지 말고, 사본을 고친 뒤 저장합니다.
+# -----------------------------------------------------------------------------
+class SharedLedgerCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._entries = {}
+        self.version = 0
+        self.cloud_recoveries = 0
+
+    def load_lock(self, name):
+        """같은 항목을 여러 세션이 동시에 처음 읽을 때 저장소 조회는 한 번만 하도록 막습니다."""
+        with self._lock:
+            return self._load_locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        with self._lock:
+            return self._entries.get(name)
+
+    def put(self, name, value, sync=None, bump=False):
+        with self._lock:
+            self._entries[name] = (value, dict(sync) if sync else None)
+            if bump: self.version += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.version += 1
+
+    def drop(self, name):
+        """한 항목만 비워 다음 조회 때 다시 만들게 합니다."""
+        with self._lock:
+            if self._entries.pop(name, None) is not None:
+                self.version += 1
+
+@st.cache_resource
+def get_shared_ledger():
+    return SharedLedgerCache()
+
+def load_shared(name, loader, sync_key=None):
+    """공용 캐시 값을 돌려줍니다. 캐시에 없을 때만 loader 로 저장소를 읽습니다.
+    sync_key 가 있으면 캐시 값과 짝이 맞는 저장 기준 상태(master_sync 등)도 세션에 복사합니다.
+    """
+    ledger = get_shared_ledger()
+    with ledger.load_lock(name):
+        entry = ledger.get(name)
+        if entry is None:
+            value = loader()
+            ledger.put(name, value, st.session_state.get(sync_key) if sync_key else None)
+            return value
+    value, sync = entry
+    if sync_key and sync:
+        st.session_state[sync_key] = dict(sync)
+    return value
+
+def publish_shared(name, value, sync_key=None):
+    """저장이 끝난 값을 공용 캐시에 올리고 원장 버전을 올립니다."""
+    get_shared_ledger().put(name, value, st.session_state.get(sync_key) if sync_key else None, bump=True)
 
 # -----------------------------------------------------------------------------
 # 데이터 처리 및 유틸리티 함수
@@ -465,39 +1228,349 @@ def ensure_data_integrity(data):
     if new_recs: data['records'].extend(new_recs)
     return data
 
-def load_data():
-    if not st.session_state['quota_exceeded'] and doc_ref:
-        try:
-            doc = doc_ref.get(timeout=3.0)
-            if doc.exists: return doc.to_dict()
-        except Exception as e:
-            check_quota_error(e)
+# -----------------------------------------------------------------------------
+# master 원장 셀 단위 저장
+# - master 문서는 {"cells": {"2026_3_전기요금": {...}}} 맵 구조로 저장합니다.
+# - 마지막으로 읽거나 저장한 셀 상태와 비교해 바뀐 (연도, 월, 항목) 셀만
+#   Firestore field-path update 로 보내고, 로컬 파일도 해당 셀만 고칩니다.
+# - 기존 {"records": [...]} 문서는 그대로 읽히며, 첫 저장 때 셀 구조로 전환됩니다.
+# -----------------------------------------------------------------------------
+def master_cell_key(year, month, category):
+    return f"{int(year)}_{int(month)}_{category}"
 
-    if os.path.exists("local_master.json"):
+def master_records_to_cells(records):
+    cells = {}
+    for r in records or []:
         try:
-            with open("local_master.json", "r", encoding="utf-8") as f: return json.load(f)
-        except: pass
+            y, m, c = int(r["year"]), int(r["month"]), str(r["category"])
+        except Exception:
+            continue
+        amount = float(clean_numeric(r.get("amount", 0)))
+        cells[master_cell_key(y, m, c)] = {
+            "year": y, "month": m, "category": c,
+            "amount": amount,
+            "status": r.get("status") or ("지출" if amount > 0 else "미지출"),
+        }
+    return cells
+
+def master_cells_to_records(cells):
+    """셀 맵을 기존 records 리스트로 변환합니다. (연도 → 관리항목 → 월 순서)"""
+    cat_order = {c: i for i, c in enumerate(CATEGORIES)}
+    records = [dict(v) for v in (cells or {}).values() if isinstance(v, dict)]
+    records.sort(key=lambda r: (r.get("year", 0), cat_order.get(r.get("category"), len(cat_order)), str(r.get("category")), r.get("month", 0)))
+    return records
+
+def normalize_master_doc(doc_data):
+    """클라우드/로컬 master 문서를 화면에서 쓰는 {"records": [...]} 형태로 맞춥니다."""
+    if isinstance(doc_data, dict) and isinstance(doc_data.get("cells"), dict):
+        return {"records": master_cells_to_records(doc_data["cells"])}
+    if isinstance(doc_data, dict) and isinstance(doc_data.get("records"), list):
+        return {"records": doc_data["records"]}
     return {"records": []}
 
-def save_data_cloud(data):
-    saved = False
-    if not st.session_state['quota_exceeded'] and doc_ref:
+def remember_master_state(data, cloud_cells=False, local_synced=False):
+    """마지막으로 저장소와 일치한 셀 상태를 기록합니다. (다음 저장 시 변경분 계산 기준)"""
+    st.session_state['master_sync'] = {
+        "cells": {k: (c["amount"], c["status"]) for k, c in master_records_to_cells(data.get("records", [])).items()},
+        "cloud_cells": bool(cloud_cells),
+        "local_synced": bool(local_synced),
+    }
+
+def diff_master_cells(data):
+    """마지막 저장 상태 대비 바뀐 셀만 반환합니다. 기준 상태가 없으면 None."""
+    sync = st.session_state.get('master_sync')
+    if not sync:
+        return None
+    base = sync["cells"]
+    return {k: c for k, c in master_records_to_cells(data.get("records", [])).items() if base.get(k) != (c["amount"], c["status"])}
+
+# -----------------------------------------------------------------------------
+# 첫 실행 일괄 읽기
+# - 서버 첫 접속 시 master / 일상경비 목차 / 신속집행 문서와, 지난번에 확인한 일상경비
+#   월별 문서까지 get_all 한 번(1 왕복, 전체 제한 시간 1개)으로 함께 읽습니다.
+# - 각 load_* 함수는 미리 받은 스냅샷이 있으면 다시 읽지 않습니다.
+# -----------------------------------------------------------------------------
+COLD_START_DEADLINE_SECONDS = 4.0
+
+def prefetch_cold_start():
+    """{문서 경로: 스냅샷} 을 돌려줍니다. 실패하거나 차단 중이면 빈 dict (각 load_* 가 개별로 처리)."""
+    if db is None:
+        return {}
+    deadline = time.monotonic() + COLD_START_DEADLINE_SECONDS
+    refs = [r for r in (doc_ref, daily_ref, rapid_monthly_ref) if r is not None]
+    try:
+        refs += [daily_partition_ref(k) for k in json.loads(get_local_store().get_meta("daily_partitions") or "[]")]
+    except Exception: pass
+    if not wait_cloud_writes(*refs, timeout=COLD_START_DEADLINE_SECONDS / 2):
+        return {}
+    try:
+        remaining = max(0.5, deadline - time.monotonic())
+        snaps = cloud_call(lambda: list(db.get_all(refs, timeout=remaining)), reads=len(refs))
+    except Exception as e:
+        check_quota_error(e)
+        return {}
+    return {snap.reference.path: snap for snap in snaps}
+
+def fetch_doc(ref, prefetched=None):
+    """미리 받은 스냅샷이 있으면 그대로 쓰고, 없으면 1건 읽습니다."""
+    if prefetched and ref.path in prefetched:
+        return prefetched[ref.path]
+    return cloud_call(lambda: ref.get(timeout=3.0), reads=1)
+
+def cloud_readable(ref, prefetched=None):
+    return ref is not None and ((prefetched and ref.path in prefetched) or wait_cloud_writes(ref))
+
+def load_data(prefetched=None):
+    if cloud_readable(doc_ref, prefetched):
         try:
-            doc_ref.set(data, timeout=3.0)
-            saved = True
+            doc = fetch_doc(doc_ref, prefetched)
+            if doc.exists:
+                raw = doc.to_dict()
+                data = normalize_master_doc(raw)
+                remember_master_state(data, cloud_cells=isinstance(raw.get("cells"), dict))
+                return data
         except Exception as e:
             check_quota_error(e)
-            
+
     try:
-        with open("local_master.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        saved = True
-    except: pass
-    return saved
+        store = get_local_store()
+        if store.has_master():
+            data = {"records": master_cells_to_records(master_records_to_cells(store.load_master_records()))}
+            remember_master_state(data, local_synced=True)
+            return data
+    except Exception: pass
+    return {"records": []}
+
+def prepare_master_view(data):
+    """[V11/V12] 누락 셀 보충과 수동 입력분 보정까지 마친 화면용 원장으로 만듭니다."""
+    # 누락 셀 보충은 한 번만 하고 두 수동 반영분을 차례로 올립니다.
+    data = ensure_data_integrity(data)
+    data = raise_to_manual_sums(data, "수탁자산취득비", get_manual_asset_monthly_sums())
+    return raise_to_manual_sums(data, "세탁용역", get_manual_laundry_monthly_sums())
+
+def load_shared_master(prefetched=None):
+    return load_shared("master", lambda: prepare_master_view(load_data(prefetched)), 'master_sync')
+
+def load_master_copy():
+    """공용 캐시의 master 원장을 수정용 사본으로 돌려줍니다."""
+    return copy.deepcopy(load_shared_master())
+
+# -----------------------------------------------------------------------------
+# 원장 큐브 (연도 × 항목 × 월)
+# - master records 를 float64 배열 values[연도, 항목, 월-1] 로 담아 셀 조회는 인덱스 한 번,
+#   누계는 월 축 cumsum, 항목/연도 합계는 축 합계로 구합니다.
+# - 큐브와 df_all 화면용 표는 원장 객체마다 한 번만 만듭니다. 공용 master 는 원장 버전이 바뀔 때만
+#   새 객체로 교체되므로(publish_shared), 결국 원장 버전이 바뀔 때만 다시 만들어집니다.
+# -----------------------------------------------------------------------------
+class LedgerCube:
+    def __init__(self, years, categories, values):
+        self.years = list(years)
+        self.categories = list(categories)
+        self.values = values
+        self.year_index = {y: i for i, y in enumerate(self.years)}
+        self.category_index = {c: i for i, c in enumerate(self.categories)}
+        self._aggregates = None
+
+    @classmethod
+    def from_records(cls, records):
+        """records 를 큐브로 만듭니다. YEARS/CATEGORIES 밖의 연도·항목도 뒤에 덧붙여 담습니다."""
+        years = sorted(set(YEARS) | {int(r["year"]) for r in records})
+        categories = list(CATEGORIES) + list(dict.fromkeys(r["category"] for r in records if r["category"] not in CATEGORIES))
+        cube = cls(years, categories, np.zeros((len(years), len(categories), 12)))
+        keep = [r for r in records if 1 <= int(r["month"]) <= 12]
+        if keep:
+            yi = np.fromiter((cube.year_index[int(r["year"])] for r in keep), dtype=np.intp, count=len(keep))
+            ci = np.fromiter((cube.category_index[r["category"]] for r in keep), dtype=np.intp, count=len(keep))
+            mi = np.fromiter((int(r["month"]) - 1 for r in keep), dtype=np.intp, count=len(keep))
+            # 같은 셀이 두 번 들어 있으면 df_all 합계처럼 더합니다.
+            np.add.at(cube.values, (yi, ci, mi), [clean_numeric(r.get("amount", 0)) for r in keep])
+        return cube
+
+    def cell(self, year, category, month):
+        yi, ci = self.year_index.get(year), self.category_index.get(category)
+        if yi is None or ci is None or not 1 <= month <= 12:
+            return 0.0
+        return float(self.values[yi, ci, month - 1])
+
+    def year_slice(self, year):
+        """[항목, 월] 배열 (없는 연도는 0)"""
+        yi = self.year_index.get(year)
+        return self.values[yi] if yi is not None else np.zeros((len(self.categories), 12))
+
+    def ytd(self, year, category=None):
+        """월별 누계. category 가 없으면 [항목, 월], 있으면 [월]"""
+        cum = np.cumsum(self.year_slice(year), axis=1)
+        if category is None:
+            return cum
+        ci = self.category_index.get(category)
+        return cum[ci] if ci is not None else np.zeros(12)
+
+    def ytd_at(self, year, category, month):
+        """1월~month 누계 (month 0 이하는 0)"""
+        if month < 1:
+            return 0.0
+        return float(self.ytd(year, category)[min(month, 12) - 1])
+
+    def category_totals(self, year):
+        """{항목: 연간 합계}"""
+        return dict(zip(self.categories, self.year_slice(year).sum(axis=1).tolist()))
+
+    def year_total(self, year):
+        return float(self.year_slice(year).sum())
+
+    def with_year(self, year):
+        """연도를 하나 덧붙인 큐브 (배열은 0 으로 채운 한 층만 이어 붙임)"""
+        if year in self.year_index:
+            return self
+        years = sorted(self.years + [year])
+        pos = years.index(year)
+        return LedgerCube(years, self.categories, np.insert(self.values, pos, 0.0, axis=0))
+
+    def with_category(self, category):
+        """항목을 하나 덧붙인 큐브"""
+        if category in self.category_index:
+            return self
+        return LedgerCube(self.years, self.categories + [category], np.insert(self.values, len(self.categories), 0.0, axis=1))
+
+    def to_frame(self):
+        """기존 df_all 과 같은 열(year, month, category, amount, status)의 표. 연도 → 항목 → 월 순서"""
+        n_y, n_c = len(self.years), len(self.categories)
+        amount = self.values.reshape(-1)
+        return pd.DataFrame({
+            "year": np.repeat(self.years, n_c * 12),
+            "month": np.tile(np.arange(1, 13), n_y * n_c),
+            "category": np.tile(np.repeat(np.array(self.categories, dtype=object), 12), n_y),
+            "amount": amount,
+            "status": np.where(amount > 0, "지출", "미지출").astype(object),
+        })
+
+    def aggregates(self):
+        """항목별 집계표. 큐브(=원장 버전)마다 한 번만 계산합니다."""
+        if self._aggregates is None:
+            self._aggregates = LedgerAggregates(self)
+        return self._aggregates
+
+class LedgerAggregates:
+    """
+    큐브 전체를 한 번에 집계한 표 (배열 축: [연도, 항목] 또는 [연도, 항목, 월])
+    - totals: 연간 합계 / paid_months: 집행(>0) 월 수 / latest_month: 마지막 집행월(없으면 0)
+    - cumulative: 1월~해당 월 누계
+    화면용 요약 행은 인자별로 한 번만 만들어 둡니다. (여러 세션 공유: 고치지 말 것)
+    """
+    def __init__(self, cube):
+        self.cube = cube
+        paid = cube.values > 0
+        self.totals = cube.values.sum(axis=2)
+        self.paid_months = paid.sum(axis=2)
+        # 뒤집은 월 축에서 첫 집행 위치를 찾아 마지막 집행월로 바꿉니다.
+        self.latest_month = np.where(paid.any(axis=2), 12 - np.argmax(paid[:, :, ::-1], axis=2), 0)
+        self.cumulative = np.cumsum(cube.values, axis=2)
+        self._rows = {}
+
+    def same_month(self, year, category, month):
+        """year 년 1월~month 누계"""
+        yi, ci = self.cube.year_index.get(year), self.cube.category_index.get(category)
+        if yi is None or ci is None or month < 1:
+            return 0.0
+        return float(self.cumulative[yi, ci, min(month, 12) - 1])
+
+    def latest_paid_month(self, year):
+        """year 년 전체 항목 중 마지막 집행월 (없으면 0)"""
+        yi = self.cube.year_index.get(year)
+        return int(self.latest_month[yi].max()) if yi is not None and len(self.cube.categories) else 0
+
+    def category_summary(self, year, categories):
+        """항목별 {category, amount, paid_months, recent_month}"""
+        key = ("summary", year, tuple(categories))
+        if key not in self._rows:
+            yi = self.cube.year_index.get(year)
+            rows = []
+            for cat in categories:
+                ci = self.cube.category_index.get(cat)
+                hit = yi is not None and ci is not None
+                rows.append({
+                    "category": cat,
+                    "amount": float(self.totals[yi, ci]) if hit else 0.0,
+                    "paid_months": int(self.paid_months[yi, ci]) if hit else 0,
+                    "recent_month": int(self.latest_month[yi, ci]) if hit else 0,
+                })
+            self._rows[key] = rows
+        return self._rows[key]
+
+    def same_month_comparison(self, year, prev_years, categories):
+        """
+        항목별 동월누계 비교 행. 비교 기준월은 항목의 year 년 마지막 집행월,
+        없으면 전체 항목의 마지막 집행월, 그것도 없으면 12월입니다.
+        """
+        key = ("compare", year, tuple(prev_years), tuple(categories))
+        if key not in self._rows:
+            global_latest = self.latest_paid_month(year)
+            rows = []
+            for r in self.category_summary(year, categories):
+                cat = r["category"]
+                compare_month = r["recent_month"] or global_latest or 12
+                row = {"category": cat}
+                for y in list(prev_years) + [year]:
+                    row[f"v{y}"] = self.same_month(y, cat, compare_month)
+                row.update({"paid_months": r["paid_months"], "recent_month": r["recent_month"], "compare_month": int(compare_month)})
+                rows.append(row)
+            self._rows[key] = rows
+        return self._rows[key]
+
+@st.cache_resource
+def get_ledger_views():
+    """원장 객체 id -> (원장, 큐브, df_all). 최근 몇 개만 보관합니다."""
+    return {}
+
+LEDGER_VIEW_KEEP = 4
+
+def ledger_views(data):
+    """원장(master dict)의 (큐브, df_all). 같은 원장 객체면 만들어 둔 것을 돌려줍니다. (여러 세션 공유: 고치지 말 것)"""
+    views = get_ledger_views()
+    entry = views.get(id(data))
+    if entry is None or entry[0] is not data:
+        cube = LedgerCube.from_records(data.get("records", []))
+        entry = (data, cube, cube.to_frame())
+        views[id(data)] = entry
+        while len(views) > LEDGER_VIEW_KEEP:
+            views.pop(next(iter(views)))
+    return entry[1], entry[2]
+
+def save_data_cloud(data, full=False):
+    changed = None if full else diff_master_cells(data)
+    if changed is not None and not changed:
+        return True
+    sync = st.session_state.get('master_sync') or {}
+    cells = master_records_to_cells(data.get("records", []))
+    cloud_ok, local_ok = False, False
+
+    if doc_ref:
+        if changed is not None and sync.get("cloud_cells"):
+            FieldPath = lazy_import("google.cloud.firestore_v1.field_path").FieldPath
+            updates = {FieldPath("cells", k).to_api_repr(): c for k, c in changed.items()}
+            updates["last_updated"] = datetime.now().isoformat()
+            cloud_ok = queue_cloud_write(doc_ref, "update", updates)
+        else:
+            cloud_ok = queue_cloud_write(doc_ref, "set", {"cells": cells, "last_updated": datetime.now().isoformat()})
+
+    try:
+        if changed is not None and sync.get("local_synced"):
+            get_local_store().upsert_master_cells(changed)
+        else:
+            get_local_store().upsert_master_cells(cells, replace=True)
+        local_ok = True
+    except Exception: pass
+
+    if cloud_ok or local_ok:
+        # 실패한 쪽은 다음 저장 때 전체 기록으로 다시 맞춥니다.
+        remember_master_state(data, cloud_cells=cloud_ok, local_synced=local_ok)
+        # 보정으로 달라진 셀은 기준 상태와 다르게 남아 다음 저장 때 함께 기록됩니다.
+        publish_shared("master", prepare_master_view(data), 'master_sync')
+    return cloud_ok or local_ok
 
 def save_and_register(year, cat, mon):
     if st.session_state.amt_box > 0:
-        curr = st.session_state['data']
+        curr = copy.deepcopy(st.session_state['data'])
         for r in curr["records"]:
             if r["year"] == year and r["category"] == cat and r["month"] == mon:
                 r["amount"] += float(st.session_state.amt_box)
@@ -508,18 +1581,81 @@ def save_and_register(year, cat, mon):
             st.session_state.amt_box = 0
             st.toast("✅ 지출 등록 완료")
 
-def load_daily_expenses():
-    if not st.session_state['quota_exceeded'] and daily_ref:
+# -----------------------------------------------------------------------------
+# 일상경비 월별 분할 저장
+# - daily_expenses 문서는 목차(layout, partitions)만 갖고, 실제 내역은
+#   daily_expenses/partitions/{YYYY-MM} 문서에 지출월별로 나눠 저장합니다.
+# - 저장 시 마지막으로 읽거나 저장한 월별 내용과 비교해 바뀐 월 문서만
+#   한 번의 batch 로 기록하므로, 쓰기 비용이 전체 이력이 아닌 변경 규모에 비례합니다.
+# - 기존 단일 문서({"expenses": [...]})도 그대로 읽히며, 첫 저장 때 월별 구조로 전환됩니다.
+# -----------------------------------------------------------------------------
+DAILY_UNDATED_PARTITION = "undated"
+
+def daily_partition_key(item):
+    m = re.match(r'\s*(\d{4})\D*(\d{1,2})', str(item.get('집행일자', '')))
+    if m and 1 <= int(m.group(2)) <= 12:
+        return f"{m.group(1)}-{int(m.group(2)):02d}"
+    return DAILY_UNDATED_PARTITION
+
+def split_daily_partitions(expense_list):
+    parts = {}
+    for item in expense_list:
+        parts.setdefault(daily_partition_key(item), []).append(item)
+    return parts
+
+def daily_partition_digest(rows):
+    return hashlib.md5(json.dumps(rows, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def daily_partition_ref(key):
+    return daily_ref.collection("partitions").document(key)
+
+def remember_daily_state(expense_list, cloud_parts=False):
+    """마지막으로 저장소와 일치한 월별 내용을 기록합니다. (다음 저장 시 변경 월 계산 기준)"""
+    st.session_state['daily_sync'] = {
+        "parts": {k: daily_partition_digest(v) for k, v in split_daily_partitions(expense_list).items()},
+        "cloud_parts": bool(cloud_parts),
+    }
+
+def remember_daily_partitions(keys):
+    """다음 첫 실행 때 함께 미리 읽을 월별 문서 목록을 로컬에 적어 둡니다."""
+    try:
+        value = json.dumps(sorted(keys))
+        store = get_local_store()
+        if store.get_meta("daily_partitions") != value:
+            store.set_meta("daily_partitions", value)
+    except Exception: pass
+
+def load_daily_expenses(prefetched=None):
+    if cloud_readable(daily_ref, prefetched):
         try:
-            doc = daily_ref.get(timeout=3.0)
-            if doc.exists: return doc.to_dict().get("expenses", [])
+            doc = fetch_doc(daily_ref, prefetched)
+            if doc.exists:
+                raw = doc.to_dict()
+                if raw.get("layout") != "monthly":
+                    expenses = raw.get("expenses", [])
+                    remember_daily_state(expenses)
+                    return expenses
+                expenses = []
+                part_refs = [daily_partition_ref(k) for k in raw.get("partitions", [])]
+                parts = [prefetched[r.path] for r in part_refs if prefetched and r.path in prefetched]
+                missing = [r for r in part_refs if not (prefetched and r.path in prefetched)]
+                if missing:
+                    parts += cloud_call(lambda: list(db.get_all(missing, timeout=3.0)), reads=len(missing))
+                remember_daily_partitions(raw.get("partitions", []))
+                for part in parts:
+                    if part.exists:
+                        expenses.extend(part.to_dict().get("expenses", []))
+                expenses.sort(key=lambda x: str(x.get('집행일자','')), reverse=True)
+                remember_daily_state(expenses, cloud_parts=True)
+                return expenses
         except Exception as e:
             check_quota_error(e)
 
-    if os.path.exists("local_daily.json"):
-        try:
-            with open("local_daily.json", "r", encoding="utf-8") as f: return json.load(f).get("expenses", [])
-        except: pass
+    try:
+        expenses = get_local_store().load_daily()
+        remember_daily_state(expenses)
+        return expenses
+    except Exception: pass
     return []
 
 def save_daily_expenses(expense_list):
@@ -535,24 +1671,48 @@ def save_daily_expenses(expense_list):
                 safe_val = str(v)
                 safe_item[k] = safe_val if safe_val not in ["nan", "NaT", "None", "inf", "-inf"] else ""
         safe_list.append(safe_item)
+    # 분류 결과가 없거나 낡은 행은 저장 전에 다시 분류해 함께 기록합니다.
+    safe_list = classify_daily_rows(safe_list)
         
-    data_to_save = {"expenses": safe_list, "last_updated": datetime.now().isoformat()}
-    saved = False
-    
-    if not st.session_state['quota_exceeded'] and daily_ref:
-        try:
-            daily_ref.set(data_to_save, timeout=4.0)
-            saved = True
-        except Exception as e:
-            check_quota_error(e)
+    now = datetime.now().isoformat()
+    sync = st.session_state.get('daily_sync') or {}
+    parts = split_daily_partitions(safe_list)
+    saved, cloud_parts = False, False
+
+    if daily_ref:
+        base = sync.get("parts", {}) if sync.get("cloud_parts") else None
+        writes = [
+            (daily_partition_ref(k), "set", {"expenses": rows, "last_updated": now})
+            for k, rows in parts.items()
+            if base is None or base.get(k) != daily_partition_digest(rows)
+        ]
+        if base is not None:
+            writes += [(daily_partition_ref(k), "delete", None) for k in base if k not in parts]
+        if writes:
+            writes.append((daily_ref, "set", {"layout": "monthly", "partitions": sorted(parts), "count": len(safe_list), "last_updated": now}))
+        saved = cloud_parts = queue_cloud_writes(writes)
+        if cloud_parts: remember_daily_partitions(parts)
 
     try:
-        with open("local_daily.json", "w", encoding="utf-8") as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        get_local_store().replace_daily(safe_list)
         saved = True
-    except: pass
+    except Exception: pass
+    if saved:
+        remember_daily_state(safe_list, cloud_parts=cloud_parts)
+        remember_semok_index(safe_list)
+        publish_shared("daily", safe_list, 'daily_sync')
     return saved
 
+# 신속집행 계획 행의 월 숫자 열. 불러올 때 '월'("N월")에서 한 번만 만들고, 저장할 때는 빼고 기록합니다.
+RAPID_MONTH_COL = "month_num"
+
+def with_rapid_month(df):
+    """'월' 열("N월")을 숫자로 바꾼 month_num 열을 붙인 표 (읽을 수 없는 월은 NaN)"""
+    if "월" not in df.columns:
+        return df
+    month = pd.to_numeric(df["월"].astype(str).str.replace("월", "", regex=False).str.strip(), errors="coerce").astype(float)
+    return df.assign(**{RAPID_MONTH_COL: month})
+
 def get_default_rapid_df():
     rows = []
     targets = {"수탁자산취득비": 93464000, "일반재료비": 14300000, "상품매입비": 5450000}
@@ -566,12 +1726,12 @@ def get_default_rapid_df():
             p_amt = float(plans.get(cat, {}).get(m, 0.0))
             a_amt = p_amt if m == 1 else 0.0
             rows.append({"세목": cat, "월": f"{m}월", "대상액": targets.get(cat, 0) if m == 1 else 0, "집행예정액": p_amt, "실제집행액": a_amt})
-    return pd.DataFrame(rows)
+    return with_rapid_month(pd.DataFrame(rows))
 
-def load_rapid_df():
-    if not st.session_state['quota_exceeded'] and rapid_monthly_ref:
+def load_rapid_df(prefetched=None):
+    if cloud_readable(rapid_monthly_ref, prefetched):
         try:
-            doc = rapid_monthly_ref.get(timeout=3.0)
+            doc = fetch_doc(rapid_monthly_ref, prefetched)
             if doc.exists:
                 data = doc.to_dict().get("data", [])
                 if data:
@@ -579,25 +1739,23 @@ def load_rapid_df():
                     if not df.empty and "세목" in df.columns:
                         for c in ["대상액", "집행예정액", "실제집행액"]:
                             if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
-                        return df
+                        return with_rapid_month(df)
         except Exception as e:
             check_quota_error(e)
             
-    if os.path.exists("local_rapid.json"):
-        try:
-            with open("local_rapid.json", "r", encoding="utf-8") as f:
-                data = json.load(f).get("data", [])
-                if data:
-                    df = pd.DataFrame(data)
-                    if not df.empty and "세목" in df.columns:
-                        for c in ["대상액", "집행예정액", "실제집행액"]:
-                            if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
-                        return df
-        except: pass
+    try:
+        data = get_local_store().load_rapid()
+        if data:
+            df = pd.DataFrame(data)
+            if not df.empty and "세목" in df.columns:
+                for c in ["대상액", "집행예정액", "실제집행액"]:
+                    if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
+                return with_rapid_month(df)
+    except Exception: pass
     return get_default_rapid_df()
 
 def save_rapid_df(df):
-    records = df.to_dict('records')
+    records = df.drop(columns=RAPID_MONTH_COL, errors="ignore").to_dict('records')
     safe_records = []
     for r in records:
         safe_r = {}
@@ -614,144 +1772,573 @@ def save_rapid_df(df):
     data_to_save = {"data": safe_records, "last_updated": datetime.now().isoformat()}
     saved = False
     
-    if not st.session_state['quota_exceeded'] and rapid_monthly_ref:
-        try:
-            rapid_monthly_ref.set(data_to_save, timeout=3.0)
-            saved = True
-        except Exception as e:
-            check_quota_error(e)
+    if rapid_monthly_ref:
+        saved = queue_cloud_write(rapid_monthly_ref, "set", data_to_save)
 
     try:
-        with open("local_rapid.json", "w", encoding="utf-8") as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        get_local_store().replace_rapid(safe_records)
         saved = True
-    except: pass
+    except Exception: pass
+    if saved:
+        publish_shared("rapid", with_rapid_month(df))
     return saved
 
+# -----------------------------------------------------------------------------
+# 정량실적 월별 문서 일괄 읽기
+# - 선택한 월의 {year}_{month} 문서를 get_all 한 번으로 읽고, 문서별 update_time 과 함께
+#   프로세스 공용 캐시에 보관합니다.
+# - 캐시에 있는 문서는 last_updated 필드만 요청해 update_time 을 비교하고, 바뀐 문서만 다시 받습니다.
+# - 화면을 다시 그릴 때(선택 변경 없음)는 revalidate=False 로 캐시만 사용합니다. (RPC 없음)
+# -----------------------------------------------------------------------------
+class QuantDocCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}   # (year, month) -> (rows, update_time)
+
+    def get(self, year, month):
+        with self._lock:
+            return self._docs.get((int(year), int(month)))
+
+    def put(self, year, month, rows, update_time=None):
+        with self._lock:
+            self._docs[(int(year), int(month))] = (rows, update_time)
+
+@st.cache_resource
+def get_quant_cache():
+    return QuantDocCache()
+
+def quant_doc_ref(year, month):
+    return quant_base_ref.document(f"{year}_{month}")
+
+def _get_quant_snapshots(year, months, field_paths=None):
+    """{월: 스냅샷} 을 get_all 한 번으로 읽습니다. 클라우드를 쓸 수 없으면 None."""
+    if not quant_base_ref:
+        return None
+    refs = {m: quant_doc_ref(year, m) for m in months}
+    if not wait_cloud_writes(*refs.values()):
+        return None
+    try:
+        snaps = cloud_call(lambda: list(db.get_all(list(refs.values()), field_paths=field_paths, timeout=3.0)), reads=len(refs))
+    except Exception as e:
+        check_quota_error(e)
+        return None
+    by_path = {snap.reference.path: snap for snap in snaps}
+    return {m: by_path.get(ref.path) for m, ref in refs.items()}
+
+def _fetch_quant_months(year, months):
+    cache = get_quant_cache()
+    snaps = _get_quant_snapshots(year, months) or {}
+    out = {}
+    for m in months:
+        snap = snaps.get(m)
+        if snap is not None and snap.exists:
+            out[m] = snap.to_dict().get("data", [])
+            cache.put(year, m, out[m], snap.update_time)
+            continue
+        try: out[m] = get_local_store().load_quant(year, m)
+        except Exception: out[m] = []
+        cache.put(year, m, out[m], None)
+    return out
+
+def load_quant_months(year, months, revalidate=True):
+    """선택한 월들의 정량실적을 {월: rows} 로 돌려줍니다."""
+    cache = get_quant_cache()
+    months = sorted({int(m) for m in months})
+    result = {}
+    for m in months:
+        entry = cache.get(year, m)
+        if entry is not None: result[m] = entry[0]
+    stale = [m for m in months if m not in result]
+    cached = [m for m in months if m in result]
+    if stale and revalidate:
+        # 어차피 한 번은 읽어야 하므로 캐시된 월도 같은 get_all 로 함께 받습니다.
+        stale, cached = months, []
+    if revalidate and cached and quant_base_ref:
+        snaps = _get_quant_snapshots(year, cached, field_paths=["last_updated"]) or {}
+        for m, snap in snaps.items():
+            if snap is not None and cache.get(year, m)[1] != (snap.update_time if snap.exists else None):
+                stale.append(m)
+    if stale:
+        result.update(_fetch_quant_months(year, sorted(stale)))
+    return {m: result.get(m, []) for m in months}
+
 def load_quant_monthly(year, month):
-    if not st.session_state['quota_exceeded'] and quant_base_ref:
-        try:
-            m_doc = quant_base_ref.document(f"{year}_{month}").get(timeout=3.0)
-            if m_doc.exists: return m_doc.to_dict().get("data", [])
-        except Exception as e:
-            check_quota_error(e)
-            
-    if os.path.exists(f"local_quant_{year}_{month}.json"):
-        try:
-            with open(f"local_quant_{year}_{month}.json", "r", encoding="utf-8") as f:
-                return json.load(f).get("data", [])
-        except: pass
-    return []
+    return load_quant_months(year, [month])[int(month)]
 
 def save_quant_monthly(year, month, data_list):
     data_to_save = {"data": data_list, "last_updated": datetime.now().isoformat()}
     saved = False
     
-    if not st.session_state['quota_exceeded'] and quant_base_ref:
-        try:
-            quant_base_ref.document(f"{year}_{month}").set(data_to_save, timeout=3.0)
-            saved = True
-        except Exception as e:
-            check_quota_error(e)
+    if quant_base_ref:
+        saved = queue_cloud_write(quant_base_ref.document(f"{year}_{month}"), "set", data_to_save)
             
     try:
-        with open(f"local_quant_{year}_{month}.json", "w", encoding="utf-8") as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        get_local_store().replace_quant(year, month, data_list)
         saved = True
-    except: pass
+    except Exception: pass
+    if saved:
+        get_quant_cache().put(year, month, data_list, None)
     return saved
 
-def merge_expenses(old_list, new_list):
-    def get_key(item):
-        return f"{item.get('집행일자','')}_{item.get('적요','')}_{item.get('집행금액',0)}"
-    existing_keys = {get_key(x) for x in old_list}
+def expense_merge_key(item):
+    """일상경비 중복 판정 키 (집행일자_적요_집행금액)"""
+    return f"{item.get('집행일자','')}_{item.get('적요','')}_{item.get('집행금액',0)}"
+
+def merge_expense_batches(old_list, new_lists):
+    """여러 업로드 결과를 한 번에 병합합니다. 파일마다 merge_expenses 를 차례로 호출한 것과 같은 결과입니다.
+
+    같은 파일 안의 중복 행은 기존처럼 모두 넣고, 앞선 파일(또는 기존 내역)에 있는 행만 건너뜁니다.
+    반환: (병합 목록, 파일별 신규 건수, 원장 동기화용 변경분 (old_list, 더한 행, 뺀 행))
+    """
+    existing_keys = {expense_merge_key(x) for x in old_list}
     merged_list = list(old_list)
-    added_count = 0
-    for item in new_list:
-        if get_key(item) not in existing_keys:
-            merged_list.append(item); added_count += 1
+    added_counts = []
+    for new_list in new_lists:
+        batch_keys = set()
+        added_count = 0
+        for item in new_list or []:
+            key = expense_merge_key(item)
+            if key not in existing_keys:
+                merged_list.append(item); added_count += 1; batch_keys.add(key)
+        existing_keys |= batch_keys
+        added_counts.append(added_count)
+    # 들어온 행은 이 자리에서 세목을 정식 표기로 맞추고 한 번 분류해 결과를 행에 함께 담습니다.
+    # (정식 표기가 바뀐 기존 행도 함께 다시 분류하고, 원장 변경분에는 옛 행을 빼고 새 행을 더합니다)
+    added_rows, removed_rows = [], []
+    if len(merged_list) > len(old_list):
+        normalized = normalize_semok_rows(merged_list, only=range(len(old_list), len(merged_list)))
+        for i, row in enumerate(normalized):
+            if i < len(old_list) and row is old_list[i]:
+                continue
+            if not is_daily_row_classified(row):
+                row = normalized[i] = {**row, **classify_daily_row(row)}
+            added_rows.append(row)
+            if i < len(old_list):
+                removed_rows.append(old_list[i])
+        merged_list = normalized
     try: merged_list.sort(key=lambda x: str(x.get('집행일자','')), reverse=True)
     except: pass
-    return merged_list, added_count
+    return merged_list, added_counts, (old_list, added_rows, removed_rows)
+
+def merge_expenses(old_list, new_list):
+    merged_list, (added_count,), delta = merge_expense_batches(old_list, [new_list])
+    return merged_list, added_count, delta
+
+# -----------------------------------------------------------------------------
+# 세목 표기 정규화
+# - 세목 문자열의 마지막 예산코드(예: 210-01)별로 지금까지 본 가장 긴 표기를 색인(코드 -> 표기)에
+#   보관하고, 같은 코드의 행은 모두 하나의 정식 표기로 맞춥니다.
+# - 행이 들어올 때(병합) 새 행만 색인에 더해 정규화하고, 정식 표기가 바뀐 코드의 기존 행만 고칩니다.
+#   화면은 정규화된 행을 읽기만 합니다. 목록 전체를 정규화할 때는 색인을 그 목록만으로 다시 만듭니다.
+# - 색인은 저장(save_daily_expenses)할 때 저장하는 행으로 다시 만들어 로컬 저장소 meta 에 보관합니다.
+#   지우거나 비운 행에만 있던 표기는 남지 않습니다.
+# -----------------------------------------------------------------------------
+SEMOK_CODE_PATTERN = r'(?<!\d)(\d{3}(?:-\d{2})?)(?!\d)'
+
+def semok_codes(semoks):
+    """세목 Series -> 예산코드 Series (코드가 없으면 앞뒤 공백을 뺀 세목 그대로)"""
+    stripped = semoks.astype(str).str.strip()
+    return stripped.str.findall(SEMOK_CODE_PATTERN).str[-1].fillna(stripped).astype(object)
+
+def canonical_semok_name(code, best, rules=None):
+    """코드의 정식 세목 표기. 대괄호 표기가 이미 있으면 그대로, 없으면 예산과목 매핑으로 만듭니다."""
+    rules = rules or RULES
+    if best and "[" in best and "]" in best: return best
+    if code in rules.budget_mapping:
+        f_val, g_val = rules.budget_mapping[code]
+        b_prefix = code.split('-')[0]
+        return f"[{b_prefix}]{f_val} - [{code}]{g_val}"
+    return best if best else code
+
+class SemokIndex:
+    """예산코드 -> 지금까지 본 가장 긴 세목 표기 (길이가 같으면 먼저 본 표기)"""
+
+    def __init__(self, names=None):
+        self._lock = threading.Lock()
+        self.names = dict(names or {})
+
+    @staticmethod
+    def _longest(semoks, codes):
+        """세목/코드 Series -> [(코드, 가장 긴 표기)] (길이가 같으면 먼저 나온 표기)"""
+        if semoks.empty:
+            return []
+        frame = pd.DataFrame({"code": codes.to_numpy(), "name": semoks.astype(str).to_numpy(), "len": semoks.astype(str).str.len().to_numpy()})
+        longest = frame.loc[frame.groupby("code", sort=False)["len"].idxmax(), ["code", "name"]]
+        return list(zip(longest["code"], longest["name"]))
+
+    def add(self, semoks, codes):
+        """세목/코드 Series 를 색인에 더합니다. 반환: 표기가 바뀐 코드 집합"""
+        changed = set()
+        with self._lock:
+            for code, name in self._longest(semoks, codes):
+                if len(name) > len(self.names.get(code, "")) or code not in self.names:
+                    self.names[code] = name
+                    changed.add(code)
+        return changed
+
+    def rebuild(self, semoks, codes):
+        """색인을 세목/코드 Series 만으로 다시 만듭니다. (지워진 행에만 있던 표기는 남지 않습니다)"""
+        names = dict(self._longest(semoks, codes))
+        with self._lock:
+            self.names = names
+
+    def best(self, code):
+        with self._lock:
+            return self.names.get(code, "")
+
+    def dumps(self):
+        with self._lock:
+            return json.dumps(self.names, ensure_ascii=False, sort_keys=True)
+
+@st.cache_resource
+def get_semok_index():
+    """로컬 meta 에 보관한 색인. 없으면 빈 색인 (첫 정규화 때 현재 행으로 채워집니다)
+
+    meta 에는 save_daily_expenses 가 저장하는 행으로 다시 만든 색인만 기록합니다. (화면 표시는 SQLite 에 쓰지 않습니다)
+    """
+    try:
+        return SemokIndex(json.loads(get_local_store().get_meta("semok_index") or "{}"))
+    except Exception:
+        return SemokIndex()
+
+def semok_series(rows):
+    """행 목록 -> (세목 Series, 예산코드 Series)"""
+    semoks = pd.Series([row.get('세목', '') for row in rows], dtype=object).astype(str)
+    return semoks, semok_codes(semoks)
+
+def remember_semok_index(rows):
+    """저장하는 행(rows)으로 색인을 다시 만들어 로컬 meta 에 기록합니다. (행을 지우거나 비울 때도 남은 행 기준)"""
+    index = get_semok_index()
+    index.rebuild(*semok_series(rows))
+    try:
+        store = get_local_store()
+        value = index.dumps()
+        if store.get_meta("semok_index") != value:
+            store.set_meta("semok_index", value)
+    except Exception: pass
+
+def normalize_semok_rows(rows, only=None):
+    """rows 의 세목을 정식 표기로 맞춘 목록. 바뀌는 행만 새 dict 로 바꿔 끼우고, 없으면 rows 그대로.
+
+    only 가 있으면 그 위치의 행만 색인에 더하고(새로 들어온 행), 나머지 행은 정식 표기가 바뀐 코드만 고칩니다.
+    only 가 없으면 색인을 rows 만으로 다시 만듭니다. 색인은 메모리에서만 고치고, 기록은 저장할 때 합니다.
+    """
+    index = get_semok_index()
+    if not rows:
+        if only is None:
+            index.rebuild(*semok_series(rows))
+        return rows
+    semoks, codes = semok_series(rows)
+    if only is None:
+        index.rebuild(semoks, codes)
+        added, moved = semoks, set()
+    else:
+        added = semoks.iloc[list(only)]
+        moved = index.add(added, codes.loc[added.index])
+    # 색인에 새 표기가 들어온 코드는 기존 행도 함께 고칩니다.
+    targets = semoks.index if only is None else added.index.union(semoks.index[codes.isin(moved)])
+    canonical_by_code = {code: canonical_semok_name(code, index.best(code)) for code in codes.loc[targets].unique()}
+    canonical = codes.loc[targets].map(canonical_by_code)
+    diff = canonical[canonical != semoks.loc[targets]]
+    if diff.empty:
+        return rows
+    out = list(rows)
+    for i, name in diff.items():
+        out[i] = {**rows[i], '세목': name}
+    return out
 
 # -----------------------------------------------------------------------------
 # ★ [V292 핵심] 공통 매핑 함수 (일반재료비 11.5M, 상하수도 2.3M 완벽 보장)
 # -----------------------------------------------------------------------------
-def get_mapped_category(desc, row_cat, budget_subj=""):
+# 규칙 파일 category_mapping 의 판정 순서 (_mapped_category, tests/reference_classifier.py 의 예전 순차 탐색과 같은 순서)
+# - asset_keywords: 적요/세목/예산과목에 자산취득 키워드가 있으면 수탁자산취득비
+# - 세목/예산과목에 관리항목명이 그대로 있으면 그 항목
+# - exclude: 기름/걸레/마포 관련 완벽 배제 (환경용역 15,600,000원 100% 보장)
+# - budget_priority: 엑셀 I열(예산과목) 최우선 (일반재료비는 상하수도요금 등 세부 적요와 관계없이 모두 일반재료비)
+# - water / electric (electric_exclude 제외): 특수 공과금 - 적요/세목 기준
+# - media: 적요에 "미디어"와 제습 키워드가 함께 있을 때 미디어실제습기
+# - safe_categories: 명시적 카테고리명 일치
+# - keyword_map: 세부 키워드 매핑 (적요 기준)
+# water_charge_keywords 는 상하수도 별도 집계(is_water_charge_row)용입니다.
+
+# -----------------------------------------------------------------------------
+# 분류 규칙 파일 (category_rules.json)
+# - 관리항목 분류 키워드, 일괄 지급건 귀속월 보정, 수동 반영분, 예산과목 코드표를 버전이 있는 JSON 파일 하나로 관리합니다.
+#   앱 코드에는 같은 표를 두지 않습니다.
+# - 파일은 바뀔 때만 읽어 RulePack(컴파일된 정규식/조회표)으로 만들고, 수정 시각이 바뀌면 서버 재시작 없이 다시 읽습니다.
+# - RulePack.stamp(버전+내용 해시)가 바뀌면 여기에 기대는 분류 메모, 원장 증분 집계, 업로드 파싱 캐시만 새로 계산됩니다.
+# - 읽다가 오류가 나면 직전 규칙을 그대로 씁니다. 처음부터 파일이 없거나 잘못되었으면 빈 최소 규칙(FALLBACK_RULES)으로
+#   화면만 띄우고 경고를 보여 주며, 원장 자동 동기화는 하지 않습니다. (빈 규칙으로 실적을 덮어쓰지 않도록)
+# -----------------------------------------------------------------------------
+RULES_FILE_PATH = "category_rules.json"
+
+FALLBACK_RULES = {
+    "version": "fallback",
+    "budget_mapping": {},
+    "asset_keywords": [],
+    "category_mapping": {
+        "exclude": [], "budget_priority": [], "water": [], "electric": [], "electric_exclude": [],
+        "media": {"keyword": "", "with_any": []}, "safe_categories": [], "keyword_map": {},
+    },
+    "water_charge_keywords": [],
+    "accruals": [],
+    "manual_asset_rows": [],
+    "manual_laundry_rows": [],
+}
+
+def keyword_pattern(keywords, upper=False):
+    """공백을 뺀 키워드들의 정규식 OR 패턴 (키워드가 없으면 아무것도 맞지 않는 패턴)"""
+    keys = [str(k).replace(" ", "") for k in keywords]
+    return "|".join(re.escape(k.upper() if upper else k) for k in keys if k) or "(?!)"
+
+class KeywordMatcher:
+    """여러 키워드를 트라이 모양 정규식 하나로 묶어 텍스트를 한 번만 훑고, 들어 있는 키워드 집합을 돌려줍니다.
+
+    위치마다 가장 긴 키워드 하나만 잡히므로, 그 키워드 안에 들어 있는 짧은 키워드도
+    함께 들어 있는 것으로 펼칩니다. (예: "상하수도요금" → "상하수도", "수도요금", "하수도" ...)
+    빈 키워드는 `"" in text` 처럼 늘 들어 있는 것으로 칩니다. 따라서 결과는 키워드마다
+    `k in text` 를 검사한 것과 같습니다.
+    """
+    EMPTY = frozenset([""])
+
+    def __init__(self, keywords):
+        self.keywords = sorted({k for k in keywords if k}, key=len, reverse=True)
+        self.pattern = re.compile("(?=(" + self._trie_pattern(self.keywords) + "))")
+        self.implied = {k: frozenset(x for x in self.keywords if x in k) for k in self.keywords}
+
+    @staticmethod
+    def _trie_pattern(keywords):
+        trie = {}
+        for word in keywords:
+            node = trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        # 글자마다 갈래가 하나뿐이고, 선택 그룹은 탐욕적이므로 위치마다 가장 긴 키워드가 잡힙니다.
+        def build(node):
+            alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not alts:
+                return ""
+            body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+            return "(?:" + body + ")?" if "" in node else body
+        return build(trie) if trie else "(?!)"
+
+    def find(self, *texts):
+        """텍스트마다 들어 있는 키워드 집합 목록"""
+        implied, findall = self.implied, self.pattern.findall
+        return [self.EMPTY.union(*map(implied.__getitem__, findall(text))) for text in texts]
+
+class RulePack:
+    """규칙 파일 한 벌을 컴파일한 정규식/조회표. 만든 뒤에는 고치지 않으며, 분류 메모의 키로도 쓰입니다."""
+
+    def __init__(self, data, source=RULES_FILE_PATH, fallback=False):
+        mapping = data["category_mapping"]  # 항목이 빠진 파일은 KeyError 로 잘못된 파일 처리
+        digest = hashlib.md5(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+        self.version = str(data["version"])
+        self.source = source
+        self.fallback = fallback
+        self.stamp = f"{self.version}-{digest[:8]}"
+
+        self.budget_mapping = {str(code): (str(f_val), str(g_val)) for code, (f_val, g_val) in data["budget_mapping"].items()}
+        self.budget_frame = pd.DataFrame(
+            [(code, f_val, g_val) for code, (f_val, g_val) in self.budget_mapping.items()],
+            columns=["b_val", "map_f", "map_g"],
+        )
+
+        self.asset_keywords = [str(k) for k in data["asset_keywords"]]
+        self.asset_pattern = keyword_pattern(self.asset_keywords, upper=True)
+        self.asset_re = re.compile(self.asset_pattern)
+        self.water_charge_re = re.compile(keyword_pattern(data["water_charge_keywords"]))
+
+        self.exclude_keywords = tuple(mapping["exclude"])
+        self.budget_priority = tuple(mapping["budget_priority"])
+        self.water_keywords = tuple(mapping["water"])
+        self.electric_keywords = tuple(mapping["electric"])
+        self.electric_exclude_keywords = tuple(mapping["electric_exclude"])
+        self.media_keywords = (str(mapping["media"]["keyword"]), tuple(mapping["media"]["with_any"]))
+        self.safe_categories = tuple(mapping["safe_categories"])
+        self.keyword_map = tuple((str(cat), tuple(kws)) for cat, kws in mapping["keyword_map"].items())
+        # 분류 규칙의 모든 키워드를 한 번에 찾는 매처. 규칙 한 벌(stamp)마다 한 번만 만듭니다.
+        self.category_names = tuple((cat, str(cat).replace(" ", "")) for cat in CATEGORIES)
+        self.category_matcher = KeywordMatcher(
+            [name for _, name in self.category_names] + list(self.exclude_keywords) + list(self.budget_priority)
+            + list(self.water_keywords) + list(self.electric_keywords) + list(self.electric_exclude_keywords)
+            + [self.media_keywords[0]] + list(self.media_keywords[1]) + list(self.safe_categories)
+            + [k for _, kws in self.keyword_map for k in kws]
+        )
+
+        self.forced_amount_categories = {}
+        self.accrual_splits = {}
+        for rule in data["accruals"]:
+            amount = int(rule["amount"])
+            if rule.get("category"):
+                self.forced_amount_categories[amount] = str(rule["category"])
+            if rule.get("splits"):
+                self.accrual_splits[(int(rule["year"]), amount)] = tuple((int(m), int(a)) for m, a in rule["splits"])
+
+        self.manual_asset_rows = [dict(r) for r in data["manual_asset_rows"]]
+        self.manual_laundry_rows = [dict(r) for r in data["manual_laundry_rows"]]
+        self.manual_asset_monthly = manual_monthly_sums(self.manual_asset_rows)
+        self.manual_laundry_monthly = manual_monthly_sums(self.manual_laundry_rows)
+
+    def is_asset_text(self, *values):
+        """적요/세목/예산과목 중 수탁자산취득비성 지출 여부 (is_asset_acquisition_text 참고)"""
+        text = " ".join([str(v) for v in values if v is not None]).replace(" ", "").upper()
+        if not text or text in ["NAN", "NAT", "NONE"]:
+            return False
+        return self.asset_re.search(text) is not None
+
+class RuleStore:
+    """규칙 파일의 수정 시각을 보고 필요할 때만 다시 읽어 컴파일합니다. (서버 프로세스당 하나)"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.path = path
+        self.pack = RulePack(FALLBACK_RULES, source="내장 최소 규칙", fallback=True)
+        self.mtime = False       # 아직 확인 전 (파일이 없으면 None)
+        self.error = None
+        self.loaded_at = None
+        self.reloads = 0
+
+    def refresh(self):
+        """반환: (현재 규칙, 이번 호출에서 규칙이 바뀌었는지)"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if mtime == self.mtime:
+                return self.pack, False
+            self.mtime = mtime
+            previous = self.pack.stamp
+            if mtime is None:
+                # 파일이 없으면 직전 규칙(처음이면 최소 규칙)을 그대로 쓰고 경고합니다.
+                self.error = f"규칙 파일 {self.path} 을(를) 찾을 수 없습니다."
+            else:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self.pack, self.error = RulePack(json.load(f), source=self.path), None
+                except Exception as e:
+                    # 저장 도중이거나 잘못된 파일이면 직전 규칙을 유지하고, 다음 수정 때 다시 읽습니다.
+                    self.error = f"{type(e).__name__}: {e}"
+            self.loaded_at = datetime.now()
+            changed = self.pack.stamp != previous
+            if changed: self.reloads += 1
+            return self.pack, changed
+
+@st.cache_resource
+def get_rule_store():
+    return RuleStore(RULES_FILE_PATH)
+
+def refresh_rules():
+    """스크립트 실행마다 한 번 규칙 파일을 확인합니다. 규칙이 바뀌면 수동 반영분에 기대는 공용 master 화면값을 다시 만듭니다."""
+    rules, changed = get_rule_store().refresh()
+    if changed:
+        get_shared_ledger().drop("master")
+    return rules
+
+RULES = refresh_rules()
+
+CATEGORY_MEMO_SIZE = 65536
+
+def _category_memo_key(*values):
+    # None 은 자산 키워드 판정에서 빠지고(is_asset_acquisition_text), 그 밖에서는 "None" 으로 다뤄지므로 구분해 둡니다.
+    return tuple(None if v is None else str(v) for v in values)
+
+@st.cache_resource
+def get_category_memo():
+    """분류 결과 메모 (서버 프로세스 공용). 키에 규칙 stamp 가 들어가므로 규칙 파일이 바뀌면 이전 결과는 쓰이지 않습니다."""
+    return {}
+
+CATEGORY_MEMO = get_category_memo()
+
+def _memoized(key, compute):
+    try:
+        return CATEGORY_MEMO[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # 해시할 수 없는 값(금액 등)이 섞이면 메모 없이 판정합니다.
+        return compute()
+    if len(CATEGORY_MEMO) >= CATEGORY_MEMO_SIZE:
+        # 오래된 항목을 고르기보다 한 번 비우는 편이 싸고, 자주 쓰는 키는 곧 다시 채워집니다.
+        CATEGORY_MEMO.clear()
+    value = CATEGORY_MEMO[key] = compute()
+    return value
+
+def _mapped_category(rules, desc, row_cat, budget_subj):
+    """get_mapped_category 의 판정 본체. 규칙표(rules)의 순서가 곧 우선순위입니다.
+
+    키워드는 rules.category_matcher 로 세 텍스트를 한 번에 훑어 찾고, 아래 판정은 찾은 키워드 집합만 봅니다.
+    """
+    # [V10] desc/row_cat/budget_subj에 명확한 자산취득 키워드가 있으면 최우선 분류합니다.
+    if rules.is_asset_text(desc, row_cat, budget_subj):
+        return "수탁자산취득비"
+
     desc_no_space = str(desc).replace(" ", "").strip()
     row_cat_no_space = str(row_cat).replace(" ", "").strip()
     budget_no_space = str(budget_subj).replace(" ", "").strip()
-
-    # [V10] 금액/적요 기반 강제 예외: 세탁용역 귀속월 보정건, 수탁자산취득비성 조달구매
-    # amount는 기존 시그니처 호환을 위해 이 함수에서는 직접 받지 않지만,
-    # desc/row_cat/budget_subj에 명확한 자산취득 키워드가 있으면 최우선 분류합니다.
-    if is_asset_acquisition_text(desc, row_cat, budget_subj):
-        return "수탁자산취득비"
+    in_desc, in_row_cat, in_budget = rules.category_matcher.find(desc_no_space, row_cat_no_space, budget_no_space)
 
     # [V5] 특수 업로드/수동 세목이 이미 관리항목명으로 들어온 경우 최우선 인정
-    # 예: 5대 용역 파일에서 "고객편의기기 관리용역"을 "공청기비데"로 변환해 저장한 행
-    for cat_name in CATEGORIES:
-        cat_no_space = str(cat_name).replace(" ", "")
-        if cat_no_space and (cat_no_space in row_cat_no_space or cat_no_space in budget_no_space):
+    for cat_name, cat_no_space in rules.category_names:
+        if cat_no_space and (cat_no_space in in_row_cat or cat_no_space in in_budget):
             return cat_name
-    
-    # 0. 기름/걸레/마포 관련 완벽 배제 (환경용역 15,600,000원 100% 보장)
-    if any(k in desc_no_space or k in row_cat_no_space or k in budget_no_space for k in ["기름", "걸레", "마포"]):
+
+    if not (in_desc | in_row_cat | in_budget).isdisjoint(rules.exclude_keywords):
         return None
 
-    # 1. 엑셀 I열(예산과목) 최우선
-    #    ※ 일반재료비는 상하수도요금 등 세부 적요와 관계없이 모두 일반재료비로 집계
-    #       기존에는 적요에 '상하수도'가 있으면 먼저 상하수도로 빠져 일반재료비 집계에서 누락됨
     if budget_no_space:
-        if "일반재료비" in budget_no_space: return "일반재료비"
-        if "상품매입비" in budget_no_space: return "상품매입비"
-        if "수탁자산취득비" in budget_no_space: return "수탁자산취득비"
-        if "자체소수선" in budget_no_space: return "자체소수선"
-        
-    # 2. 특수 공과금 (수도) - 예산과목이 없는 자료에서만 별도 분류
-    if any(k in desc_no_space or k in row_cat_no_space for k in ["상하수도요금", "수도요금", "수도료", "수도대금", "상하수도", "상수도", "하수도"]):
+        for cat_name in rules.budget_priority:
+            if cat_name in in_budget: return cat_name
+
+    in_desc_or_cat = in_desc | in_row_cat
+    if not in_desc_or_cat.isdisjoint(rules.water_keywords):
         return "상하수도"
-        
-    # 2-1. 특수 공과금 (전기요금)
-    if any(k in desc_no_space or k in row_cat_no_space for k in ["전기요금", "전기료", "한전", "한국전력", "전력요금"]):
-        if not any(k in desc_no_space for k in ["공사", "대행", "수수료", "충전", "전기차", "수리", "교체"]):
+
+    if not in_desc_or_cat.isdisjoint(rules.electric_keywords):
+        if in_desc.isdisjoint(rules.electric_exclude_keywords):
             return "전기요금"
-            
-    # 1-2. 미디어실
-    if "미디어" in desc_no_space and any(k in desc_no_space for k in ["제습", "습기"]):
+
+    media_kw, dehumid_kws = rules.media_keywords
+    if media_kw in in_desc and not in_desc.isdisjoint(dehumid_kws):
         return "미디어실제습기"
 
-    # 2-2. 수탁자산취득비: 예산과목 컬럼이 없는 지출명령 자료는 적요 키워드로 보완 분류
-    # 예: 자동심장충격기 조달구매, 포충기 조달구매, 방화벽/보안장비 조달구매 등
-    if is_asset_acquisition_text(desc, row_cat, budget_subj):
-        return "수탁자산취득비"
+    # (기존 2-2단계의 수탁자산취득비 재판정은 맨 앞 판정과 입력이 같아 항상 거짓이므로 생략)
 
-    # 3. 명시적 카테고리명 일치
-    safe_categories = ["환경용역", "상품매입비", "세탁용역", "일반재료비", "자체소수선", "부서업무비"]
-    for cat_name in safe_categories:
-        if cat_name in row_cat_no_space or cat_name in desc_no_space:
+    for cat_name in rules.safe_categories:
+        if cat_name in in_row_cat or cat_name in in_desc:
             return cat_name
 
-    # 4. 세부 키워드 매핑
-    keyword_map = {
-        "통신요금": ["통신요금", "통신비", "인터넷", "케이블"],
-        "복합기임대": ["복합기임대", "복합기렌탈"], 
-        "공청기비데": ["고객편의기기관리용역", "고객편의기기", "공기청정기렌탈", "공기청정기", "공청기", "비데렌탈", "비데"],
-        "무인경비": ["무인경비용역"],
-        "승강기점검": ["승강기유지보수", "승강기점검"], 
-        "신용카드수수료": ["신용카드수수료"], 
-        "환경용역": ["청소용역", "미화용역"],
-        "세탁용역": ["세탁"],
-        "야간경비": ["야간경비용역", "당직용역"],
-        "상품매입비": ["상품매입", "자판기식음료", "종량제봉투"]
-    }
-    
-    for m_cat, kws in keyword_map.items():
-        if any(k in desc_no_space for k in kws):
+    for m_cat, kws in rules.keyword_map:
+        if not in_desc.isdisjoint(kws):
             return m_cat
             
     return None
 
+def get_mapped_category(desc, row_cat, budget_subj=""):
+    """적요/세목/예산과목으로 관리항목을 정합니다. 같은 입력은 메모된 결과를 돌려줍니다."""
+    texts = _category_memo_key(desc, row_cat, budget_subj)
+    return _memoized(("mapped", RULES.stamp) + texts, lambda: _mapped_category(RULES, *texts))
+
+def classify_expense(desc, row_cat="", budget_subj="", amount=0, rules=None):
+    """force_mapped_category_for_known_cases(...) or get_mapped_category(...) 와 같은 결과 (메모)"""
+    rules = rules or RULES
+    texts = _category_memo_key(desc, row_cat, budget_subj)
+
+    def compute():
+        forced = forced_category_for_amount(amount, rules)
+        if forced:
+            return forced
+        # 수탁자산취득비 강제 분류는 get_mapped_category 의 첫 판정과 같습니다.
+        return _mapped_category(rules, *texts)
+    # 금액은 일괄 지급건 판정(clean_numeric 값 비교)에만 쓰이므로, 해시가 같은 1 과 1.0 을 같은 키로 써도 됩니다.
+    return _memoized(("classify", rules.stamp) + texts + (amount,), compute)
+
+def clear_category_memo():
+    CATEGORY_MEMO.clear()
+
 def is_water_charge_row(desc, row_cat="", budget_subj=""):
     """상하수도 별도 집계용 판정 함수.
 
@@ -761,11 +2348,7 @@ def is_water_charge_row(desc, row_cat="", budget_subj=""):
     text = " ".join([str(desc), str(row_cat), str(budget_subj)]).replace(" ", "")
     if not text or text in ["nan", "NaT", "None"]:
         return False
-    water_keywords = [
-        "상하수도요금", "상하수도", "상수도", "하수도",
-        "수도요금", "수도료", "수도대금", "물사용료"
-    ]
-    return any(k in text for k in water_keywords)
+    return RULES.water_charge_re.search(text) is not None
 
 
 
@@ -788,16 +2371,11 @@ def get_accrual_splits_for_special_cases(category, year, month, amount, desc):
     except Exception:
         amt = 0
 
-    text = str(desc).replace(' ', '')
-
-    if (
-        y == 2026
-        and amt == 4781810
-        and (category == "세탁용역" or "세탁" in text or True)
-    ):
-        # 2026년 세탁용역 1~2월분이 3월에 4,781,810원으로 일괄 지급된 건은
-        # 지급월이 아니라 귀속월 기준으로 1월/2월에 분할 반영합니다.
-        return [(1, 1908830), (2, 2872980)]
+    # 2026년 세탁용역 1~2월분이 3월에 4,781,810원으로 일괄 지급된 건처럼 규칙 파일 accruals 에 있는 건은
+    # 지급월이 아니라 귀속월 기준으로 나눠 반영합니다. (관리항목/적요와 무관하게 연도·금액으로 판정)
+    splits = RULES.accrual_splits.get((y, amt))
+    if splits is not None:
+        return list(splits)
 
     if 1 <= m <= 12:
         return [(m, amt)]
@@ -809,112 +2387,486 @@ def is_general_material_row(row):
     semok = str(row.get('세목', '')).replace(' ', '')
     return ("일반재료비" in budget) or ("일반재료비" in semok)
 
-def sync_daily_to_master_auto():
-    master_data = load_data()
-    master_data = ensure_data_integrity(master_data)
+# -----------------------------------------------------------------------------
+# 일상경비 → 원장 증분 동기화
+# - 행마다 (연, 항목, 귀속월, 금액) 기여분을 한 번만 계산해 보관하고, 집계 큐브에는
+#   새로 생긴 행은 더하고 사라진 행은 빼는 방식으로만 반영합니다.
+# - 병합/삭제하는 쪽은 바뀐 행을 이미 알고 있으므로 (이전 목록, 더한 행, 뺀 행) 변경분을 넘기고,
+#   큐브가 그 이전 목록을 반영하고 있을 때만 변경분을 바로 적용합니다. (비용이 변경 건수에 비례)
+#   새로고침·다른 세션의 저장·규칙 변경 뒤에는 전체 목록과 비교하는 방식으로 돌아갑니다.
+# - 기여분은 정수(귀속월 분할 금액)라 더하고 빼도 전체 재계산과 정확히 같습니다. (tests/test_daily_sync.py)
+# -----------------------------------------------------------------------------
+def daily_row_key(row):
+    """기여분을 정하는 입력. 이 값이 같은 행은 기여분도 같습니다. (저장 때 정수 금액이 실수로 바뀌어도 같은 키)"""
+    return (str(row.get('적요', '')), clean_numeric(row.get('집행금액', 0)), str(row.get('집행일자', '')),
+            str(row.get('세목', '')), str(row.get('예산과목', '')), str(row.get('업로드구분', '')))
+
+def daily_row_period(row):
+    """일상경비 1행의 (연, 지급월). 정할 수 없으면 (0, 0)"""
+    desc = str(row.get('적요', '')).strip()
+    date_raw = str(row.get('집행일자', '')).strip()
+    
+    year_found = None
+    month_found = None
+
+    # [V5] 5대 용역/수수료 전용 업로드는 K열 문서제목에 "2026년 0월"처럼
+    # 잘못된 월이 들어오는 경우가 있으므로, 파서가 만든 집행일자(=B열 지급월 반영)를 최우선 사용
+    is_special_upload = str(row.get('업로드구분', '')).strip() == '5대용역수수료'
+    if is_special_upload and date_raw:
+        date_num = re.sub(r'[^0-9]', '', str(date_raw))
+        if len(date_num) >= 8:
+            year_found = int(date_num[:4])
+            month_found = int(date_num[4:6])
+
+    if not year_found or not month_found:
+        ym_match = re.search(r'(\d{4})\s*년\s*(\d{1,2})\s*월', desc)
+        if ym_match:
+            y_tmp = int(ym_match.group(1))
+            m_tmp = int(ym_match.group(2))
+            # 0월은 무효값이므로 확정하지 않음
+            if 1 <= m_tmp <= 12:
+                year_found = y_tmp
+                month_found = m_tmp
+    
+    if (not year_found or not month_found or not (1 <= int(month_found) <= 12)) and date_raw:
+        date_num = re.sub(r'[^0-9]', '', str(date_raw))
+        if len(date_num) >= 8:
+            year_found = int(date_num[:4])
+            month_found = int(date_num[4:6])
+    
+    if not month_found:
+        m_match = re.search(r'(\d{1,2})\s*월', desc)
+        if m_match:
+            m_tmp = int(m_match.group(1))
+            if 1 <= m_tmp <= 12:
+                month_found = m_tmp
+            
+    if not year_found and month_found:
+        year_found = 2026
+        
+    if not year_found or not month_found or not (1 <= int(month_found) <= 12):
+        return 0, 0
+    return int(year_found), int(month_found)
+    
+
+# 행에 함께 저장하는 분류 결과 필드. _분류기준(규칙 stamp/입력 요약)이 현재와 다르면 다시 분류합니다.
+DAILY_CLASS_STAMP = "_분류기준"
+DAILY_CLASS_CATEGORY = "_분류"
+DAILY_CLASS_YEAR = "_귀속연도"
+DAILY_CLASS_MONTH = "_지급월"
+DAILY_CLASS_SPLITS = "_귀속분할"   # "월:금액,월:금액" (연/월을 정할 수 없으면 "")
+DAILY_CLASS_WATER = "_상하수도"
+
+def daily_class_stamp(row):
+    """분류에 쓰이는 입력과 규칙 묶음이 같으면 같은 값"""
+    return f"{RULES.stamp}/{hashlib.md5(repr(daily_row_key(row)).encode('utf-8')).hexdigest()[:12]}"
+
+def classify_daily_row(row):
+    """일상경비 1행의 분류 결과 필드 {_분류기준, _분류, _귀속연도, _지급월, _귀속분할, _상하수도}"""
+    desc = str(row.get('적요', '')).strip()
+    amt_v = clean_numeric(row.get('집행금액', 0))
+    # [V10] 일반 매핑 전에 반드시 잡아야 하는 예외를 먼저 처리합니다.
+    # - 세탁용역 4,781,810원 일괄 지급건: 문서제목에 '세탁'이 없어도 세탁용역으로 강제
+    # - 수탁자산취득비성 조달구매/포충기/방화벽 등: 예산과목이 비어도 수탁자산취득비로 강제
+    matched_cat = classify_expense(desc, row.get('세목', ''), row.get('예산과목', ''), amt_v) or ""
+    year_found, month_found = daily_row_period(row)
+    splits = ""
+    if year_found:
+        # 귀속월 보정 예외 처리
+        # 예: 세탁용역 1~2월분이 3월에 일괄 지급된 경우, 항목별 분석에서는 1월/2월로 분할 반영
+        accrual_splits = get_accrual_splits_for_special_cases(matched_cat, year_found, month_found, amt_v, desc)
+        splits = ",".join(f"{int(m)}:{int(a)}" for m, a in accrual_splits if 1 <= int(m) <= 12)
+    return {
+        DAILY_CLASS_STAMP: daily_class_stamp(row),
+        DAILY_CLASS_CATEGORY: matched_cat,
+        DAILY_CLASS_YEAR: year_found,
+        DAILY_CLASS_MONTH: month_found,
+        DAILY_CLASS_SPLITS: splits,
+        DAILY_CLASS_WATER: int(is_water_charge_row(desc, row.get('세목', ''), row.get('예산과목', ''))),
+    }
+
+def is_daily_row_classified(row):
+    return row.get(DAILY_CLASS_STAMP) == daily_class_stamp(row)
+
+def classify_daily_rows(rows):
+    """분류 결과가 없거나 낡은 행만 다시 분류한 목록. 모두 최신이면 rows 를 그대로 돌려줍니다.
+    (공용 캐시의 행을 고치지 않도록 바뀐 행만 새 dict 로 바꿔 끼웁니다.)
+    """
+    out = None
+    for i, row in enumerate(rows):
+        if not is_daily_row_classified(row):
+            if out is None:
+                out = list(rows)
+            out[i] = {**row, **classify_daily_row(row)}
+    return rows if out is None else out
+
+@st.cache_resource
+def get_classified_daily():
+    """daily 목록 id -> (목록, 규칙 stamp, 분류된 목록). 최근 몇 개만 보관합니다."""
+    return {}
+
+def classified_daily(daily):
+    """세목을 정식 표기로 맞추고 현재 규칙으로 분류한 daily 목록. 같은 목록·규칙이면 행을 다시 확인하지 않습니다."""
+    views = get_classified_daily()
+    entry = views.get(id(daily))
+    if entry is None or entry[0] is not daily or entry[1] != RULES.stamp:
+        result = classify_daily_rows(normalize_semok_rows(daily))
+        for lst in (daily, result):
+            views[id(lst)] = (lst, RULES.stamp, result)
+        while len(views) > LEDGER_VIEW_KEEP * 2:
+            views.pop(next(iter(views)))
+        return result
+    return entry[2]
+
+def daily_row_contributions(row):
+    """일상경비 1행이 원장 집계에 더하는 [(연, 항목, 월, 금액)]. 저장된 분류 결과가 최신이면 그대로 씁니다."""
+    if not is_daily_row_classified(row):
+        row = classify_daily_row(row)
+    matched_cat, year_found = row[DAILY_CLASS_CATEGORY], int(row[DAILY_CLASS_YEAR])
+    if not year_found or not matched_cat or not row[DAILY_CLASS_SPLITS]:
+        return []
+    splits = [tuple(int(v) for v in part.split(":")) for part in row[DAILY_CLASS_SPLITS].split(",")]
+    out = [(year_found, matched_cat, month, amount) for month, amount in splits]
+
+    # 중요: 일반재료비는 전체 금액을 유지하고,
+    # 그중 상하수도 요금만 '상하수도' 관리항목에도 별도 집계합니다.
+    # 즉, 일반재료비에서 상하수도를 차감하지 않습니다.
+    if matched_cat == "일반재료비" and int(row[DAILY_CLASS_WATER]):
+        out += [(year_found, "상하수도", month, amount) for month, amount in splits]
+    return out
+
+class DailySyncEngine:
+    """일상경비 집계 큐브. 행 키별 개수와 기여분을 보관하고 바뀐 행만 +/- 로 반영합니다.
+
+    세션에 보관한 엔진의 메서드는 처음 만든 실행의 전역을 보므로, 규칙 stamp 와 기여분 함수는 호출하는 쪽이 넘깁니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()   # 행 키 -> 행 수
+        self.contrib = {}         # 행 키 -> [(연, 항목, 월, 금액)]
+        self.cube = {}            # (연, 항목, 월) -> 금액
+        self.last_delta = (0, 0)  # (더한 행, 뺀 행)
+        self.rules_stamp = None   # 기여분을 계산한 규칙 묶음
+        self.synced = None        # 큐브가 반영하고 있는 daily 목록 (목록은 고치지 않고 새로 만들어 바꿔 끼웁니다)
+
+    def _apply(self, contributions, times):
+        for year, cat, month, amount in contributions:
+            cell = (year, cat, month)
+            value = self.cube.get(cell, 0) + amount * times
+            if value == 0:
+                self.cube.pop(cell, None)
+            else:
+                self.cube[cell] = value
+
+    def _add(self, key, row, contributions):
+        self.counts[key] += 1
+        if key not in self.contrib:
+            self.contrib[key] = contributions(row)
+        self._apply(self.contrib[key], 1)
+
+    def _remove(self, key):
+        self._apply(self.contrib[key], -1)
+        self.counts[key] -= 1
+        if self.counts[key] <= 0:
+            del self.counts[key], self.contrib[key]
+
+    def apply_delta(self, delta, daily, rules_stamp, contributions):
+        """delta=(이전 목록, 더한 행, 뺀 행) 을 반영해 큐브를 daily 에 맞춥니다. 반환: (더한 행 수, 뺀 행 수)
+
+        큐브가 이전 목록을 반영하고 있지 않거나 규칙이 바뀌었으면 update(전체 비교)로 돌아갑니다.
+        """
+        before, added, removed = delta
+        with self._lock:
+            removed_keys = Counter(daily_row_key(row) for row in removed)
+            if self.synced is before and self.rules_stamp == rules_stamp and all(self.counts[k] >= n for k, n in removed_keys.items()):
+                for key, n in removed_keys.items():
+                    for _ in range(n):
+                        self._remove(key)
+                for row in added:
+                    self._add(daily_row_key(row), row, contributions)
+                self.synced = daily
+                self.last_delta = (len(added), len(removed))
+                return self.last_delta
+        return self.update(daily, rules_stamp, contributions)
+
+    def update(self, daily, rules_stamp, contributions):
+        """daily 목록 전체와 비교해 큐브를 갱신합니다. 반환: (더한 행 수, 뺀 행 수)"""
+        with self._lock:
+            if self.synced is daily and self.rules_stamp == rules_stamp:
+                self.last_delta = (0, 0)
+                return self.last_delta
+            rows_by_key = {}
+            counts = Counter()
+            for row in daily:
+                key = daily_row_key(row)
+                counts[key] += 1
+                rows_by_key.setdefault(key, row)
+            if self.rules_stamp != rules_stamp:
+                # 분류/귀속월 규칙이 바뀌면 저장해 둔 기여분을 모두 버리고 새 규칙으로 다시 더합니다.
+                self.counts, self.contrib, self.cube = Counter(), {}, {}
+                self.rules_stamp = rules_stamp
+            added, removed = counts - self.counts, self.counts - counts
+            for key, n in added.items():
+                if key not in self.contrib:
+                    self.contrib[key] = contributions(rows_by_key[key])
+                self._apply(self.contrib[key], n)
+            for key, n in removed.items():
+                self._apply(self.contrib[key], -n)
+                if key not in counts:
+                    del self.contrib[key]
+            self.counts = counts
+            self.synced = daily
+            self.last_delta = (sum(added.values()), sum(removed.values()))
+            return self.last_delta
+
+    def sums_map(self):
+        """기존 sync 의 sums_map 형태 {연: {항목: {월: 금액}}}"""
+        with self._lock:
+            cells = list(self.cube.items())
+        sums_map = {}
+        for (year, cat, month), amount in cells:
+            sums_map.setdefault(year, {}).setdefault(cat, {})[month] = amount
+        return sums_map
+
+def get_daily_sync_engine():
+    """세션마다 하나인 집계 큐브. 세션끼리 하나를 나눠 쓰면 서로의 목록을 기준으로 삼아 매번 전체 비교로 돌아갑니다."""
+    engine = st.session_state.get('daily_sync_engine')
+    if engine is None:
+        engine = st.session_state['daily_sync_engine'] = DailySyncEngine()
+    return engine
+
+# -----------------------------------------------------------------------------
+# 적요 검색 색인 (글자 2-gram / 3-gram 역색인)
+# - 서로 다른 적요 문자열마다 2·3글자 조각을 색인해 두고, 검색어 조각의 색인을 교집합해 후보를 좁힌 뒤
+#   실제 포함 여부만 확인합니다. 띄어쓰기 없는 한글 적요에도 그대로 맞습니다.
+# - 색인은 프로세스 공용이며, 목록이 바뀌면 새로 생긴/사라진 적요 문자열만 더하고 뺍니다.
+# - 목록별 보조 표(적요 -> 행 위치, 세목 -> 행 위치, 금액/집행일자 배열)는 목록 객체마다 한 번만 만들어
+#   검색 시간은 전체 건수가 아니라 일치 건수에 비례합니다.
+# -----------------------------------------------------------------------------
+class DailySearchView:
+    """daily 목록 하나의 검색용 보조 표"""
+
+    def __init__(self, daily):
+        texts = [str(row.get('적요', '') or '') for row in daily]
+        self.size = len(daily)
+        self.text_counts = Counter(texts)
+        self.positions = {}
+        for i, text in enumerate(texts):
+            self.positions.setdefault(text, []).append(i)
+        # 행 ID: 중복 판정 키의 해시 + 같은 키 안에서의 순번. 목록이 다시 만들어져도 같은 행은 같은 ID 입니다.
+        seen = Counter()
+        row_ids = []
+        for row in daily:
+            digest = hashlib.md5(expense_merge_key(row).encode("utf-8")).hexdigest()[:12]
+            seen[digest] += 1
+            row_ids.append(f"{digest}-{seen[digest]}")
+        self.row_ids = np.array(row_ids, dtype=object)
+        self.id_set = frozenset(row_ids)
+        self.has_budget = any('예산과목' in row for row in daily)
+        self.semok = np.array([str(row.get('세목', '')) for row in daily], dtype=object)
+        self.semok_positions = {}
+        for i, semok in enumerate(self.semok):
+            self.semok_positions.setdefault(semok, []).append(i)
+        self.amount = np.array([clean_numeric(row.get('집행금액', 0)) for row in daily], dtype=float)
+        # 집행일자는 앞 8자리 숫자(YYYYMMDD)로 비교합니다. 읽을 수 없으면 0
+        digits = pd.Series([str(row.get('집행일자', '')) for row in daily], dtype=object).str.replace(r'\D', '', regex=True)
+        self.date = np.where(digits.str.len() >= 8, pd.to_numeric(digits.str[:8], errors='coerce').fillna(0), 0).astype(np.int64) if self.size else np.zeros(0, dtype=np.int64)
+
+class DailySearchIndex:
+    """적요 n-gram 역색인. 마지막으로 맞춘 목록(view)과 다른 목록을 검색하면 바뀐 적요만 반영합니다."""
+    GRAM_SIZES = (2, 3)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.texts = set()
+        self.grams = {}           # 조각 -> 적요 집합
+        self.view = None          # 색인이 맞춰진 목록의 DailySearchView
+        self.last_delta = (0, 0)  # (더한 적요, 뺀 적요)
+
+    @classmethod
+    def text_grams(cls, text):
+        return {text[i:i + n] for n in cls.GRAM_SIZES for i in range(len(text) - n + 1)}
+
+    def _sync(self, view):
+        if self.view is view:
+            return
+        added = [t for t in view.text_counts if t not in self.texts]
+        removed = [t for t in self.texts if t not in view.text_counts]
+        for text in added:
+            for gram in self.text_grams(text):
+                self.grams.setdefault(gram, set()).add(text)
+        for text in removed:
+            for gram in self.text_grams(text):
+                posting = self.grams.get(gram)
+                if posting is not None:
+                    posting.discard(text)
+                    if not posting:
+                        del self.grams[gram]
+        self.texts = set(view.text_counts)
+        self.view = view
+        self.last_delta = (len(added), len(removed))
+
+    def _texts_with(self, term):
+        if len(term) < 2:
+            return {t for t in self.texts if term in t}
+        n = 3 if len(term) >= 3 else 2
+        postings = []
+        for i in range(len(term) - n + 1):
+            posting = self.grams.get(term[i:i + n])
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        found = set(postings[0]).intersection(*postings[1:])
+        # 조각이 모두 있어도 이어져 있지 않을 수 있으므로 긴 검색어는 실제 포함 여부를 확인합니다.
+        return found if len(term) <= n else {t for t in found if term in t}
+
+    def search(self, view, groups):
+        """groups(OR 로 묶인 AND 검색어 목록)에 맞는 적요 집합"""
+        with self._lock:
+            self._sync(view)
+            matched = set()
+            for terms in groups:
+                hit = None
+                for term in terms:
+                    hit = self._texts_with(term) if hit is None else hit & self._texts_with(term)
+                    if not hit:
+                        break
+                matched |= hit or set()
+            return matched
+
+@st.cache_resource
+def get_daily_search_index():
+    return DailySearchIndex()
+
+@st.cache_resource
+def get_daily_search_views():
+    """daily 목록 id -> (목록, DailySearchView). 최근 몇 개만 보관합니다."""
+    return {}
+
+def daily_search_view(daily):
+    views = get_daily_search_views()
+    entry = views.get(id(daily))
+    if entry is None or entry[0] is not daily:
+        entry = (daily, DailySearchView(daily))
+        views[id(daily)] = entry
+        while len(views) > LEDGER_VIEW_KEEP:
+            views.pop(next(iter(views)))
+    return entry[1]
+
+# 일상경비 편집기 정렬 (선택지 -> (배열 이름, 내림차순 여부)). 저장 순서는 집행일자 최신순입니다.
+DAILY_EDITOR_SORTS = {
+    "저장 순서 (최신순)": None,
+    "집행일자 오래된 순": ("date", False),
+    "집행금액 큰 순": ("amount", True),
+    "집행금액 작은 순": ("amount", False),
+}
+DAILY_EDITOR_PAGE_SIZES = [50, 100, 200, 500]
+
+def sort_daily_positions(view, pos, choice):
+    """행 위치 배열을 정렬 선택에 맞게 (같은 값은 저장 순서 유지)"""
+    spec = DAILY_EDITOR_SORTS.get(choice)
+    if spec is None or not len(pos):
+        return pos
+    values = getattr(view, spec[0])[pos]
+    order = np.argsort(-values if spec[1] else values, kind="stable")
+    return pos[order]
+
+def export_daily_excel(daily, view, pos):
+    """pos 위치 행의 엑셀 파일 bytes (집행일자, 세목, 적요, 집행금액[, 예산과목])"""
+    columns = ['집행일자', '세목', '적요', '집행금액'] + (['예산과목'] if view.has_budget else [])
+    export_df = pd.DataFrame([daily[i] for i in pos]).reindex(columns=columns).assign(세목=view.semok[pos])
+    output = io.BytesIO()
+    ensure_excel_engine()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        export_df.to_excel(writer, index=False, sheet_name='일상경비지출내역')
+    return output.getvalue()
+
+def parse_search_query(query):
+    """'상하수도 3월 | 전기' -> [['상하수도', '3월'], ['전기']] (공백 = AND, | = OR)"""
+    return [terms for terms in (part.split() for part in str(query or "").split("|")) if terms]
+
+def search_daily(daily, query="", semok=None, amount_range=None, date_range=None):
+    """조건에 맞는 daily 행 위치(오름차순 배열). 조건이 하나도 없으면 전체
+
+    amount_range: (최소, 최대) 원, None 인 쪽은 제한 없음
+    date_range: (시작, 끝) date, 집행일자 기준 (양 끝 포함)
+    """
+    view = daily_search_view(daily)
+    pos = None
+    groups = parse_search_query(query)
+    if groups:
+        texts = get_daily_search_index().search(view, groups)
+        pos = np.array(sorted(i for text in texts for i in view.positions.get(text, ())), dtype=np.intp)
+    if semok is not None:
+        if pos is None:
+            pos = np.array(view.semok_positions.get(semok, []), dtype=np.intp)
+        else:
+            pos = pos[view.semok[pos] == semok]
+    if pos is None:
+        pos = np.arange(view.size, dtype=np.intp)
+    lo, hi = amount_range or (None, None)
+    if lo is not None:
+        pos = pos[view.amount[pos] >= lo]
+    if hi is not None:
+        pos = pos[view.amount[pos] <= hi]
+    if date_range:
+        start, end = (int(d.strftime("%Y%m%d")) for d in date_range)
+        dates = view.date[pos]
+        pos = pos[(dates >= start) & (dates <= end)]
+    return pos
+
+def sync_daily_to_master_auto(delta=None):
+    """일상경비를 원장 2026년 실적에 맞춥니다. 바뀐 칸이 있으면 저장하고 True.
+
+    delta: 병합/삭제하는 쪽이 넘기는 (이전 daily 목록, 더한 행, 뺀 행). 없으면 전체 목록과 비교합니다.
+    """
+    if RULES.fallback:
+        # 최소 규칙으로는 거의 분류되지 않으므로, 규칙 파일을 고칠 때까지 원장 실적을 덮어쓰지 않습니다.
+        st.session_state['daily_sync_skipped'] = st.session_state.get('daily_sync_skipped', 0) + 1
+        st.toast("⚠️ 분류 규칙 파일을 읽지 못해 원장 동기화를 건너뛰었습니다.")
+        return False
     daily = st.session_state.get('daily_expenses', [])
     
     if not daily:
+        master_data = load_master_copy()
         for r in master_data.get('records', []):
             if r['year'] == 2026:
                 r['amount'] = 0.0
                 r['status'] = "미지출"
         # [V11/V12] 업로드 데이터가 없어도, 사용자가 제공한 수동 입력분은 유지
-        master_data = apply_manual_asset_to_master_data(master_data)
-        master_data = apply_manual_laundry_to_master_data(master_data)
+        master_data = prepare_master_view(master_data)
         save_data_cloud(master_data)
         st.session_state['data'] = master_data
         return True
     
-    sums_map = {} 
-    
-    for row in daily:
-        desc = str(row.get('적요', '')).strip()
-        amt_v = clean_numeric(row.get('집행금액', 0))
-        date_raw = str(row.get('집행일자', '')).strip()
-        
-        year_found = None
-        month_found = None
-
-        # [V5] 5대 용역/수수료 전용 업로드는 K열 문서제목에 "2026년 0월"처럼
-        # 잘못된 월이 들어오는 경우가 있으므로, 파서가 만든 집행일자(=B열 지급월 반영)를 최우선 사용
-        is_special_upload = str(row.get('업로드구분', '')).strip() == '5대용역수수료'
-        if is_special_upload and date_raw:
-            date_num = re.sub(r'[^0-9]', '', str(date_raw))
-            if len(date_num) >= 8:
-                year_found = int(date_num[:4])
-                month_found = int(date_num[4:6])
-
-        if not year_found or not month_found:
-            ym_match = re.search(r'(\d{4})\s*년\s*(\d{1,2})\s*월', desc)
-            if ym_match:
-                y_tmp = int(ym_match.group(1))
-                m_tmp = int(ym_match.group(2))
-                # 0월은 무효값이므로 확정하지 않음
-                if 1 <= m_tmp <= 12:
-                    year_found = y_tmp
-                    month_found = m_tmp
-        
-        if (not year_found or not month_found or not (1 <= int(month_found) <= 12)) and date_raw:
-            date_num = re.sub(r'[^0-9]', '', str(date_raw))
-            if len(date_num) >= 8:
-                year_found = int(date_num[:4])
-                month_found = int(date_num[4:6])
-        
-        if not month_found:
-            m_match = re.search(r'(\d{1,2})\s*월', desc)
-            if m_match:
-                m_tmp = int(m_match.group(1))
-                if 1 <= m_tmp <= 12:
-                    month_found = m_tmp
-                
-        if not year_found and month_found:
-            year_found = 2026
-            
-        if not year_found or not month_found or not (1 <= int(month_found) <= 12):
-            continue
-        
-        # [V10] 일반 매핑 전에 반드시 잡아야 하는 예외를 먼저 처리합니다.
-        # - 세탁용역 4,781,810원 일괄 지급건: 문서제목에 '세탁'이 없어도 세탁용역으로 강제
-        # - 수탁자산취득비성 조달구매/포충기/방화벽 등: 예산과목이 비어도 수탁자산취득비로 강제
-        matched_cat = force_mapped_category_for_known_cases(
-            desc, row.get('세목', ''), row.get('예산과목', ''), amt_v
-        ) or get_mapped_category(desc, row.get('세목', ''), row.get('예산과목', ''))
-                    
-        if matched_cat:
-            if year_found not in sums_map: sums_map[year_found] = {}
-            if matched_cat not in sums_map[year_found]: sums_map[year_found][matched_cat] = {}
-
-            # 귀속월 보정 예외 처리
-            # 예: 세탁용역 1~2월분이 3월에 일괄 지급된 경우, 항목별 분석에서는 1월/2월로 분할 반영
-            accrual_splits = get_accrual_splits_for_special_cases(matched_cat, year_found, month_found, amt_v, desc)
-            for accrual_month, accrual_amt in accrual_splits:
-                if 1 <= int(accrual_month) <= 12:
-                    sums_map[year_found][matched_cat][accrual_month] = sums_map[year_found][matched_cat].get(accrual_month, 0) + accrual_amt
-
-            # 중요: 일반재료비는 전체 금액을 유지하고,
-            # 그중 상하수도 요금만 '상하수도' 관리항목에도 별도 집계합니다.
-            # 즉, 일반재료비에서 상하수도를 차감하지 않습니다.
-            if matched_cat == "일반재료비" and is_water_charge_row(desc, row.get('세목', ''), row.get('예산과목', '')):
-                if "상하수도" not in sums_map[year_found]: sums_map[year_found]["상하수도"] = {}
-                for accrual_month, accrual_amt in get_accrual_splits_for_special_cases(matched_cat, year_found, month_found, amt_v, desc):
-                    if 1 <= int(accrual_month) <= 12:
-                        sums_map[year_found]["상하수도"][accrual_month] = sums_map[year_found]["상하수도"].get(accrual_month, 0) + accrual_amt
+    engine = get_daily_sync_engine()
+    if delta is None:
+        engine.update(daily, RULES.stamp, daily_row_contributions)
+    else:
+        engine.apply_delta(delta, daily, RULES.stamp, daily_row_contributions)
+    sums_map = engine.sums_map()
 
     # [V11] 수탁자산취득비는 일상경비 업로드 형식이 아니라 사용자가 제공한 표 기준으로 수동 반영
     sums_map = add_manual_asset_to_sums_map(sums_map)
     # [V12] 세탁용역 3월 일괄 지급건은 항목별 분석에서 1월/2월 귀속월 기준으로 수동 반영
     sums_map = add_manual_laundry_to_sums_map(sums_map)
-            
+
+    def target(r):
+        # 수탁자산취득비도 일상경비 동기화 데이터 기준으로 반영
+        # 기존에는 신속집행 기본값 보존을 위해 제외했으나, 실제 지출명령 자료 업로드 시 0원으로 남는 문제가 있었음
+        return sums_map.get(2026, {}).get(r['category'], {}).get(r['month'], 0.0)
+
+    # 바뀔 칸이 없으면 원장 사본도 만들지 않습니다.
+    if not any(r['year'] == 2026 and clean_numeric(r['amount']) != target(r) for r in load_shared_master().get('records', [])):
+        return False
+
+    master_data = load_master_copy()
     data_changed = False
     for r in master_data.get('records', []):
         if r['year'] == 2026:
-            cat, month = r['category'], r['month']
-            
-            # 수탁자산취득비도 일상경비 동기화 데이터 기준으로 반영
-            # 기존에는 신속집행 기본값 보존을 위해 제외했으나, 실제 지출명령 자료 업로드 시 0원으로 남는 문제가 있었음
-            new_val = sums_map.get(2026, {}).get(cat, {}).get(month, 0.0)
-            
+            new_val = target(r)
             if clean_numeric(r['amount']) != new_val:
                 r['amount'] = new_val
                 r['status'] = "지출" if new_val > 0 else "미지출"
@@ -929,166 +2881,716 @@ def sync_daily_to_master_auto():
 # -----------------------------------------------------------------------------
 # 엑셀 파일 읽기 엔진: 여러 시트 자동 탐색
 # -----------------------------------------------------------------------------
-def read_excel_sheets_flexible(uploaded_file):
-    """업로드 파일을 모든 시트 기준으로 header=None DataFrame dict로 반환합니다."""
+EXCEL_SNIFF_ROWS = 30  # 파서들이 헤더를 찾는 범위 (일반 25행, 특수 30행)
+
+def read_excel_sheet(xls, sheet_name, sniff=None):
+    """시트 하나를 header=None 으로 읽습니다. sniff 를 통과하지 못하면 None 을 돌려줍니다."""
+    if sniff is None:
+        return pd.read_excel(xls, sheet_name=sheet_name, header=None)
+    df = pd.read_excel(xls, sheet_name=sheet_name, header=None, nrows=EXCEL_SNIFF_ROWS)
+    if not df.dropna(how='all').empty and not sniff(df):
+        return None
+    if len(df) >= EXCEL_SNIFF_ROWS:
+        df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
+    return df
+
+def read_excel_sheets_flexible(uploaded_file, sniff=None):
+    """업로드 파일을 모든 시트 기준으로 header=None DataFrame dict로 반환합니다.
+
+    sniff(상위 행 DataFrame) 가 주어지면 각 시트의 앞부분만 읽어(openpyxl 읽기 전용 스트리밍) 검사하고,
+    통과한 시트만 전체를 읽습니다. 통과하지 못한 시트는 값이 None 입니다.
+    (통과한 시트에서 자료가 나오지 않을 때 모든 시트를 다시 읽는 것은 iter_parsed_sheets 가 맡습니다)
+    """
     uploaded_file.seek(0)
     name = uploaded_file.name.lower()
     if name.endswith('.csv'):
         return {"CSV": pd.read_csv(uploaded_file, header=None)}
 
+    ensure_excel_engine()
     xls = pd.ExcelFile(uploaded_file, engine='openpyxl')
     sheets = {}
     for sheet_name in xls.sheet_names:
         try:
-            df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
-            # 완전 빈 시트 제외
-            if not df.dropna(how='all').empty:
-                sheets[sheet_name] = df
+            df = read_excel_sheet(xls, sheet_name, sniff)
         except Exception:
             continue
+        if df is None:
+            sheets[sheet_name] = None
+        elif not df.dropna(how='all').empty:  # 완전 빈 시트 제외
+            sheets[sheet_name] = df
     return sheets
 
-def parse_general_from_uploaded_file(uploaded_file):
+def sniff_expense_sheet(df_head):
+    """지출명령 헤더(일자/적요/금액/예산과목 중 3개 이상)가 상위 행에 있는지 확인합니다."""
+    return detect_expense_header(df_head)[0] != -1
+
+def sniff_special_sheet(df_head):
+    """금액 헤더가 있거나 K열 제목에 5대 항목 키워드가 보이는지 확인합니다."""
+    if detect_special_amount_column(df_head)[0] != -1:
+        return True
+    if df_head.shape[1] <= 10:
+        return False
+    titles = cell_text(df_head.iloc[:, 10].values).str.replace(r'\s+', '', regex=True)
+    return bool((special_category_masks(titles) != "").any())
+
+# -----------------------------------------------------------------------------
+# 엑셀 시트 병렬 파싱 (프로세스 풀, 선택 사항)
+# - secrets 의 sheet_pool_workers 가 1 이상이면 시트가 여러 개인 워크북을 그 수만큼의 워커 프로세스로 나눠 파싱합니다.
+#   (기본 0 = 끔. 시트가 1개이거나 CSV 이거나 풀을 쓸 수 없으면 언제나 순차 파싱)
+# - 워커에는 DataFrame 대신 워크북 바이트, 시트 번호, 파서 종류만 보내고 워커가 직접 읽고 파싱합니다.
+# - Streamlit 서버 프로세스는 Firestore/SQLite/쓰기 큐 스레드를 돌리고 있어 fork 하면 잠금 상태째 복사되므로,
+#   워커는 spawn 으로 새로 띄웁니다. spawn 워커는 시작할 때 이 파일을 한 번 실행해 파서를 얻고(IN_POOL_WORKER),
+#   풀은 서버 프로세스당 하나를 계속 쓰므로 그 비용은 워커마다 한 번입니다.
+# - 워커는 작업마다 규칙 파일을 확인하고, 부모와 규칙 stamp 가 다르면 실패로 돌려 순차 파싱으로 넘어갑니다.
+# -----------------------------------------------------------------------------
+try:
+    SHEET_POOL_WORKERS = int(st.secrets.get("sheet_pool_workers", 0))
+except Exception:
+    SHEET_POOL_WORKERS = 0
+
+def sheet_parser(kind):
+    """파서 종류("general"/"special") -> (시트 파서, 상위 행 sniff)"""
+    if kind == "special":
+        return parse_special_expense_excel, sniff_special_sheet
+    return parse_expense_excel, sniff_expense_sheet
+
+@st.cache_resource
+def get_sheet_pool():
+    """시트 파싱 프로세스 풀 (서버 프로세스당 하나). 꺼져 있거나 워커 안이거나 만들 수 없으면 None"""
+    if SHEET_POOL_WORKERS < 1 or IN_POOL_WORKER:
+        return None
+    try:
+        return ProcessPoolExecutor(max_workers=SHEET_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    except Exception:
+        return None
+
+def _use_worker_rules(rules_stamp):
+    """워커 프로세스: 규칙 파일을 다시 확인하고, 요청한 쪽과 규칙 stamp 가 다르면 실패로 돌립니다."""
+    global RULES
+    RULES = refresh_rules()
+    if RULES.stamp != rules_stamp:
+        raise RuntimeError(f"워커의 분류 규칙({RULES.stamp})이 요청({rules_stamp})과 다릅니다.")
+
+def _parse_sheet_worker(kind, workbook_bytes, sheet_index, sniffed, rules_stamp):
+    """프로세스 풀 작업. (시트명, 상태, 파싱 결과) 상태: "ok" / "skipped"(sniff 미통과) / "empty"(빈 시트·읽기 실패)"""
+    _use_worker_rules(rules_stamp)
+    parser, sniff = sheet_parser(kind)
+    ensure_excel_engine()
+    xls = pd.ExcelFile(io.BytesIO(workbook_bytes), engine='openpyxl')
+    sheet_name = xls.sheet_names[sheet_index]
+    try:
+        df = read_excel_sheet(xls, sheet_name, sniff if sniffed else None)
+    except Exception:
+        return sheet_name, "empty", None
+    if df is None:
+        return sheet_name, "skipped", None
+    if df.dropna(how='all').empty:
+        return sheet_name, "empty", None
+    return sheet_name, "ok", parser(df)
+
+def parse_sheets_in_pool(pool, uploaded_file, kind, sniffed=True):
+    """시트별 [(시트명, 상태, 파싱 결과)] 를 시트 순서대로 돌려줍니다. 풀로 나눌 수 없으면 None (순차 파싱)
+
+    상태는 "ok" / "skipped"(sniff 미통과) 이고, 빈 시트는 뺍니다.
+    """
+    if uploaded_file.name.lower().endswith('.csv'):
+        return None
+    uploaded_file.seek(0)
+    workbook_bytes = uploaded_file.read()
+    try:
+        ensure_excel_engine()
+        n_sheets = len(pd.ExcelFile(io.BytesIO(workbook_bytes), engine='openpyxl').sheet_names)
+        if n_sheets < 2:
+            return None
+        futures = [pool.submit(_parse_sheet_worker, kind, workbook_bytes, i, sniffed, RULES.stamp) for i in range(n_sheets)]
+        results = [f.result() for f in futures]
+    except BrokenProcessPool:
+        get_sheet_pool.clear()  # 워커가 비정상 종료된 풀은 다시 쓸 수 없으므로 다음 파싱 때 새로 만듭니다
+        return None
+    except Exception:
+        return None  # 피클 실패(다른 세션 재실행으로 __main__ 이 바뀐 순간), 규칙 불일치 등
+    return [result for result in results if result[1] != "empty"]
+
+def parse_sheets(uploaded_file, kind, pool=None, sniffed=True):
+    """(시트명, 상태, 파싱 결과) 를 시트 순서대로 냅니다. (parse_sheets_in_pool 참고)
+
+    풀이 없거나 나눌 수 없으면 순차 파싱하며, 이때는 꺼내는 시트만 파싱합니다.
+    """
+    results = parse_sheets_in_pool(pool, uploaded_file, kind, sniffed) if pool is not None else None
+    if results is not None:
+        yield from results
+        return
+    parser, sniff = sheet_parser(kind)
+    for sheet_name, df_raw in read_excel_sheets_flexible(uploaded_file, sniff=sniff if sniffed else None).items():
+        yield (sheet_name, "skipped", None) if df_raw is None else (sheet_name, "ok", parser(df_raw))
+
+def iter_parsed_sheets(uploaded_file, kind, pool=None):
+    """업로드 파일의 (시트명, 파싱 결과) 를 시트 순서대로 냅니다. sniff 미통과 시트의 결과는 None 입니다.
+
+    pool 이 없으면 설정된 시트 파싱 풀(get_sheet_pool)을 쓰고, 그것도 없으면 순차 파싱합니다.
+    sniff 는 상위 행만 보므로, 통과한 시트에서 자료가 나오지 않고 건너뛴 시트가 있으면
+    헤더가 아래에 있거나 헤더 없는 양식일 수 있어 예전처럼 모든 시트를 전체로 읽어 다시 파싱합니다.
+    """
+    pool = pool or get_sheet_pool()
+    pending = []  # 자료가 나오기 전까지의 시트 (다시 파싱하게 되면 버립니다)
+    results = parse_sheets(uploaded_file, kind, pool)
+    for sheet_name, status, parsed in results:
+        pending.append((sheet_name, status, parsed))
+        if parsed:
+            break
+    else:
+        if any(status == "skipped" for _, status, _ in pending):
+            pending, results = [], parse_sheets(uploaded_file, kind, pool, sniffed=False)
+    for sheet_name, _, parsed in pending:
+        yield sheet_name, parsed
+    for sheet_name, _, parsed in results:
+        yield sheet_name, parsed
+
+def parse_general_from_uploaded_file(uploaded_file, pool=None):
     """일반 일상경비 업로드: 모든 시트를 검사해 최초로 인식되는 시트를 사용합니다."""
-    sheets = read_excel_sheets_flexible(uploaded_file)
     attempts = []
-    for sheet_name, df_raw in sheets.items():
-        parsed = parse_expense_excel(df_raw)
+    for sheet_name, parsed in iter_parsed_sheets(uploaded_file, "general", pool):
         count = len(parsed) if parsed else 0
         attempts.append((sheet_name, count))
         if parsed:
             return sheet_name, parsed, attempts
     return None, None, attempts
 
-def parse_special_from_uploaded_file(uploaded_file):
+def parse_special_from_uploaded_file(uploaded_file, pool=None):
     """특수 양식 업로드: 모든 시트를 검사해 처리 가능한 시트를 사용합니다."""
-    sheets = read_excel_sheets_flexible(uploaded_file)
     attempts = []
     best_sheet, best_parsed = None, None
-    for sheet_name, df_raw in sheets.items():
-        parsed = parse_special_expense_excel(df_raw)
+    for sheet_name, parsed in iter_parsed_sheets(uploaded_file, "special", pool):
         count = len(parsed) if parsed else 0
         attempts.append((sheet_name, count))
         if parsed and (best_parsed is None or len(parsed) > len(best_parsed)):
             best_sheet, best_parsed = sheet_name, parsed
     return best_sheet, best_parsed, attempts
 
+# -----------------------------------------------------------------------------
+# 업로드 파싱 결과 디스크 캐시
+# - 키: 파일 내용 md5 + 파서 이름 + 파서 버전. 같은 파일을 다른 세션/새로고침 후 다시 올려도 바로 결과를 씁니다.
+# - parse_cache/ 아래에 키별 JSON 파일로 저장하고, 파일 수정 시각을 최근 사용 시각으로 삼아
+#   전체 크기가 PARSE_CACHE_MAX_BYTES 를 넘으면 오래 안 쓴 것부터 지웁니다.
+# - 파서 결과가 바뀌는 수정을 하면 UPLOAD_PARSERS 의 버전을 올려 이전 결과를 무효화합니다.
+# -----------------------------------------------------------------------------
+PARSE_CACHE_DIR = "parse_cache"
+PARSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class ParseResultCache:
+    def __init__(self, root=PARSE_CACHE_DIR, max_bytes=PARSE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # 최근 사용 표시
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.root, exist_ok=True)  # 실행 중 폴더가 지워진 경우
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            try: os.remove(tmp)
+            except OSError: pass
+            return
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".json"):
+                try:
+                    info = entry.stat()
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+                except OSError:
+                    continue
+        return entries
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+
+    def stats(self):
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries), "hits": self.hits, "misses": self.misses}
+
+@st.cache_resource
+def get_parse_cache():
+    return ParseResultCache()
+
+# 업로드 종류 -> (파싱 함수, 파서 버전)
+UPLOAD_PARSERS = {
+    "general": (parse_general_from_uploaded_file, 1),
+    "special": (parse_special_from_uploaded_file, 1),
+}
+
+def parse_cache_key(kind, file_hash):
+    """파일 내용 + 파서 버전 + 분류 규칙 stamp (예산과목 코드표/강제 분류가 파싱 결과에 들어가므로)"""
+    parser, version = UPLOAD_PARSERS[kind]
+    return f"{file_hash}-{parser.__name__}-v{version}-r{RULES.stamp}"
+
+def parse_upload_cached(kind, uploaded_file, file_hash):
+    """UPLOAD_PARSERS[kind] 로 업로드 파일을 파싱합니다. 같은 내용·같은 파서 버전이면 디스크 캐시 결과를 씁니다."""
+    parser = UPLOAD_PARSERS[kind][0]
+    key = parse_cache_key(kind, file_hash)
+    cache = get_parse_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        return hit["sheet"], hit["rows"], [tuple(a) for a in hit["attempts"]]
+    sheet_name, parsed, attempts = parser(uploaded_file)
+    cache.put(key, {"sheet": sheet_name, "rows": parsed, "attempts": attempts})
+    return sheet_name, parsed, attempts
+
+# -----------------------------------------------------------------------------
+# 여러 파일 일괄 업로드
+# - 파일마다 양식(일반/5대 용역)을 상위 행으로 판별하고, 캐시에 없는 파일만 파싱합니다.
+# - 모든 파일을 한 번에 병합(merge_expense_batches)한 뒤 일상경비 저장과 원장 동기화를 한 번씩만 합니다.
+# -----------------------------------------------------------------------------
+UPLOAD_KIND_LABELS = {"general": "일반", "special": "5대 용역"}
+
+class NamedBytesIO(io.BytesIO):
+    """업로드 파일처럼 name 속성을 가진 BytesIO (파서는 확장자로 CSV 여부를 판단)"""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+def detect_upload_kind(uploaded_file):
+    """지출명령 헤더가 보이는 시트가 있으면 "general", 5대 용역 시트만 보이면 "special" 입니다."""
+    if uploaded_file.name.lower().endswith('.csv'):
+        return "general"
+    special = False
+    try:
+        ensure_excel_engine()
+        uploaded_file.seek(0)
+        xls = pd.ExcelFile(uploaded_file, engine='openpyxl')
+        for sheet_name in xls.sheet_names:
+            df_head = pd.read_excel(xls, sheet_name=sheet_name, header=None, nrows=EXCEL_SNIFF_ROWS)
+            if df_head.dropna(how='all').empty:
+                continue
+            if sniff_expense_sheet(df_head):
+                return "general"
+            special = special or sniff_special_sheet(df_head)
+    except Exception:
+        pass
+    return "special" if special else "general"
+
+UPLOAD_PARSE_THREADS = 4
+
+def _parse_upload_file(kind, file_name, data, rules_stamp=None):
+    """파일 하나를 파싱합니다. (시트명, 행 목록, 시도 목록, 초) rules_stamp 는 프로세스 풀 워커에서만 줍니다."""
+    if rules_stamp is not None:
+        _use_worker_rules(rules_stamp)
+    start = time.perf_counter()
+    sheet_name, parsed, attempts = UPLOAD_PARSERS[kind][0](NamedBytesIO(data, file_name))
+    return sheet_name, parsed, attempts, time.perf_counter() - start
+
+def parse_uploads_batch(uploads, pool=None):
+    """uploads: [{"file", "kind", "data", "hash"}] 를 파싱해 같은 순서의 결과 목록을 돌려줍니다.
+
+    캐시에 있는 파일은 바로 쓰고, 나머지는 동시에 파싱합니다. 시트 파싱 풀(get_sheet_pool)이 있으면 파일마다
+    워커 프로세스에, 없으면 스레드에 맡깁니다. (풀에서 실패한 파일은 이 프로세스에서 다시 파싱)
+    결과는 입력 순서대로 모으고, 캐시 기록은 이 스레드에서만 합니다.
+    """
+    cache = get_parse_cache()
+    pool = pool or get_sheet_pool()
+    keys = [parse_cache_key(up["kind"], up["hash"]) for up in uploads]
+    results = [None] * len(uploads)
+    misses = []
+    for i, key in enumerate(keys):
+        start = time.perf_counter()
+        hit = cache.get(key)
+        if hit is not None:
+            results[i] = (hit["sheet"], hit["rows"], [tuple(a) for a in hit["attempts"]], time.perf_counter() - start, True)
+        else:
+            misses.append(i)
+
+    if misses:
+        jobs = {}
+        if pool is not None:
+            try:
+                for i in misses:
+                    jobs[i] = pool.submit(_parse_upload_file, uploads[i]["kind"], uploads[i]["file"], uploads[i]["data"], RULES.stamp)
+            except Exception:
+                pass  # 풀을 쓸 수 없으면 남은 파일은 스레드로
+        pooled = set(jobs)
+        with ThreadPoolExecutor(max_workers=min(len(misses), UPLOAD_PARSE_THREADS)) as threads:
+            for i in misses:
+                if i not in jobs:
+                    jobs[i] = threads.submit(_parse_upload_file, uploads[i]["kind"], uploads[i]["file"], uploads[i]["data"])
+            for i in misses:
+                try:
+                    sheet_name, parsed, attempts, seconds = jobs[i].result()
+                except Exception as e:
+                    if i not in pooled:
+                        raise
+                    if isinstance(e, BrokenProcessPool):
+                        get_sheet_pool.clear()
+                    # 워커 비정상 종료·피클 실패·규칙 불일치 등 풀 쪽 실패는 이 프로세스에서 다시 파싱합니다.
+                    sheet_name, parsed, attempts, seconds = _parse_upload_file(uploads[i]["kind"], uploads[i]["file"], uploads[i]["data"])
+                cache.put(keys[i], {"sheet": sheet_name, "rows": parsed, "attempts": attempts})
+                results[i] = (sheet_name, parsed, attempts, seconds, False)
+
+    return [
+        {"file": up["file"], "kind": up["kind"], "sheet": sheet_name, "rows": parsed or [],
+         "attempts": attempts, "seconds": seconds, "cached": cached}
+        for up, (sheet_name, parsed, attempts, seconds, cached) in zip(uploads, results)
+    ]
+
+def import_uploads_batch(uploads):
+    """여러 파일을 파싱해 한 번에 병합하고, 일상경비 저장과 원장 동기화를 한 번씩 합니다. 파일별 보고서를 돌려줍니다."""
+    start = time.perf_counter()
+    results = parse_uploads_batch(uploads)
+    parse_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merged, added_counts, delta = merge_expense_batches(st.session_state.get('daily_expenses', []), [r["rows"] for r in results])
+    saved = False
+    if sum(added_counts) > 0 and save_daily_expenses(merged):
+        st.session_state['daily_expenses'] = merged
+        sync_daily_to_master_auto(delta)
+        saved = True
+    save_sec = time.perf_counter() - start
+
+    files = [{
+        "파일": r["file"], "양식": UPLOAD_KIND_LABELS[r["kind"]], "반영 시트": r["sheet"] or "-",
+        "인식 건수": len(r["rows"]), "신규 반영": added if saved else 0,
+        "파싱(초)": round(r["seconds"], 3), "캐시": "✅" if r["cached"] else "",
+    } for r, added in zip(results, added_counts)]
+    return {"files": files, "added": sum(added_counts) if saved else 0, "saved": saved,
+            "parse_sec": parse_sec, "save_sec": save_sec}
+
 # -----------------------------------------------------------------------------
 # 엑셀 파싱 엔진 
 # -----------------------------------------------------------------------------
-def parse_expense_excel(df_raw):
-    header_idx = -1; found_cols = {}
-    keyword_detect = {
-        '집행일자': ['지급일자','지급일','지급명령일자','일자','날짜','집행일','결의일자'], 
-        '적요': ['적요','내용','품명','건명'], 
-        '집행금액': ['지급명령금액','지급액','지출금액','금액','집행액','지출액','결재금액'],
-        '예산과목': ['예산과목', '과목명', '항목', '예산항목', '편성목']
-    }
-    
+# -----------------------------------------------------------------------------
+# 지출명령 엑셀 열 단위(벡터) 파서
+# - 헤더를 한 번 찾은 뒤 일자/적요/금액/예산과목 열을 pandas 문자열·숫자 연산으로 한꺼번에 정리하고,
+#   세목 명칭은 규칙 파일의 budget_mapping 표(RULES.budget_frame)와 merge 해서 만듭니다.
+# - 결과는 기존 행 단위 파서와 완전히 같아야 하며, tests/test_parsers.py 가 합성 시트로 두 결과를 비교합니다.
+# -----------------------------------------------------------------------------
+EXPENSE_HEADER_KEYWORDS = {
+    '집행일자': ['지급일자','지급일','지급명령일자','일자','날짜','집행일','결의일자'],
+    '적요': ['적요','내용','품명','건명'],
+    '집행금액': ['지급명령금액','지급액','지출금액','금액','집행액','지출액','결재금액'],
+    '예산과목': ['예산과목', '과목명', '항목', '예산항목', '편성목']
+}
+BUDGET_CODE_PATTERN = r'^\d+(-\d+)?$'
+NULL_TEXTS = ["nan", "NaT", "None"]
+
+def detect_expense_header(df_raw):
+    """상단 25행에서 지출명령 헤더 행을 찾습니다. (헤더 행 번호, {항목: 열 번호}) / 못 찾으면 (-1, {})"""
     for i in range(min(25, len(df_raw))):
         row_vals = [re.sub(r'\s+', '', str(v)) for v in df_raw.iloc[i]]
         temp_map = {}
-        for k, kws in keyword_detect.items():
+        for k, kws in EXPENSE_HEADER_KEYWORDS.items():
             for idx, val in enumerate(row_vals):
                 if any(kw in val for kw in kws): temp_map[k] = idx; break
-        if len(temp_map) >= 3: 
-            header_idx = i; found_cols = temp_map; break
-            
+        if len(temp_map) >= 3:
+            return i, temp_map
+    return -1, {}
+
+def cell_text(values):
+    """각 셀에 `str(v).strip() if pd.notna(v) else ""` 를 적용한 문자열 Series."""
+    values = np.asarray(values)
+    notna = pd.notna(values)
+    if values.dtype == object:
+        # map 결과가 Arrow 문자열로 추론되면 정규식이 RE2(ASCII \d)로 바뀌므로 object 로 고정
+        text = pd.Series(values, dtype=object).map(str).astype(object)
+    else:
+        # iterrows 와 같은 numpy 스칼라의 str() 결과를 쓰기 위해 원소 단위로 변환
+        text = pd.Series([str(v) for v in values], dtype=object)
+    if len(text) == 0:
+        return text
+    return text.str.strip().where(notna, "")
+
+def clean_numeric_array(values):
+    """clean_numeric 을 배열 전체에 적용한 것과 같은 float ndarray."""
+    values = np.asarray(values)
+    if values.dtype == np.float64:
+        out = values.astype(float)
+        out[~np.isfinite(out)] = 0.0
+        return out
+    s = pd.Series(values if values.dtype == object else list(values), dtype=object)
+    out = np.zeros(len(s))
+    if len(s) == 0:
+        return out
+    na = s.isna().to_numpy()
+    is_num = s.map(lambda v: isinstance(v, (int, float))).to_numpy(dtype=bool) & ~na
+    if is_num.any():
+        nums = s[is_num].astype(float).to_numpy(copy=True)
+        nums[~np.isfinite(nums)] = 0.0
+        out[is_num] = nums
+    is_text = ~is_num & ~na
+    if is_text.any():
+        digits = s[is_text].map(str).str.split('#', n=1).str[0].str.replace(r'[^0-9\.\-]', '', regex=True)
+        # float() 가 받아들이는 형태만 변환 (나머지는 clean_numeric 과 같이 0.0)
+        valid = digits.str.match(r'^-?(?:\d+\.?\d*|\.\d+)$').to_numpy(dtype=bool)
+        text_vals = np.zeros(len(digits))
+        if valid.any():
+            text_vals[valid] = digits[valid].map(float).to_numpy(dtype=float)
+        out[is_text] = text_vals
+    return out
+
+def _force_categories(desc, semok, budget, amount):
+    """force_mapped_category_for_known_cases 를 열 단위로 적용합니다. (일괄 지급건 금액 판정이 우선)"""
+    text = (desc + semok + budget).str.replace(" ", "", regex=False).str.upper()
+    asset = text.str.contains(RULES.asset_pattern, regex=True).to_numpy(dtype=bool)
+    forced = np.where(asset, "수탁자산취득비", None)
+    rounded = np.rint(np.asarray(amount, dtype=float))
+    for forced_amount, category in RULES.forced_amount_categories.items():
+        forced = np.where(rounded == forced_amount, category, forced)
+    return pd.Series(forced, index=desc.index, dtype=object)
+
+def _parse_expense_fallback(df_raw):
+    """[V10] 헤더 인식 실패 대비: A=지급일자, B=적요, C=지급명령금액 형태의 단순 지출명령 자료 보완"""
+    values = df_raw.values
+    if values.ndim != 2 or values.shape[1] < 3 or values.shape[0] == 0:
+        return None
+    desc = cell_text(values[:, 1])
+    amount = clean_numeric_array(values[:, 2])
+    keep = ((desc != "") & ~desc.str.contains("합계", regex=False) & (amount > 0)).to_numpy()
+    if not keep.any():
+        return None
+    desc = desc[keep].reset_index(drop=True)
+    amount = amount[keep]
+    date = cell_text(values[keep, 0])
+    empty = pd.Series([""] * len(desc), dtype=object)
+    forced = _force_categories(desc, empty, empty, amount)
+    rows = [
+        {"세목": cat, "집행일자": d, "적요": t, "집행금액": a, "예산과목": cat}
+        for cat, d, t, a in zip(forced, date, desc, amount.tolist()) if cat
+    ]
+    return rows if rows else None
+
+def parse_expense_excel(df_raw):
+    header_idx, found_cols = detect_expense_header(df_raw)
     if header_idx == -1:
-        # [V10] 헤더 인식 실패 대비: A=지급일자, B=적요, C=지급명령금액 형태의 단순 지출명령 자료 보완
-        fallback_rows = []
-        for _, row in df_raw.iterrows():
-            row_arr = row.values
-            if len(row_arr) < 3:
-                continue
-            date_val = str(row_arr[0]).strip() if pd.notna(row_arr[0]) else ""
-            desc = str(row_arr[1]).strip() if pd.notna(row_arr[1]) else ""
-            amt_val = clean_numeric(row_arr[2])
-            if not desc or "합계" in desc or amt_val <= 0:
-                continue
-            forced_cat = force_mapped_category_for_known_cases(desc, "", "", amt_val)
-            if forced_cat:
-                fallback_rows.append({
-                    "세목": forced_cat,
-                    "집행일자": date_val,
-                    "적요": desc,
-                    "집행금액": amt_val,
-                    "예산과목": forced_cat
-                })
-        return fallback_rows if fallback_rows else None
-        
-    data_rows = df_raw.iloc[header_idx+1:].copy()
-    new_processed = []
-    
+        return _parse_expense_fallback(df_raw)
+
     row_header_vals = [re.sub(r'\s+', '', str(v)) for v in df_raw.iloc[header_idx]]
     fallback_semok_idx = -1
     for idx, val in enumerate(row_header_vals):
         if any(kw in val for kw in ['세목','과목','항목']): fallback_semok_idx = idx; break
 
-    for _, row in data_rows.iterrows():
-        row_arr = row.values
-        desc_idx = found_cols.get('적요', -1)
-        desc = str(row_arr[desc_idx]).strip() if desc_idx != -1 and pd.notna(row_arr[desc_idx]) else ""
-        if not desc or "합계" in desc: continue
-        
-        b_val = str(row_arr[1]).strip() if len(row_arr) > 1 and pd.notna(row_arr[1]) else ""
-        f_val = str(row_arr[5]).strip() if len(row_arr) > 5 and pd.notna(row_arr[5]) else ""
-        g_val = str(row_arr[6]).strip() if len(row_arr) > 6 and pd.notna(row_arr[6]) else ""
-        
-        budget_idx = found_cols.get('예산과목', -1)
-        if budget_idx != -1 and len(row_arr) > budget_idx:
-            budget_subj = str(row_arr[budget_idx]).strip() if pd.notna(row_arr[budget_idx]) else ""
-        else:
-            budget_subj = str(row_arr[8]).strip() if len(row_arr) > 8 and pd.notna(row_arr[8]) else ""
-        
-        # [V292 절대 명령 반영] I열 값이 일반재료비면 확보
-        col_i_val = str(row_arr[8]).replace(" ", "") if len(row_arr) > 8 and pd.notna(row_arr[8]) else ""
-        if "일반재료비" in col_i_val:
-            budget_subj = "일반재료비"
-
-        semok_str = ""
-        if b_val and (not f_val or not g_val):
-            if b_val in BUDGET_MAPPING: f_val, g_val = BUDGET_MAPPING[b_val]
-        
-        if re.match(r'^\d+(-\d+)?$', b_val) and f_val and g_val:
-            b_prefix = b_val.split('-')[0]
-            semok_str = f"[{b_prefix}]{f_val} - [{b_val}]{g_val}"
-        else:
-            if fallback_semok_idx != -1 and pd.notna(row_arr[fallback_semok_idx]):
-                semok_str = str(row_arr[fallback_semok_idx]).strip()
-            elif re.match(r'^\d+(-\d+)?$', b_val):
-                semok_str = b_val
-        
-        date_idx = found_cols.get('집행일자', -1)
-        date_val = str(row_arr[date_idx]).strip() if date_idx != -1 and pd.notna(row_arr[date_idx]) else ""
-        amt_idx = found_cols.get('집행금액', -1)
-        amt_val = clean_numeric(row_arr[amt_idx]) if amt_idx != -1 else 0
-        
-        if semok_str in ["nan", "NaT", "None"]: semok_str = ""
-        if date_val in ["nan", "NaT", "None"]: date_val = ""
-        if desc in ["nan", "NaT", "None"]: desc = ""
-        if budget_subj in ["nan", "NaT", "None"]: budget_subj = ""
-
-        # 예산과목 컬럼이 없는 지출명령 양식 보완:
-        # 적요에 조달구매/포충기/방화벽/보안장비/자동심장충격기 등이 있으면
-        # 수탁자산취득비로 저장하여 항목별 분석과 신속집행 대시보드 모두에서 집계되게 합니다.
-        forced_cat = force_mapped_category_for_known_cases(desc, semok_str, budget_subj, amt_val)
-        if forced_cat == "수탁자산취득비":
-            semok_str = "수탁자산취득비"
-            budget_subj = "수탁자산취득비"
-        elif forced_cat == "세탁용역":
-            semok_str = "세탁용역"
-            budget_subj = "세탁용역"
-        
-        new_processed.append({
-            "세목": semok_str, 
-            "집행일자": date_val, 
-            "적요": desc, 
-            "집행금액": amt_val,
-            "예산과목": budget_subj
-        })
-        
-    return new_processed
+    # iterrows 와 같은 값을 보도록 행 단위 파서와 동일하게 DataFrame.values(공통 dtype)를 사용
+    values = df_raw.iloc[header_idx+1:].values
+    n_cols = values.shape[1]
+    desc_idx = found_cols.get('적요', -1)
+    if len(values) == 0 or desc_idx == -1:
+        return []
+    desc = cell_text(values[:, desc_idx])
+    keep = ((desc != "") & ~desc.str.contains("합계", regex=False)).to_numpy()
+    if not keep.any():
+        return []
+    values = values[keep]
+    desc = desc[keep].reset_index(drop=True)
+    n = len(desc)
+    empty = pd.Series([""] * n, dtype=object)
+
+    def col_text(idx):
+        return cell_text(values[:, idx]) if 0 <= idx < n_cols else empty.copy()
+
+    b_val, f_val, g_val = col_text(1), col_text(5), col_text(6)
+    budget_idx = found_cols.get('예산과목', -1)
+    budget = col_text(budget_idx) if budget_idx != -1 and n_cols > budget_idx else col_text(8)
+
+    # [V292 절대 명령 반영] I열 값이 일반재료비면 확보
+    if n_cols > 8:
+        budget = budget.mask(col_text(8).str.replace(" ", "", regex=False).str.contains("일반재료비", regex=False), "일반재료비")
+
+    mapped = pd.DataFrame({"b_val": b_val}).merge(RULES.budget_frame, on="b_val", how="left")
+    use_map = ((b_val != "") & ((f_val == "") | (g_val == "")) & mapped["map_f"].notna()).to_numpy()
+    f_val = f_val.mask(use_map, mapped["map_f"])
+    g_val = g_val.mask(use_map, mapped["map_g"])
+
+    is_code = b_val.str.match(BUDGET_CODE_PATTERN).fillna(False).astype(bool)
+    full_name = "[" + b_val.str.split('-').str[0] + "]" + f_val + " - [" + b_val + "]" + g_val
+    semok = pd.Series(np.where(is_code & (f_val != "") & (g_val != ""), full_name, None), dtype=object)
+    rest = semok.isna()
+    if fallback_semok_idx != -1:
+        has_fallback = pd.notna(values[:, fallback_semok_idx])
+        semok = semok.mask(rest & has_fallback, cell_text(values[:, fallback_semok_idx]))
+        rest = rest & ~has_fallback
+    semok = semok.mask(rest & is_code, b_val).mask(rest & ~is_code, "")
+
+    date_idx = found_cols.get('집행일자', -1)
+    date = col_text(date_idx) if date_idx != -1 else empty.copy()
+    amt_idx = found_cols.get('집행금액', -1)
+    amount = clean_numeric_array(values[:, amt_idx]).tolist() if amt_idx != -1 else [0] * n
+
+    semok = semok.mask(semok.isin(NULL_TEXTS), "")
+    date = date.mask(date.isin(NULL_TEXTS), "")
+    desc = desc.mask(desc.isin(NULL_TEXTS), "")
+    budget = budget.mask(budget.isin(NULL_TEXTS), "")
+
+    # 예산과목 컬럼이 없는 지출명령 양식 보완:
+    # 적요에 조달구매/포충기/방화벽/보안장비/자동심장충격기 등이 있으면
+    # 수탁자산취득비로 저장하여 항목별 분석과 신속집행 대시보드 모두에서 집계되게 합니다.
+    forced = _force_categories(desc, semok, budget, amount)
+    forced_mask = forced.isin(["수탁자산취득비", "세탁용역"])
+    semok = semok.mask(forced_mask, forced)
+    budget = budget.mask(forced_mask, forced)
+
+    return [
+        {"세목": s_, "집행일자": d_, "적요": t_, "집행금액": a_, "예산과목": b_}
+        for s_, d_, t_, a_, b_ in zip(semok, date, desc, amount, budget)
+    ]
+
+# -----------------------------------------------------------------------------
+# 5대 용역/수수료 파서
+# - 지급월은 B열/K열 전체를 서로 다른 값마다 한 번씩만 해석하고(parse_special_months),
+#   분류는 SPECIAL_CATEGORY_RULES 키워드 마스크, 금액 보완은 숫자 블록의 행별 최댓값으로 처리합니다.
+# - 결과는 기존 행 단위 파서와 같아야 하며, tests/test_parsers.py 가 합성 시트로 두 결과를 비교합니다.
+# -----------------------------------------------------------------------------
+# (분류, [키워드 묶음, ...]) : 묶음 안의 키워드가 모두 들어 있으면 해당. 위에서부터 우선 적용
+SPECIAL_CATEGORY_RULES = [
+    ("신용카드수수료", [("신용카드", "수수료")]),
+    ("무인경비", [("무인경비",)]),
+    # 고객편의기기 관리용역 = 공청기/비데 비용
+    ("공청기비데", [("고객편의기기관리용역",), ("고객편의기기",), ("공기청정기",), ("공청기",), ("비데",)]),
+    ("야간경비", [("야간경비",), ("당직용역",)]),
+    ("환경용역", [("청소용역",), ("환경용역",), ("미화용역",)]),
+]
+SPECIAL_AMOUNT_KEYWORDS = ['금액', '집행액', '지출액', '결재금액', '청구액', '지급액']
+
+def normalize_special_text(v):
+    if pd.isna(v):
+        return ""
+    s = str(v).strip()
+    if s in NULL_TEXTS:
+        return ""
+    return re.sub(r'\s+', '', s)
+
+def parse_special_month(v):
+    """지급월 값을 1~12 정수로 변환. 0월은 무효 처리."""
+    if pd.isna(v):
+        return 0
+    s = str(v).strip()
+    if not s or s in NULL_TEXTS:
+        return 0
+
+    # 엑셀 날짜/판다스 Timestamp 대응
+    try:
+        dt = pd.to_datetime(v, errors='coerce')
+        if pd.notna(dt) and 1 <= int(dt.month) <= 12:
+            return int(dt.month)
+    except Exception:
+        pass
+
+    # '2026년 1월', '1월'
+    m = re.search(r'(?:20\d{2}\s*년\s*)?(1[0-2]|0?[1-9])\s*월', s)
+    if m:
+        return int(m.group(1))
+
+    # '2026-01-15', '2026.01', '2026/1'
+    m = re.search(r'20\d{2}\D+(1[0-2]|0?[1-9])(?:\D|$)', s)
+    if m:
+        return int(m.group(1))
+
+    # 숫자만 있는 경우: 1~12만 인정, 0은 무효
+    m = re.search(r'^0?([1-9]|1[0-2])(?:\.0)?$', s)
+    if m:
+        return int(float(s))
+
+    return 0
+
+# pd.to_datetime 을 목록으로 한 번에 호출해도 값마다 호출한 것과 결과가 같은 타입
+# (문자열은 형식 추론, 날짜는 시간대 통일 때문에 제외하고 값별 캐시만 사용)
+BATCH_DATETIME_TYPES = (int, float, np.integer, np.floating)
+
+def _fill_special_month_memo(keys, memo):
+    """(타입, 값) 키들의 지급월을 계산해 memo 에 채웁니다. 숫자 타입은 타입별로 묶어 한 번에 변환합니다."""
+    by_type = {}
+    for kind, v in keys:
+        by_type.setdefault(kind, []).append(v)
+    for kind, vals in by_type.items():
+        if len(vals) > 1 and issubclass(kind, BATCH_DATETIME_TYPES) and not issubclass(kind, (bool, np.bool_)):
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    months = pd.to_datetime(pd.Index(vals, dtype=object), errors='coerce').month
+            except Exception:
+                months = None  # 범위를 벗어난 값 등으로 실패하면 값마다 변환
+            if months is not None:
+                for v, m in zip(vals, months):
+                    # 날짜로 해석되지 않은 값만 문자열 규칙(parse_special_month)으로 다시 확인
+                    memo[(kind, v)] = int(m) if pd.notna(m) and 1 <= m <= 12 else parse_special_month(v)
+                continue
+        for v in vals:
+            memo[(kind, v)] = parse_special_month(v)
+
+def parse_special_months(values, memo=None):
+    """parse_special_month 를 열 전체에 적용한 정수 ndarray.
+
+    pd.to_datetime 해석이 값의 타입에 따라 달라지므로(1 과 '1' 과 1.0) 타입과 값을 함께 키로 삼아
+    서로 다른 값마다 한 번씩만 해석합니다. 지급월 열은 보통 12개 안팎의 값만 반복됩니다.
+    """
+    memo = {} if memo is None else memo
+    keys = [None if v is None or (isinstance(v, float) and math.isnan(v)) else (type(v), v) for v in values]
+    missing = {key for key in keys if key is not None and key not in memo}
+    if missing:
+        _fill_special_month_memo(missing, memo)
+    return np.array([memo[key] if key is not None else 0 for key in keys], dtype=int)
+
+def special_category_masks(titles):
+    """SPECIAL_CATEGORY_RULES 를 공백 제거 제목 Series 에 적용한 분류 Series. (해당 없음은 "")"""
+    masks = []
+    for _, groups in SPECIAL_CATEGORY_RULES:
+        hit = np.zeros(len(titles), dtype=bool)
+        for group in groups:
+            in_group = np.ones(len(titles), dtype=bool)
+            for kw in group:
+                in_group &= titles.str.contains(kw, regex=False).to_numpy(dtype=bool)
+            hit |= in_group
+        masks.append(hit)
+    categories = [category for category, _ in SPECIAL_CATEGORY_RULES]
+    return pd.Series(np.select(masks, categories, "").tolist(), index=titles.index, dtype=object)
+
+def detect_special_amount_column(df_raw):
+    """상위 30행에서 금액 헤더 위치를 찾습니다. (헤더 행, 금액 열) 없으면 (-1, -1)"""
+    for i in range(min(30, len(df_raw))):
+        for idx, v in enumerate(df_raw.iloc[i]):
+            val = normalize_special_text(v)
+            if any(kw in val for kw in SPECIAL_AMOUNT_KEYWORDS):
+                return i, idx
+    return -1, -1
+
+def _numeric_block(block):
+    """2차원 셀 블록에 clean_numeric 을 적용한 float 행렬."""
+    if block.size == 0:
+        return np.zeros(block.shape)
+    return clean_numeric_array(block.ravel()).reshape(block.shape)
 
 def parse_special_expense_excel(df_raw):
     """5대 용역/수수료 전용 양식 파싱
@@ -1103,164 +3605,66 @@ def parse_special_expense_excel(df_raw):
     - 제목에 '2026년 0월 ...' 같은 잘못된 월이 있어도 B열 지급월을 우선 사용
     - 금액 컬럼명이 없거나 위치가 달라도 행 안의 금액 후보를 최대한 탐색
     """
-    def normalize_text(v):
-        if pd.isna(v):
-            return ""
-        s = str(v).strip()
-        if s in ["nan", "NaT", "None"]:
-            return ""
-        return re.sub(r'\s+', '', s)
-
-    def parse_month_from_value(v):
-        """지급월 값을 1~12 정수로 변환. 0월은 무효 처리."""
-        if pd.isna(v):
-            return 0
-        s = str(v).strip()
-        if not s or s in ["nan", "NaT", "None"]:
-            return 0
-
-        # 엑셀 날짜/판다스 Timestamp 대응
-        try:
-            dt = pd.to_datetime(v, errors='coerce')
-            if pd.notna(dt) and 1 <= int(dt.month) <= 12:
-                return int(dt.month)
-        except Exception:
-            pass
-
-        # '2026년 1월', '1월'
-        m = re.search(r'(?:20\d{2}\s*년\s*)?(1[0-2]|0?[1-9])\s*월', s)
-        if m:
-            return int(m.group(1))
-
-        # '2026-01-15', '2026.01', '2026/1'
-        m = re.search(r'20\d{2}\D+(1[0-2]|0?[1-9])(?:\D|$)', s)
-        if m:
-            return int(m.group(1))
-
-        # 숫자만 있는 경우: 1~12만 인정, 0은 무효
-        m = re.search(r'^0?([1-9]|1[0-2])(?:\.0)?$', s)
-        if m:
-            return int(float(s))
-
-        return 0
-
-    def map_special_category(title):
-        t = normalize_text(title)
-        if not t:
-            return ""
-        # 5대 특수항목 강제 분류
-        if "신용카드" in t and "수수료" in t:
-            return "신용카드수수료"
-        if "무인경비" in t:
-            return "무인경비"
-        # 고객편의기기 관리용역 = 공청기/비데 비용
-        if (
-            "고객편의기기관리용역" in t
-            or "고객편의기기" in t
-            or "공기청정기" in t
-            or "공청기" in t
-            or "비데" in t
-        ):
-            return "공청기비데"
-        if "야간경비" in t or "당직용역" in t:
-            return "야간경비"
-        if "청소용역" in t or "환경용역" in t or "미화용역" in t:
-            return "환경용역"
-        return ""
-
-    # 금액 컬럼 위치 탐색
-    header_idx = -1
-    amt_idx = -1
-    for i in range(min(30, len(df_raw))):
-        row_vals = [normalize_text(v) for v in df_raw.iloc[i]]
-        for idx, val in enumerate(row_vals):
-            if any(kw in val for kw in ['금액', '집행액', '지출액', '결재금액', '청구액', '지급액']):
-                header_idx = i
-                amt_idx = idx
-                break
-        if header_idx != -1:
-            break
-
-    # header가 잡히면 그 다음 행부터, 아니면 전체 행 검사
-    data_rows = df_raw.iloc[header_idx+1:].copy() if header_idx != -1 else df_raw.copy()
-    new_processed = []
-
-    for _, row in data_rows.iterrows():
-        row_arr = row.values
-        if len(row_arr) <= 10:
-            continue
-
-        month_raw = row_arr[1]       # B열 지급월
-        title_raw = row_arr[10]      # K열 문서제목
-        title_val = str(title_raw).strip() if not pd.isna(title_raw) else ""
-        title_no_space = normalize_text(title_raw)
-
-        if not title_no_space or "합계" in title_no_space:
-            continue
-
-        # 기름걸레 등 다른 비용이 특수항목으로 섞이는 것 방지
-        if "기름" in title_no_space and "걸레" in title_no_space:
-            continue
-
-        mapped_cat = map_special_category(title_val)
-        if not mapped_cat:
-            continue
-
-        # 월은 B열 지급월을 최우선 사용. B열이 비어 있거나 무효일 때만 제목 보조 사용.
-        month = parse_month_from_value(month_raw)
-        if month == 0:
-            month = parse_month_from_value(title_val)
-        # [V5] 제목이 "2026년 0월"이고 B열도 비정상인 경우, 행 앞쪽의 다른 월 후보를 보조 탐색
-        if month == 0:
-            for x in list(row_arr[:10]):
-                m_try = parse_month_from_value(x)
-                if 1 <= m_try <= 12:
-                    month = m_try
-                    break
-        if month == 0 or not (1 <= month <= 12):
-            continue
-
-        # 금액 추출: 금액 헤더 우선, 실패 시 L열 이후, 그래도 실패 시 전체 행에서 후보 탐색
-        amt_val = 0.0
-        if amt_idx != -1 and len(row_arr) > amt_idx:
-            amt_val = clean_numeric(row_arr[amt_idx])
-
-        if amt_val <= 0:
-            # 보통 K열 제목 다음 L열 이후에 금액이 있는 경우
-            nums = []
-            for x in row_arr[11:]:
-                n = clean_numeric(x)
-                if n > 0:
-                    nums.append(n)
-            if nums:
-                amt_val = max(nums)
-
-        if amt_val <= 0:
-            # 금액이 K열 앞쪽에 있는 양식 보완. 월/연도처럼 작은 숫자는 제외.
-            nums = []
-            for idx, x in enumerate(row_arr):
-                if idx in [1, 10]:
-                    continue
-                n = clean_numeric(x)
-                if n >= 1000:  # 2026, 월 숫자 등 오인 방지
-                    nums.append(n)
-            if nums:
-                amt_val = max(nums)
-
-        if amt_val <= 0:
-            continue
+    # 금액 컬럼 위치 탐색. header가 잡히면 그 다음 행부터, 아니면 전체 행 검사
+    header_idx, amt_idx = detect_special_amount_column(df_raw)
+    values = df_raw.iloc[header_idx+1:].values if header_idx != -1 else df_raw.values
+    if values.ndim != 2 or values.shape[1] <= 10 or values.shape[0] == 0:
+        return []
 
-        date_str = f"2026-{month:02d}-01"
-        new_processed.append({
-            "세목": mapped_cat,
-            "집행일자": date_str,
-            "적요": title_val,
-            "집행금액": amt_val,
-            "예산과목": mapped_cat,
+    title_val = cell_text(values[:, 10])
+    title = title_val.mask(title_val.isin(NULL_TEXTS), "").str.replace(r'\s+', '', regex=True)
+    # 합계 행, 기름걸레 등 다른 비용이 특수항목으로 섞이는 것 방지
+    skip = (title == "") | title.str.contains("합계", regex=False)
+    skip |= title.str.contains("기름", regex=False) & title.str.contains("걸레", regex=False)
+    category = special_category_masks(title)
+    keep = (~skip & (category != "")).to_numpy(dtype=bool)
+    if not keep.any():
+        return []
+    values, title_val, category = values[keep], title_val[keep].reset_index(drop=True), category[keep].reset_index(drop=True)
+
+    # 월은 B열 지급월을 최우선 사용. B열이 비어 있거나 무효일 때만 제목 보조 사용.
+    memo = {}
+    month = parse_special_months(values[:, 1], memo)
+    retry = month == 0
+    if retry.any():
+        month[retry] = parse_special_months(title_val[retry].tolist(), memo)
+    # [V5] 제목이 "2026년 0월"이고 B열도 비정상인 경우, 행 앞쪽의 다른 월 후보를 보조 탐색
+    retry = np.flatnonzero(month == 0)
+    if len(retry):
+        front = values[retry, :10]
+        candidates = parse_special_months(front.ravel(), memo).reshape(front.shape)
+        ok = (candidates >= 1) & (candidates <= 12)
+        found = ok.any(axis=1)
+        month[retry[found]] = candidates[found, ok[found].argmax(axis=1)]
+
+    # 금액 추출: 금액 헤더 우선, 실패 시 L열 이후, 그래도 실패 시 전체 행에서 후보 탐색
+    amount = clean_numeric_array(values[:, amt_idx]) if amt_idx != -1 else np.zeros(len(values))
+    need = amount <= 0
+    if need.any() and values.shape[1] > 11:
+        # 보통 K열 제목 다음 L열 이후에 금액이 있는 경우
+        tail = _numeric_block(values[need, 11:])
+        best = np.where(tail > 0, tail, 0.0).max(axis=1)
+        amount[need] = np.where(best > 0, best, amount[need])
+    need = amount <= 0
+    if need.any():
+        # 금액이 K열 앞쪽에 있는 양식 보완. 월/연도처럼 작은 숫자는 제외.
+        cols = [c for c in range(values.shape[1]) if c not in (1, 10)]
+        block = _numeric_block(values[np.ix_(need, cols)])
+        best = np.where(block >= 1000, block, 0.0).max(axis=1)  # 2026, 월 숫자 등 오인 방지
+        amount[need] = np.where(best > 0, best, amount[need])
+
+    valid = ((month >= 1) & (month <= 12) & (amount > 0))
+    return [
+        {
+            "세목": cat,
+            "집행일자": f"2026-{m:02d}-01",
+            "적요": t,
+            "집행금액": a,
+            "예산과목": cat,
             "업로드구분": "5대용역수수료"
-        })
-
-    return new_processed
+        }
+        for cat, m, t, a, ok in zip(category, month.tolist(), title_val, amount.tolist(), valid) if ok
+    ]
 
 # -----------------------------------------------------------------------------
 # 트리 구조 유틸리티
@@ -1286,46 +3690,97 @@ def dfs_sum_v202(node_id, col_n, df, children_map, states):
 # -----------------------------------------------------------------------------
 # 6. 세션 데이터 초기화 
 # -----------------------------------------------------------------------------
-if st.session_state['quota_exceeded']:
-    st.error("🚨 **[치명적 알림] 파이어베이스(Firebase) 하루 무료 사용량(Quota)을 초과했습니다!**\n\n앱이 무한 로딩에 빠지는 것을 방지하기 위해 강제로 연결을 차단하고 **오프라인 로컬 모드로 전환**했습니다. 오늘 작업하신 데이터는 내 컴퓨터(JSON 파일)에만 안전하게 저장되며, 내일 무료 용량이 초기화되면 다시 클라우드로 동기화할 수 있습니다.")
+report_cloud_write_errors()
+if db:
+    cloud_breaker.bind_store(get_local_store())
+    cloud_write_queue.bind_store(get_local_store())
+    probe_cloud()
+cloud_status = cloud_breaker.status() if db else None
+if cloud_status and cloud_status["over_budget"]:
+    st.error(f"🚨 **[알림] 오늘 Firebase 사용 예산을 모두 사용했습니다.** (읽기 {cloud_status['reads']:,}건 / 쓰기 {cloud_status['writes']:,}건)\n\n한도 초기화(한국 시간 오후 4~5시) 전까지 로컬 저장소(local_store.db)로 작업하며, 이후 자동으로 클라우드에 다시 연결됩니다.")
+elif cloud_status and cloud_status["state"] != "closed" and cloud_status["kind"] == "quota":
+    st.error("🚨 **[알림] 파이어베이스(Firebase) 하루 무료 사용량(Quota)을 초과했습니다.**\n\n앱이 무한 로딩에 빠지는 것을 방지하기 위해 클라우드 연결을 잠시 차단하고 **로컬 모드로 전환**했습니다. 작업하신 데이터는 내 컴퓨터(로컬 저장소 local_store.db)에 안전하게 저장되며, 무료 용량이 초기화되면 대기 중인 저장분과 함께 자동으로 클라우드에 다시 연결됩니다.")
+elif cloud_status and cloud_status["state"] != "closed":
+    st.warning(f"⚠️ 클라우드 응답이 원활하지 않아 잠시 로컬 모드로 작업합니다. 약 {int(cloud_status['retry_in']) + 1}초 후 자동으로 다시 연결을 시도합니다.")
+
+def refresh_session_ledger(force=False):
+    """공용 원장 버전이 바뀌었을 때만 세션 데이터를 캐시 값으로 교체합니다."""
+    ledger = get_shared_ledger()
+    if ledger.cloud_recoveries != cloud_breaker.recoveries:
+        # 차단 중 로컬에서 읽었을 수 있으므로, 클라우드가 복구되면 한 번 다시 읽습니다.
+        ledger.cloud_recoveries = cloud_breaker.recoveries
+        force = True
+    if force: ledger.invalidate()
+    version = ledger.version
+    if st.session_state.get('ledger_version') == version and 'data' in st.session_state:
+        return False
+    # 캐시가 비어 있으면(서버 첫 접속/새로고침) 세 문서를 한 번에 미리 읽습니다.
+    prefetched = prefetch_cold_start() if any(ledger.get(n) is None for n in ("master", "daily", "rapid")) else {}
+    st.session_state['data'] = load_shared_master(prefetched)
+    st.session_state['daily_expenses'] = load_shared("daily", lambda: load_daily_expenses(prefetched), 'daily_sync')
+    st.session_state['rapid_df'] = load_shared("rapid", lambda: load_rapid_df(prefetched))
+    st.session_state['ledger_version'] = version
+    return True
 
 if 'amt_box' not in st.session_state: st.session_state.amt_box = 0
-if 'data' not in st.session_state: st.session_state['data'] = load_data()
-
-if 'rapid_df' not in st.session_state: 
+refresh_session_ledger()
+# 세목 표기가 정규화되지 않았거나 분류 결과가 없거나 규칙이 바뀐 행은 여기서 한 번만 고칩니다. (저장은 다음 저장 때 함께)
+st.session_state['daily_expenses'] = classified_daily(st.session_state.get('daily_expenses', []))
+if not isinstance(st.session_state['rapid_df'], pd.DataFrame) or st.session_state['rapid_df'].empty or '세목' not in st.session_state['rapid_df'].columns:
     st.session_state['rapid_df'] = load_rapid_df()
-else:
-    if not isinstance(st.session_state['rapid_df'], pd.DataFrame) or st.session_state['rapid_df'].empty or '세목' not in st.session_state['rapid_df'].columns:
-        st.session_state['rapid_df'] = load_rapid_df()
 
-if 'daily_expenses' not in st.session_state: st.session_state['daily_expenses'] = load_daily_expenses()
 if 'tree_expanded' not in st.session_state or st.session_state['tree_expanded'] is None: 
     st.session_state['tree_expanded'] = set()
 if 'tree_states' not in st.session_state: st.session_state['tree_states'] = {}
 if 'last_file_hash' not in st.session_state: st.session_state['last_file_hash'] = None
 if 'last_sp_file_hash' not in st.session_state: st.session_state['last_sp_file_hash'] = None
 
-if st.session_state.get('daily_expenses') and 'initial_sync_done' not in st.session_state:
+# 세션 첫 실행과 분류 규칙 파일이 바뀐 뒤 첫 실행에서 원장을 다시 맞춥니다.
+if not IN_POOL_WORKER and st.session_state.get('daily_expenses') and st.session_state.get('initial_sync_done') != RULES.stamp:
     sync_daily_to_master_auto()
-    st.session_state['initial_sync_done'] = True
+    st.session_state['initial_sync_done'] = RULES.stamp
 
+# [V11/V12] 저장 데이터가 초기화되어도 수동 입력분은 화면 집계에 즉시 반영 (prepare_master_view)
 master_data_raw = st.session_state['data']
-master_data_raw = ensure_data_integrity(master_data_raw)
-# [V11/V12] 저장 데이터가 초기화되어도 수동 입력분은 화면 집계에 즉시 반영
-master_data_raw = apply_manual_asset_to_master_data(master_data_raw)
-master_data_raw = apply_manual_laundry_to_master_data(master_data_raw)
-st.session_state['data'] = master_data_raw
-df_all = pd.DataFrame(master_data_raw.get("records", []))
-if not df_all.empty: df_all["amount"] = pd.to_numeric(df_all["amount"], errors='coerce').fillna(0).astype('float64')
+ledger_cube, df_all = ledger_views(master_data_raw)
 
 # --- 사이드바 ---
 with st.sidebar:
     st.image("https://cdn-icons-png.flaticon.com/512/3135/3135715.png", width=60)
     st.title("지출 관리 콘솔")
+    rule_store = get_rule_store()
+    if RULES.fallback:
+        st.warning(f"⚠️ 분류 규칙 파일({RULES_FILE_PATH})을 읽지 못해 내장 최소 규칙으로 실행 중입니다. 파일을 고치기 전까지 원장 자동 동기화는 멈춥니다. (이 세션에서 건너뛴 동기화 {st.session_state.get('daily_sync_skipped', 0)}회)\n\n{rule_store.error or ''}")
+    elif rule_store.error:
+        st.error(f"규칙 파일 오류로 직전 규칙을 사용 중입니다: {rule_store.error}")
     if st.button("💾 데이터 수동 백업"):
-        if save_data_cloud(st.session_state['data']): st.success("로컬/클라우드 저장 완료!")
+        if save_data_cloud(st.session_state['data'], full=True):
+            if cloud_write_queue is None or cloud_write_queue.drain(timeout=5.0): st.success("로컬/클라우드 저장 완료!")
+            else: st.warning("로컬 저장 완료. 클라우드 저장은 백그라운드에서 계속 재시도합니다.")
     if st.button("🔄 데이터 강제 새로고침"):
-        st.session_state['data'] = load_data(); st.session_state['daily_expenses'] = load_daily_expenses(); st.rerun()
+        refresh_session_ledger(force=True); st.rerun()
+    if cloud_write_queue is not None and cloud_write_queue.pending_count():
+        st.caption(f"☁️ 클라우드 저장 대기 {cloud_write_queue.pending_count()}건")
+    if cloud_write_queue is not None and cloud_write_queue.dead_letters:
+        st.error(f"☁️ 클라우드 기록을 포기한 쓰기 {cloud_write_queue.dead_count}건 (로컬에는 저장됨)\n\n" + "\n".join(
+            f"- {d['at']:%H:%M:%S} {d['kind']} {d['path']} — {d['error']}" for d in cloud_write_queue.dead_letters[-5:]))
+    # 접힌 expander 안의 코드도 매 rerun 실행되므로, 펼쳤을 때만 진단 표를 만듭니다.
+    perf_panel = st.expander("🛠️ 성능 진단", key="perf_diag_open", on_change="rerun")
+    with perf_panel:
+        if perf_panel.open:
+            perf_log = get_perf_log()
+            st.caption("화면별 마지막 렌더링 시간")
+            st.dataframe(pd.DataFrame([{"화면": k, "초": round(v, 3)} for k, v in perf_log["renders"].items()]), hide_index=True, use_container_width=True)
+            st.caption("모듈을 처음 불러온 시간 (지연 임포트)")
+            st.dataframe(pd.DataFrame([{"모듈": k, "초": round(v, 3)} for k, v in perf_log["imports"].items()]), hide_index=True, use_container_width=True)
+            parse_cache_stats = get_parse_cache().stats()  # 캐시 폴더를 훑으므로 펼쳤을 때만
+            st.caption(f"엑셀 시트 파싱: {f'프로세스 {SHEET_POOL_WORKERS}개 병렬' if get_sheet_pool() is not None else '순차'}")
+            st.caption(f"업로드 파싱 캐시: {parse_cache_stats['entries']}개 · {parse_cache_stats['bytes'] / 1024 / 1024:.1f}MB · 적중 {parse_cache_stats['hits']} / 미적중 {parse_cache_stats['misses']}")
+            st.caption(f"분류 규칙: {RULES.version} ({RULES.source}) · stamp {RULES.stamp} · 다시 읽음 {rule_store.reloads}회")
+            sync_engine = get_daily_sync_engine()
+            st.caption(f"원장 증분 동기화: 행 {sum(sync_engine.counts.values()):,}건 · 마지막 반영 +{sync_engine.last_delta[0]:,} / -{sync_engine.last_delta[1]:,}")
+            search_index = get_daily_search_index()
+            st.caption(f"적요 검색 색인: 적요 {len(search_index.texts):,}종 · 조각 {len(search_index.grams):,}개 · 마지막 반영 +{search_index.last_delta[0]:,} / -{search_index.last_delta[1]:,}")
     st.divider(); st.caption(f"시스템 ID: {appId}")
 
 # --- 스타일 가이드 ---
@@ -1376,21 +3831,15 @@ def go_page(page_name: str):
     st.session_state["current_page"] = page_name
 
 
-def render_phone_home(df_all):
+def render_phone_home(cube):
     '''최초 접속용 앱 홈 화면: 순수 HTML 링크로 휴대폰 프레임 내부 메뉴를 렌더링한다.'''
     from urllib.parse import quote
 
-    total_2026 = 0
-    active_items = 0
-    latest_month = "-"
-    if df_all is not None and not df_all.empty and "year" in df_all.columns:
-        df_26_home = df_all[df_all["year"] == 2026].copy()
-        if not df_26_home.empty:
-            amount_series = pd.to_numeric(df_26_home.get("amount", 0), errors="coerce").fillna(0)
-            total_2026 = float(amount_series.sum())
-            active_items = int(df_26_home[amount_series > 0]["category"].nunique()) if "category" in df_26_home.columns else 0
-            if "month" in df_26_home.columns and not df_26_home[amount_series > 0].empty:
-                latest_month = f"{int(df_26_home.loc[amount_series > 0, 'month'].max())}월"
+    paid = cube.year_slice(2026) > 0
+    total_2026 = cube.year_total(2026)
+    active_items = int(paid.any(axis=1).sum())
+    paid_months = np.flatnonzero(paid.any(axis=0))
+    latest_month = f"{int(paid_months[-1]) + 1}월" if paid_months.size else "-"
 
     menu_cards = []
     for page in APP_PAGES:
@@ -1531,7 +3980,8 @@ with st.sidebar:
             st.rerun()
 
 if st.session_state.get("current_page") == "HOME":
-    render_phone_home(df_all)
+    render_phone_home(ledger_cube)
+    record_render_time("HOME")
     st.stop()
 
 current_page = st.session_state.get("current_page", "📊 실적 현황")
@@ -1551,17 +4001,16 @@ with _top_right:
 # --- TAB 1: 실적 현황 ---
 if current_page == "📊 실적 현황":
     if not df_all.empty:
-        df_26 = df_all[df_all["year"] == 2026].copy(); val_26 = df_26["amount"].sum()
+        val_26 = ledger_cube.year_total(2026)
         st.markdown(f"""<div class="metric-card"><div class="metric-label">🏢 2026년 누적 지출액 (자동 연동 중)</div><div class="metric-value">{format(int(val_26), ",")} <span style="font-size:1rem; color:#94a3b8;">원</span></div></div>""", unsafe_allow_html=True)
     c_s, c_i, c_p = st.columns([0.8, 1.2, 2.1])
     with c_s:
         st.markdown('<b style="font-size:1.1rem; color:#1e3a8a; border-left:5px solid #2563eb; padding-left:10px;">🚀 상반기 신속집행</b>', unsafe_allow_html=True)
         st.markdown('<div style="font-size:0.82rem; color:#64748b; font-weight:700; margin:6px 0 10px 0;">대상액 대비 실적률 기준 · 행안부/남양주시 목표선 표시</div>', unsafe_allow_html=True)
         for cat in ["수탁자산취득비", "일반재료비", "상품매입비"]:
-            df_t = df_26[df_26["category"] == cat] if not df_all.empty else pd.DataFrame()
             conf = QUICK_EXEC_CONFIG.get(cat, {"target": 0})
-            q1_v = pd.to_numeric(df_t[df_t["month"] <= 3]["amount"], errors='coerce').fillna(0).sum() if not df_t.empty else 0
-            h1_v = pd.to_numeric(df_t[df_t["month"] <= 6]["amount"], errors='coerce').fillna(0).sum() if not df_t.empty else 0
+            q1_v = ledger_cube.ytd_at(2026, cat, 3)
+            h1_v = ledger_cube.ytd_at(2026, cat, 6)
             st.markdown(render_overview_quick_exec_card(cat, q1_v, h1_v, conf), unsafe_allow_html=True)
     with c_i:
         st.markdown('<b style="font-size:1.1rem; color:#1e3a8a; border-left:5px solid #2563eb; padding-left:10px;">📝 지출액 직접 등록</b>', unsafe_allow_html=True)
@@ -1576,7 +4025,7 @@ if current_page == "📊 실적 현황":
     with c_p:
         st.markdown('<b style="font-size:1.1rem; color:#1e3a8a; border-left:5px solid #2563eb; padding-left:10px;">📊 지출 비중 상위 항목</b>', unsafe_allow_html=True)
         st.markdown('<div style="font-size:0.82rem; color:#64748b; font-weight:700; margin:6px 0 10px 0;">도넛 차트 대신 금액과 비중이 바로 보이는 가로 막대형으로 표시합니다.</div>', unsafe_allow_html=True)
-        cat_dist = df_26.groupby("category", as_index=False)["amount"].sum() if not df_all.empty else pd.DataFrame()
+        cat_dist = pd.DataFrame(sorted(ledger_cube.category_totals(2026).items()), columns=["category", "amount"])
         if not cat_dist.empty and cat_dist["amount"].sum() > 0:
             cat_dist = cat_dist[cat_dist["amount"] > 0].copy()
             total_dist_amount = float(cat_dist["amount"].sum())
@@ -1598,6 +4047,7 @@ if current_page == "📊 실적 현황":
             chart_dist["label"] = chart_dist.apply(lambda r: f"{r['amount_label']} · {r['share_label']}", axis=1)
             chart_dist["category_label"] = chart_dist["category"].astype(str)
 
+            alt = lazy_import("altair")
             base = alt.Chart(chart_dist).encode(
                 y=alt.Y("category_label:N", sort="-x", title=None, axis=alt.Axis(labelLimit=220, labelFontSize=12, labelFontWeight="bold")),
                 x=alt.X("amount:Q", title=None, axis=alt.Axis(format=",.0f", labelFontSize=11)),
@@ -1626,14 +4076,14 @@ if current_page == "📊 실적 현황":
             
     st.markdown("---"); st.markdown('<div class="section-header">📅 2026 전체 상세 지출 통합 그리드 (전수 편집 가능)</div>', unsafe_allow_html=True)
     if not df_all.empty:
-        df_p = df_26.pivot(index="category", columns="month", values="amount").fillna(0).reindex(index=CATEGORIES, columns=MONTHS, fill_value=0)
+        df_p = pd.DataFrame(ledger_cube.year_slice(2026), index=ledger_cube.categories, columns=MONTHS).reindex(index=CATEGORIES, fill_value=0)
         df_p.columns = [f"{m}월" for m in df_p.columns]
         df_d = df_p.map(lambda x: format(int(x), ","))
         
         ed = st.data_editor(df_d, height=550, key="main_editor_v292")
         
         if st.button("💾 통합 그리드 수정 내역 클라우드/로컬 저장", type="primary", key="btn_save_tab1_v292"):
-            curr = load_data()
+            curr = load_master_copy()
             curr = ensure_data_integrity(curr)
             for cat in CATEGORIES:
                 for m in MONTHS:
@@ -1647,8 +4097,7 @@ if current_page == "📊 실적 현황":
                                 break
             if save_data_cloud(curr):
                 st.session_state['data'] = curr
-                st.success("✅ 저장 성공!")
-                time.sleep(0.5)
+                st.toast("✅ 저장 성공!")
                 st.rerun()
 
 # --- TAB 2: 항목별 지출 분석 ---
@@ -1656,7 +4105,7 @@ if current_page == "📈 항목별 지출 분석":
     st.markdown('<div class="section-header">📈 지능형 분석 및 실시간 연동 (Semantic Sync)</div>', unsafe_allow_html=True)
     if st.button("🔄 지출내역 수동 연동 실행", type="primary"):
         if sync_daily_to_master_auto():
-            st.success("✅ 동기화 완료! 실적이 갱신되었습니다."); time.sleep(1); st.rerun()
+            st.toast("✅ 동기화 완료! 실적이 갱신되었습니다."); st.rerun()
     
     # [V20] 항목별 지출 분석 상단: 전체 현황 카드 요약
     st.markdown("""
@@ -1667,21 +4116,10 @@ if current_page == "📈 항목별 지출 분석":
 """, unsafe_allow_html=True)
 
     if not df_all.empty:
-        df_2026_all = df_all[df_all["year"] == 2026].copy()
-        total_2026_all = float(df_2026_all["amount"].sum()) if not df_2026_all.empty else 0.0
-        cat_summary_rows = []
-        for cat_name in CATEGORIES:
-            dcat = df_2026_all[df_2026_all["category"] == cat_name] if not df_2026_all.empty else pd.DataFrame()
-            total_cat = float(dcat["amount"].sum()) if not dcat.empty else 0.0
-            paid_months = int((dcat["amount"] > 0).sum()) if not dcat.empty else 0
-            recent_months = dcat[dcat["amount"] > 0]["month"].tolist() if not dcat.empty else []
-            recent_month = max(recent_months) if recent_months else 0
-            cat_summary_rows.append({
-                "category": cat_name,
-                "amount": total_cat,
-                "paid_months": paid_months,
-                "recent_month": recent_month,
-            })
+        # 집계는 원장 버전마다 한 번만 계산된 표(LedgerAggregates)를 그대로 읽습니다.
+        ledger_agg = ledger_cube.aggregates()
+        total_2026_all = ledger_cube.year_total(2026)
+        cat_summary_rows = ledger_agg.category_summary(2026, CATEGORIES)
         paid_cats = sum(1 for r in cat_summary_rows if r["amount"] > 0)
         zero_cats = len(CATEGORIES) - paid_cats
         top_row = max(cat_summary_rows, key=lambda r: r["amount"]) if cat_summary_rows else {"category":"-", "amount":0}
@@ -1711,39 +4149,20 @@ if current_page == "📈 항목별 지출 분석":
 
         # [V22] 관리항목별 요약 카드: 2026년 집행월 기준 동월누계 비교
         comparison_rows = []
-        global_2026_months = df_all[(df_all["year"] == 2026) & (df_all["amount"] > 0)]["month"].tolist() if not df_all.empty else []
-        global_latest_2026_month = max(global_2026_months) if global_2026_months else 0
-
-        for cat_name in CATEGORIES:
-            dcat_all_years = df_all[df_all["category"] == cat_name] if not df_all.empty else pd.DataFrame()
-            dcat_2026 = dcat_all_years[dcat_all_years["year"] == 2026] if not dcat_all_years.empty else pd.DataFrame()
-            recent_months = dcat_2026[dcat_2026["amount"] > 0]["month"].tolist() if not dcat_2026.empty else []
-            recent_month = max(recent_months) if recent_months else 0
-            compare_month = recent_month if recent_month else global_latest_2026_month
-            if not compare_month:
-                compare_month = 12
-
-            v2024_same = float(dcat_all_years[(dcat_all_years["year"] == 2024) & (dcat_all_years["month"] <= compare_month)]["amount"].sum()) if not dcat_all_years.empty else 0.0
-            v2025_same = float(dcat_all_years[(dcat_all_years["year"] == 2025) & (dcat_all_years["month"] <= compare_month)]["amount"].sum()) if not dcat_all_years.empty else 0.0
-            v2026_same = float(dcat_all_years[(dcat_all_years["year"] == 2026) & (dcat_all_years["month"] <= compare_month)]["amount"].sum()) if not dcat_all_years.empty else 0.0
-            paid_months = int((dcat_2026["amount"] > 0).sum()) if not dcat_2026.empty else 0
-
-            yoy_gap = v2026_same - v2025_same
-            if v2025_same > 0:
-                yoy_rate = (yoy_gap / v2025_same) * 100
+        for base in ledger_agg.same_month_comparison(2026, (2024, 2025), CATEGORIES):
+            yoy_gap = base["v2026"] - base["v2025"]
+            if base["v2025"] > 0:
+                yoy_rate = (yoy_gap / base["v2025"]) * 100
                 yoy_text = f"전년 동월누계 대비 {yoy_rate:+.1f}%"
             else:
-                yoy_text = "전년 동월누계 없음" if v2026_same == 0 else "전년 동월누계 실적 없음"
+                yoy_text = "전년 동월누계 없음" if base["v2026"] == 0 else "전년 동월누계 실적 없음"
             comparison_rows.append({
-                "category": cat_name,
-                "v2024": int(v2024_same),
-                "v2025": int(v2025_same),
-                "v2026": int(v2026_same),
+                **base,
+                "v2024": int(base["v2024"]),
+                "v2025": int(base["v2025"]),
+                "v2026": int(base["v2026"]),
                 "yoy_gap": int(yoy_gap),
                 "yoy_text": yoy_text,
-                "paid_months": paid_months,
-                "recent_month": int(recent_month) if recent_month else 0,
-                "compare_month": int(compare_month),
             })
 
         sorted_rows = sorted(comparison_rows, key=lambda r: r["v2026"], reverse=True)
@@ -1801,24 +4220,24 @@ if current_page == "📈 항목별 지출 분석":
 </div>
 """, unsafe_allow_html=True)
     sc = st.selectbox("관리 항목 선택", CATEGORIES, key="analysis_sel_v292")
-    df_c = df_all[df_all["category"] == sc] if not df_all.empty else pd.DataFrame()
+    ledger_agg = ledger_cube.aggregates()
     
-    if not df_c.empty:
+    if not df_all.empty:
         if sc in QUICK_EXEC_CONFIG:
             cf = QUICK_EXEC_CONFIG[sc]
-            q1_e = df_c[(df_c["year"] == 2026) & (df_c["month"] <= 3)]["amount"].sum()
-            h1_e = df_c[(df_c["year"] == 2026) & (df_c["month"] <= 6)]["amount"].sum()
+            q1_e = ledger_agg.same_month(2026, sc, 3)
+            h1_e = ledger_agg.same_month(2026, sc, 6)
             st.markdown(render_quick_goal_comparison_html(sc, cf["target"], q1_e, h1_e), unsafe_allow_html=True)
         
-        m_cols = st.columns(3); v24, v25, v26 = df_c[df_c['year']==2024]['amount'].sum(), df_c[df_c['year']==2025]['amount'].sum(), df_c[df_c['year']==2026]['amount'].sum()
+        m_cols = st.columns(3); v24, v25, v26 = (ledger_agg.same_month(y, sc, 12) for y in (2024, 2025, 2026))
         m_cols[0].markdown(f'''<div class="metric-card" style="border-left-color: #94a3b8;"><div class="metric-label">📊 2024 실적</div><div class="metric-value">{int(v24):,}<span style="font-size:0.9rem; margin-left:5px; color:#94a3b8;">원</span></div></div>''', unsafe_allow_html=True); m_cols[1].markdown(f'''<div class="metric-card" style="border-left-color: #10b981;"><div class="metric-label">📊 2025 실적</div><div class="metric-value">{int(v25):,}<span style="font-size:0.9rem; margin-left:5px; color:#94a3b8;">원</span></div></div>''', unsafe_allow_html=True); m_cols[2].markdown(f'''<div class="metric-card" style="border-left-color: #3b82f6;"><div class="metric-label">📅 2026 연동 실적</div><div class="metric-value">{int(v26):,}<span style="font-size:0.9rem; margin-left:5px; color:#94a3b8;">원</span></div></div>''', unsafe_allow_html=True)
         
-        df_p_c = df_c.pivot(index="month", columns="year", values="amount").fillna(0).reindex(columns=YEARS, fill_value=0); df_p_c.columns = [f"{c}년" for c in df_p_c.columns]; df_d_c = df_p_c.map(lambda x: format(int(x), ",")).reset_index(); df_d_c["월"] = df_d_c["month"].apply(lambda x: f"{x}월")
+        df_p_c = pd.DataFrame({y: ledger_cube.year_slice(y)[ledger_cube.category_index[sc]] for y in YEARS}, index=pd.Index(range(1, 13), name="month")); df_p_c.columns = [f"{c}년" for c in df_p_c.columns]; df_d_c = df_p_c.map(lambda x: format(int(x), ",")).reset_index(); df_d_c["월"] = df_d_c["month"].apply(lambda x: f"{x}월")
         
         ed_c = st.data_editor(df_d_c[["월", "2024년", "2025년", "2026년"]], hide_index=True, key=f"ed_v292_{sc}", height=450)
         
         if st.button("💾 분석 데이터 수정 내역 영구 저장", type="primary", key=f"btn_save_tab2_v292_{sc}"):
-            curr = load_data()
+            curr = load_master_copy()
             curr = ensure_data_integrity(curr)
             for idx, row in ed_c.iterrows():
                 mv = int(str(row["월"]).replace("월", ""))
@@ -1832,8 +4251,7 @@ if current_page == "📈 항목별 지출 분석":
                             break
             if save_data_cloud(curr):
                 st.session_state['data'] = curr
-                st.success("✅ 저장 성공!")
-                time.sleep(0.5)
+                st.toast("✅ 저장 성공!")
                 st.rerun()
 
 # --- TAB 3: 미집행 현황 ---
@@ -2156,16 +4574,16 @@ if current_page == "📂 일상경비 동기화":
             file_content = f.read(); file_hash = hashlib.md5(file_content).hexdigest(); f.seek(0)
             if st.session_state['last_file_hash'] != file_hash:
                 with st.spinner("일반 엑셀 양식을 분석 중입니다..."):
-                    sheet_name, new_processed, attempts = parse_general_from_uploaded_file(f)
+                    sheet_name, new_processed, attempts = parse_upload_cached("general", f, file_hash)
                     if new_processed is not None and new_processed:
-                        merged_expenses, added_count = merge_expenses(st.session_state.get('daily_expenses', []), new_processed)
+                        merged_expenses, added_count, merge_delta = merge_expenses(st.session_state.get('daily_expenses', []), new_processed)
                         
                         if save_daily_expenses(merged_expenses):
                             st.session_state['daily_expenses'] = merged_expenses
                             st.session_state['last_file_hash'] = file_hash
-                            sync_daily_to_master_auto()
-                            st.success(f"✅ 일반 동기화 완료! 반영 시트: {sheet_name} / 새로운 내역 {added_count}건 저장")
-                            time.sleep(1.5); st.rerun()
+                            sync_daily_to_master_auto(merge_delta)
+                            st.toast(f"✅ 일반 동기화 완료! 반영 시트: {sheet_name} / 새로운 내역 {added_count}건 저장")
+                            st.rerun()
                     else:
                         st.error("❌ 반영할 시트를 찾지 못했습니다. 아래 시트별 인식 결과를 확인해주세요.")
                         if attempts:
@@ -2178,136 +4596,174 @@ if current_page == "📂 일상경비 동기화":
             sp_file_content = f_sp.read(); sp_file_hash = hashlib.md5(sp_file_content).hexdigest(); f_sp.seek(0)
             if st.session_state.get('last_sp_file_hash') != sp_file_hash:
                 with st.spinner("특수 양식을 분석하여 5대 항목을 강제 추출 중입니다..."):
-                    sheet_name_sp, new_processed_sp, attempts_sp = parse_special_from_uploaded_file(f_sp)
+                    sheet_name_sp, new_processed_sp, attempts_sp = parse_upload_cached("special", f_sp, sp_file_hash)
                     if new_processed_sp is not None and new_processed_sp:
-                        merged_expenses_sp, added_count_sp = merge_expenses(st.session_state.get('daily_expenses', []), new_processed_sp)
+                        merged_expenses_sp, added_count_sp, merge_delta_sp = merge_expenses(st.session_state.get('daily_expenses', []), new_processed_sp)
                         
                         if save_daily_expenses(merged_expenses_sp):
                             st.session_state['daily_expenses'] = merged_expenses_sp
                             st.session_state['last_sp_file_hash'] = sp_file_hash
-                            sync_daily_to_master_auto()
-                            st.success(f"✅ 5대 특수 항목 완료! 반영 시트: {sheet_name_sp} / {added_count_sp}건 저장")
-                            time.sleep(1.5); st.rerun()
+                            sync_daily_to_master_auto(merge_delta_sp)
+                            st.toast(f"✅ 5대 특수 항목 완료! 반영 시트: {sheet_name_sp} / {added_count_sp}건 저장")
+                            st.rerun()
                     else:
                         st.error("❌ 처리할 수 있는 특수 항목 데이터를 찾지 못했습니다. 아래 시트별 인식 결과를 확인해주세요.")
                         if attempts_sp:
                             st.dataframe(pd.DataFrame(attempts_sp, columns=["시트명", "인식 건수"]), use_container_width=True)
     
+    with st.expander("📥 [일괄] 여러 엑셀 파일 한 번에 업로드 (일반/특수 혼합 가능)"):
+        st.caption("파일별 양식은 자동으로 판별합니다. 필요하면 아래 표에서 바꾼 뒤 '일괄 반영'을 누르세요. 저장과 원장 동기화는 한 번만 실행됩니다.")
+        batch_files = st.file_uploader("엑셀 파일 여러 개 선택", type=["xlsx", "csv"], accept_multiple_files=True, key="batch_up")
+        if batch_files:
+            batch_kinds = st.session_state.setdefault('batch_upload_kinds', {})
+            uploads = []
+            for bf in batch_files:
+                data = bf.getvalue(); file_hash = hashlib.md5(data).hexdigest()
+                if file_hash not in batch_kinds:
+                    batch_kinds[file_hash] = detect_upload_kind(bf)
+                uploads.append({"file": bf.name, "kind": batch_kinds[file_hash], "data": data, "hash": file_hash})
+            kind_by_label = {label: kind for kind, label in UPLOAD_KIND_LABELS.items()}
+            plan = st.data_editor(
+                pd.DataFrame([{"파일": up["file"], "양식": UPLOAD_KIND_LABELS[up["kind"]]} for up in uploads]),
+                column_config={"양식": st.column_config.SelectboxColumn("양식", options=list(kind_by_label), required=True)},
+                disabled=["파일"], hide_index=True, use_container_width=True,
+                key="batch_plan_" + hashlib.md5("".join(up["hash"] for up in uploads).encode()).hexdigest()[:12])
+            for up, label in zip(uploads, plan["양식"]):
+                up["kind"] = kind_by_label.get(label, up["kind"])
+            if st.button(f"🚀 {len(uploads)}개 파일 일괄 반영", type="primary"):
+                with st.spinner("여러 파일을 동시에 분석하고 한 번에 반영하는 중입니다..."):
+                    st.session_state['batch_upload_report'] = import_uploads_batch(uploads)
+                st.rerun()
+        report = st.session_state.get('batch_upload_report')
+        if report:
+            st.success(f"✅ 일괄 반영 완료: 새로운 내역 {report['added']}건 · 파싱 {report['parse_sec']:.2f}초 · 병합/저장/동기화 {report['save_sec']:.2f}초")
+            st.dataframe(pd.DataFrame(report['files']), hide_index=True, use_container_width=True)
+
     daily_data = st.session_state.get('daily_expenses', [])
     if daily_data:
-        df_d = pd.DataFrame(daily_data)
-        df_d['세목'] = df_d['세목'].astype(str)
-        
-        def extract_budget_code(s):
-            codes = re.findall(r'(?<!\d)(\d{3}(?:-\d{2})?)(?!\d)', s.strip())
-            return codes[-1] if codes else s.strip()
-            
-        df_d = df_d.assign(temp_code=df_d['세목'].apply(extract_budget_code))
-        best_names = df_d.groupby('temp_code')['세목'].apply(lambda x: max(x.astype(str), key=len)).to_dict()
-        
-        def get_full_semok_name(code, current_best):
-            if current_best and "[" in current_best and "]" in current_best: return current_best
-            if code in BUDGET_MAPPING:
-                f_val, g_val = BUDGET_MAPPING[code]
-                b_prefix = code.split('-')[0]
-                return f"[{b_prefix}]{f_val} - [{code}]{g_val}"
-            return current_best if current_best else code
-
-        cleaned_semok = df_d['temp_code'].apply(lambda c: get_full_semok_name(c, best_names.get(c, "")))
-        
-        changed = False
-        for idx, row in df_d.iterrows():
-            if daily_data[idx].get('세목', '') != cleaned_semok.iloc[idx]:
-                daily_data[idx]['세목'] = cleaned_semok.iloc[idx]; changed = True
-                
-        if changed:
-            save_daily_expenses(daily_data)
-            st.session_state['daily_expenses'] = daily_data
-            
-        df_d = df_d.assign(세목=cleaned_semok)
-        df_d = df_d.drop(columns=['temp_code'])
+        # 세목은 행이 들어올 때 정식 표기로 맞춰 두므로 여기서는 읽기만 합니다.
+        # 합계·세목 목록·검색·쪽 나누기는 목록별 보조 표(DailySearchView)로 하고, 전체 표는 만들지 않습니다.
+        view = daily_search_view(daily_data)
         
         c1, c2 = st.columns(2)
-        c1.markdown(f'<div class="metric-card"><div class="metric-label">💰 누적 집행 총액</div><div class="metric-value">{int(df_d["집행금액"].sum()):,}<span style="font-size:1rem; color:#94a3b8;">원</span></div></div>', unsafe_allow_html=True)
-        c2.markdown(f'<div class="metric-card" style="border-left-color:#10b981;"><div class="metric-label">📝 누적 지출 건수</div><div class="metric-value">{len(df_d)} 건</div></div>', unsafe_allow_html=True)
+        c1.markdown(f'<div class="metric-card"><div class="metric-label">💰 누적 집행 총액</div><div class="metric-value">{int(view.amount.sum()):,}<span style="font-size:1rem; color:#94a3b8;">원</span></div></div>', unsafe_allow_html=True)
+        c2.markdown(f'<div class="metric-card" style="border-left-color:#10b981;"><div class="metric-label">📝 누적 지출 건수</div><div class="metric-value">{len(daily_data)} 건</div></div>', unsafe_allow_html=True)
         
         fc1, fc2, fc3 = st.columns([1.5, 2, 1])
-        fcat = fc1.selectbox("세목 필터", ["전체"] + sorted(df_d["세목"].unique().tolist()), key="f1_v292")
-        sq = fc2.text_input("적요 내용 검색", key="f2_v292")
-        
-        disp = df_d.copy()
-        if fcat != "전체": 
-            disp = disp[disp["세목"] == fcat]
-                
-        if sq: disp = disp[disp["적요"].str.contains(sq, na=False)]
+        fcat = fc1.selectbox("세목 필터", ["전체"] + sorted(view.semok_positions), key="f1_v292")
+        sq = fc2.text_input("적요 내용 검색", key="f2_v292", help="공백으로 나눈 단어는 모두 포함(AND), | 로 나눈 묶음은 하나라도 포함(OR)합니다. 예) 상하수도 3월 | 전기요금")
+        with st.expander("🔎 상세 검색 (집행금액 · 집행일자)"):
+            ac1, ac2, ac3 = st.columns([1, 1, 2])
+            amt_min = ac1.number_input("최소 금액(원)", min_value=0, value=0, step=10000, key="search_amt_min")
+            amt_max = ac2.number_input("최대 금액(원, 0 = 제한 없음)", min_value=0, value=0, step=10000, key="search_amt_max")
+            date_range = ac3.date_input("집행일자 범위", value=(), key="search_date_range")
         
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            export_df = disp[['집행일자', '세목', '적요', '집행금액']].copy()
-            if '예산과목' in disp.columns:
-                export_df['예산과목'] = disp['예산과목']
-            export_df.to_excel(writer, index=False, sheet_name='일상경비지출내역')
-        excel_data = output.getvalue()
+        # 적요는 n-gram 색인, 세목/금액/일자는 목록별 보조 표로 찾습니다. (전체 행 문자열 검색 없음)
+        search_start = time.perf_counter()
+        hits = search_daily(
+            daily_data, sq,
+            semok=None if fcat == "전체" else fcat,
+            amount_range=(amt_min or None, amt_max or None),
+            date_range=tuple(date_range) if isinstance(date_range, (list, tuple)) and len(date_range) == 2 else None,
+        )
+        if len(hits) != len(daily_data):
+            st.caption(f"검색 결과 {len(hits):,}건 / 전체 {len(daily_data):,}건 · {(time.perf_counter() - search_start) * 1000:.1f}ms")
         
+        # 엑셀 파일은 요청할 때만 만들고, 같은 검색 결과면 만들어 둔 파일을 내려받습니다.
+        export_key = f"{id(daily_data)}:{len(daily_data)}:{hashlib.md5(hits.tobytes()).hexdigest()}"
+        daily_export = st.session_state.get('daily_export')
         with fc3:
             st.markdown("<div style='margin-top: 29px;'></div>", unsafe_allow_html=True)
-            st.download_button(
-                label="📥 현재 내역 엑셀 다운로드",
-                data=excel_data,
-                file_name=f"일상경비지출내역_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            if daily_export and daily_export[0] == export_key:
+                st.download_button(
+                    label="📥 현재 내역 엑셀 다운로드",
+                    data=daily_export[1],
+                    file_name=f"일상경비지출내역_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            elif st.button(f"📄 엑셀 파일 만들기 ({len(hits):,}건)", key="btn_daily_export"):
+                with st.spinner("엑셀 파일을 만드는 중입니다..."):
+                    st.session_state['daily_export'] = (export_key, export_daily_excel(daily_data, view, hits))
+                st.rerun()
             
-        disp = disp.assign(_idx=disp.index, 삭제선택=False)
-        disp = disp.assign(집행금액_str=disp['집행금액'].map(lambda x: format(int(x), ",")))
-        
-        if '예산과목' in disp.columns:
-            disp = disp[['삭제선택', '집행일자', '세목', '예산과목', '적요', '집행금액_str', '_idx', '집행금액']]
-        else:
-            disp = disp[['삭제선택', '집행일자', '세목', '적요', '집행금액_str', '_idx', '집행금액']]
+        # 편집기에는 현재 쪽의 행만 보냅니다. 정렬/자르기는 서버에서 하고, 삭제 선택은 행 ID 로 쪽을 넘어 유지합니다.
+        selected_ids = st.session_state.setdefault('daily_selected_ids', set())
+        pc1, pc2, pc3, pc4 = st.columns([2, 1, 1, 2])
+        sort_choice = pc1.selectbox("정렬", list(DAILY_EDITOR_SORTS), key="daily_sort")
+        page_size = pc2.selectbox("쪽당 건수", DAILY_EDITOR_PAGE_SIZES, index=1, key="daily_page_size")
+        ordered = sort_daily_positions(view, hits, sort_choice)
+        n_pages = max(1, -(-len(ordered) // page_size))
+        if st.session_state.get('daily_page', 1) > n_pages:
+            st.session_state['daily_page'] = n_pages
+        page_no = pc3.number_input(f"쪽 (/{n_pages})", min_value=1, max_value=n_pages, step=1, key="daily_page")
+        page_pos = ordered[(page_no - 1) * page_size: page_no * page_size]
+        page_ids = view.row_ids[page_pos]
+        live_selected = selected_ids & view.id_set
+        pc4.markdown(f"<div style='margin-top: 34px; font-size:.85rem; color:#64748b;'>{len(ordered):,}건 중 {(page_no - 1) * page_size + 1 if len(page_pos) else 0:,}~{(page_no - 1) * page_size + len(page_pos):,}건 · 선택 {len(live_selected):,}건</div>", unsafe_allow_html=True)
+
+        page_rows = [daily_data[i] for i in page_pos]
+        disp = pd.DataFrame({
+            "삭제선택": [rid in selected_ids for rid in page_ids],
+            "집행일자": [row.get('집행일자') for row in page_rows],
+            "세목": view.semok[page_pos],
+            **({"예산과목": [row.get('예산과목') for row in page_rows]} if view.has_budget else {}),
+            "적요": [row.get('적요') for row in page_rows],
+            "집행금액_str": [format(int(a), ",") for a in view.amount[page_pos]],
+            "_id": page_ids,
+        })
         
-        st.markdown("<div class='text-sm text-gray-500 mb-2'>💡 잘못 입력된 내역을 삭제하려면 <b>체크박스 선택</b> 후 하단의 <b>삭제 버튼</b>을 누르세요. 전체 재구축 시 <b>초기화 버튼</b>을 누르세요.</div>", unsafe_allow_html=True)
+        st.markdown("<div class='text-sm text-gray-500 mb-2'>💡 잘못 입력된 내역을 삭제하려면 <b>체크박스 선택</b> 후 하단의 <b>삭제 버튼</b>을 누르세요. 선택은 쪽을 넘겨도 유지됩니다. 전체 재구축 시 <b>초기화 버튼</b>을 누르세요.</div>", unsafe_allow_html=True)
         
         col_config = {
             "삭제선택": st.column_config.CheckboxColumn("삭제 선택", default=False),
-            "_idx": None, "집행금액": None,
+            "_id": None,
             "집행일자": st.column_config.TextColumn(disabled=True),
             "세목": st.column_config.TextColumn(disabled=True),
             "적요": st.column_config.TextColumn(disabled=True),
             "집행금액_str": st.column_config.TextColumn("집행금액(원)", disabled=True)
         }
-        if '예산과목' in disp.columns:
+        if view.has_budget:
             col_config['예산과목'] = st.column_config.TextColumn(disabled=True)
             
+        # 쪽 내용이 바뀌면 새 편집기로 그립니다. (이전 쪽의 체크 상태가 다른 행에 옮겨 붙지 않도록)
         edited_df = st.data_editor(
             disp, 
             height=500, 
             hide_index=True,
             column_config=col_config,
-            key="daily_editor_v292"
+            key="daily_editor_" + hashlib.md5("".join(page_ids).encode()).hexdigest()[:12]
         )
+        for rid, checked in zip(edited_df['_id'], edited_df['삭제선택']):
+            if checked: selected_ids.add(rid)
+            else: selected_ids.discard(rid)
         
         del_c1, del_c2, del_c3 = st.columns([2, 2, 6])
         with del_c1:
             if st.button("🗑️ 선택 항목 삭제", key="btn_del_sel_v292"):
-                to_delete = edited_df[edited_df['삭제선택'] == True]['_idx'].tolist()
+                to_delete = selected_ids & view.id_set
                 if to_delete:
-                    new_daily = [item for i, item in enumerate(daily_data) if i not in to_delete]
+                    new_daily, deleted = [], []
+                    for item, rid in zip(daily_data, view.row_ids):
+                        (deleted if rid in to_delete else new_daily).append(item)
                     if save_daily_expenses(new_daily):
                         st.session_state['daily_expenses'] = new_daily
-                        sync_daily_to_master_auto()
-                        st.success(f"✅ {len(to_delete)}건의 내역이 삭제되었습니다.")
-                        time.sleep(1.0); st.rerun()
+                        selected_ids.clear()
+                        sync_daily_to_master_auto((daily_data, [], deleted))
+                        st.toast(f"✅ {len(to_delete)}건의 내역이 삭제되었습니다.")
+                        st.rerun()
                 else:
                     st.warning("먼저 삭제할 항목의 체크박스를 선택해주세요.")
+        with del_c3:
+            if live_selected and st.button(f"선택 해제 ({len(live_selected):,}건)", key="btn_clear_sel"):
+                selected_ids.clear(); st.rerun()
                     
         with del_c2:
             if st.button("⚠️ 전체 데이터 초기화", key="btn_del_all_v292"):
                 if save_daily_expenses([]):
                     st.session_state['daily_expenses'] = []
                     sync_daily_to_master_auto()
-                    st.success("✅ 모든 데이터가 완전히 초기화되었습니다.")
-                    time.sleep(1.0); st.rerun()
+                    st.toast("✅ 모든 데이터가 완전히 초기화되었습니다.")
+                    st.rerun()
     else:
         st.info("현재 저장된 일상경비 데이터가 없습니다. 엑셀 파일을 업로드해주세요.")
 
@@ -2324,38 +4780,43 @@ if current_page == "🚀 신속집행 대시보드":
     for c in ["대상액", "집행예정액", "실제집행액"]:
         if c in df_view.columns: df_view[c] = pd.to_numeric(df_view[c], errors="coerce").fillna(0.0)
     
-    if not df_all.empty and not df_view.empty and "세목" in df_view.columns:
-        for idx, row in df_view.iterrows():
-            cat = row['세목']
-            try:
-                m_num = int(str(row['월']).replace('월', ''))
-                actual_val = df_all[(df_all['year'] == 2026) & (df_all['category'] == cat) & (df_all['month'] == m_num)]['amount'].sum()
-                
-                # [V292 마법의 트릭] master_data에 이미 상하수도가 더해져 있으므로 여기서 또 더하면 안됨!
-                df_view.loc[idx, '실제집행액'] = float(actual_val)
-            except: pass
+    if RAPID_MONTH_COL not in df_view.columns:
+        df_view = with_rapid_month(df_view)
 
-    daily_list = st.session_state.get('daily_expenses', [])
-    # [V11/V12] 수동 입력분은 상세내역에도 표시되도록 daily view에 병합
-    daily_list = list(daily_list) + MANUAL_ASSET_ACQUISITION_ROWS + MANUAL_LAUNDRY_ACCRUAL_ROWS
+    ledger_agg = ledger_cube.aggregates()
+    if not df_all.empty and not df_view.empty and "세목" in df_view.columns:
+        # 2026년 원장을 (세목, 월) 표로 한 번 펼쳐 계획 행에 붙입니다. 월을 읽을 수 없는 행은 기존 값을 둡니다.
+        # [V292 마법의 트릭] master_data에 이미 상하수도가 더해져 있으므로 여기서 또 더하면 안됨!
+        actual_2026 = pd.DataFrame(ledger_cube.year_slice(2026), index=pd.Index(ledger_cube.categories, name="세목"), columns=pd.Index(MONTHS, name=RAPID_MONTH_COL)).stack().rename("_actual").reset_index()
+        actual_2026[RAPID_MONTH_COL] = actual_2026[RAPID_MONTH_COL].astype(float)
+        joined = df_view[["세목", RAPID_MONTH_COL]].merge(actual_2026, how="left", on=["세목", RAPID_MONTH_COL])
+        month_ok = df_view[RAPID_MONTH_COL].notna().to_numpy()
+        df_view["실제집행액"] = np.where(month_ok, joined["_actual"].fillna(0.0).to_numpy(), df_view["실제집행액"].to_numpy())
+
+    # 세션의 daily 목록은 이미 분류된 목록(classified_daily)이므로 분류 결과는 행에 저장된 값을 씁니다.
+    # [V11/V12] 수동 입력분은 상세내역에도 표시되도록 daily view에 병합 (규칙 파일 행이라 이 몇 행만 여기서 분류)
+    manual_rows = classify_daily_rows(RULES.manual_asset_rows + RULES.manual_laundry_rows)
+    daily_list = st.session_state.get('daily_expenses', []) + manual_rows
     df_daily = pd.DataFrame(daily_list) if daily_list else pd.DataFrame(columns=["집행일자", "적요", "집행금액", "세목", "예산과목"])
     if not df_daily.empty:
-        df_daily = df_daily.assign(MappedCategory=df_daily.apply(lambda r: force_mapped_category_for_known_cases(r.get('적요',''), r.get('세목',''), r.get('예산과목',''), r.get('집행금액',0)) or get_mapped_category(r.get('적요',''), r.get('세목',''), r.get('예산과목','')), axis=1))
+        df_daily = df_daily.assign(MappedCategory=df_daily[DAILY_CLASS_CATEGORY])
 
     current_m = datetime.now().month
 
+    # 세목별 대상액/누적계획은 계획 표를 한 번 묶어 구합니다.
+    plan_target, plan_to_date_map = {}, {}
+    if not df_view.empty and "세목" in df_view.columns:
+        plan_target = df_view.groupby("세목", sort=False)["대상액"].max().to_dict()
+        plan_to_date_map = df_view[df_view[RAPID_MONTH_COL] <= current_m].groupby("세목", sort=False)["집행예정액"].sum().to_dict()
+
     summary_list = []
     for cat in CORE_TARGETS:
         if df_view.empty or "세목" not in df_view.columns:
             continue
 
-        sub = df_view[df_view["세목"] == cat].copy()
-        t_amt = float(sub["대상액"].max()) if not sub.empty else 0.0
-        
-        e_amt = float(df_all[(df_all['year'] == 2026) & (df_all['category'] == cat)]['amount'].sum()) if not df_all.empty else 0.0
-            
-        sub = sub.assign(month_num=sub['월'].apply(lambda x: int(str(x).replace('월',''))))
-        plan_to_date = sub[sub['month_num'] <= current_m]["집행예정액"].sum()
+        t_amt = float(plan_target.get(cat, 0.0))
+        e_amt = ledger_agg.same_month(2026, cat, 12) if not df_all.empty else 0.0
+        plan_to_date = plan_to_date_map.get(cat, 0.0)
         
         summary_list.append({
             "세목": cat, "대상액": t_amt, "누적계획": plan_to_date, "집행액": e_amt, 
@@ -2384,12 +4845,8 @@ if current_page == "🚀 신속집행 대시보드":
             mo_goal_rate = QUICK_EXEC_GOAL_RATES["행안부"]["h1"] * 100
             city_goal_rate = QUICK_EXEC_GOAL_RATES["남양주시"]["h1"] * 100
 
-        def _actual_for_period(cat_name, months):
-            if df_all.empty:
-                return 0.0
-            return float(df_all[(df_all['year'] == 2026) & (df_all['category'] == cat_name) & (df_all['month'].isin(months))]['amount'].sum())
-
-        df_summary["기간집행액"] = df_summary["세목"].apply(lambda c: _actual_for_period(c, period_months))
+        # 기간(1월~마지막 월) 집행액은 원장 누계표에서 바로 읽습니다.
+        df_summary["기간집행액"] = [ledger_agg.same_month(2026, c, max(period_months)) if not df_all.empty else 0.0 for c in df_summary["세목"]]
         total_actual = float(df_summary["기간집행액"].sum())
         total_rate = (total_actual / total_target * 100.0) if total_target > 0 else 0.0
         mo_goal_amt = total_target * (mo_goal_rate / 100.0)
@@ -2458,7 +4915,7 @@ if current_page == "🚀 신속집행 대시보드":
   </div>
 </div>
 """
-        components.html(quick_dashboard_html, height=380, scrolling=False)
+        lazy_import("streamlit.components.v1").html(quick_dashboard_html, height=380, scrolling=False)
 
         gap_cols = st.columns(2)
         with gap_cols[0]:
@@ -2513,7 +4970,7 @@ if current_page == "🚀 신속집행 대시보드":
                 elif cat == "상하수도":
                     # 상하수도는 일반재료비 중 상하수도 관련 적요/세목/예산과목이 있는 행만 별도 표시합니다.
                     # 일반재료비 전체 집계와 별개로, 상하수도 관리항목의 월별 집계 근거를 보여주기 위한 필터입니다.
-                    cat_daily = df_daily[df_daily.apply(lambda r: is_water_charge_row(r.get('적요',''), r.get('세목',''), r.get('예산과목','')), axis=1)].copy()
+                    cat_daily = df_daily[df_daily[DAILY_CLASS_WATER].astype(int) == 1].copy()
                 else:
                     cat_daily = df_daily[df_daily['MappedCategory'] == cat].copy()
 
@@ -2571,7 +5028,7 @@ if current_page == "🚀 신속집행 대시보드":
     st.markdown('<div class="section-header">📝 대상액 / 집행예정액 계획 수정</div>', unsafe_allow_html=True)
     if not df_view.empty and "세목" in df_view.columns:
         edited_df = st.data_editor(
-            df_view, 
+            df_view.drop(columns=RAPID_MONTH_COL), 
             hide_index=True, 
             column_config={
                 "세목": st.column_config.TextColumn(disabled=True), 
@@ -2584,9 +5041,9 @@ if current_page == "🚀 신속집행 대시보드":
         )
 
         if st.button("💾 대상액/집행예정액 영구 저장", type="primary", key="save_rapid_btn_v292"):
-            st.session_state['rapid_df'] = edited_df
+            st.session_state['rapid_df'] = with_rapid_month(edited_df)
             if save_rapid_df(edited_df): 
-                st.success("✅ 저장 성공!"); time.sleep(0.5); st.rerun()
+                st.toast("✅ 저장 성공!"); st.rerun()
 
 # --- TAB 6: 정량실적 ---
 if current_page == "📂 1~12월 정량실적":
@@ -2595,9 +5052,14 @@ if current_page == "📂 1~12월 정량실적":
     sel_year = c_y.radio("조회 연도", YEARS, index=2, horizontal=True, key="ry_v292_q")
     sel_months = c_m.multiselect("조회 월 선택", MONTHS, default=[1], format_func=lambda x: f"{x}월", key="rm_v292_q")
     
+    # 같은 선택으로 다시 그릴 때는 캐시만 사용하고, 선택이 바뀌었을 때만 문서 변경 여부를 확인합니다.
+    quant_view = (sel_year, tuple(sorted(sel_months)))
+    quant_rows = load_quant_months(sel_year, sel_months, revalidate=st.session_state.get('quant_view') != quant_view)
+    st.session_state['quant_view'] = quant_view
+
     all_data_list = []
     for m in sorted(sel_months):
-        raw = load_quant_monthly(sel_year, m)
+        raw = quant_rows.get(m)
         if raw:
             m_df = pd.DataFrame(raw); m_df["month_label"] = f"{m}월 지출액"; m_df["original_idx"] = m_df.index; all_data_list.append(m_df)
             
@@ -2647,4 +5109,6 @@ if current_page == "📂 1~12월 정량실적":
                     cols[2].markdown(label_html, unsafe_allow_html=True)
                     cols[3].write(f"{int(row['예산액']):,}")
                     cols[4].write(f"{int(row['예산배정']):,}")
-    else: st.info("데이터가 없습니다.")
\ No newline at end of file
+    else: st.info("데이터가 없습니다.")
+
+record_render_time(current_page)
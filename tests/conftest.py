@@ -0,0 +1,26 @@
+"""app.py 를 Streamlit bare 모드로 한 번 실행해 그 전역(함수·상수)을 테스트에 넘겨줍니다.
+
+앱은 작업 폴더에 local_store.db / parse_cache/ 를 만들므로 테스트 동안 임시 폴더를 작업 폴더로 쓰고,
+분류 규칙이 운영과 같도록 category_rules.json 만 복사해 둡니다.
+"""
+import os
+import runpy
+import shutil
+import types
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("app")
+    shutil.copy(REPO_ROOT / "category_rules.json", workdir / "category_rules.json")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        yield types.SimpleNamespace(**runpy.run_path(str(REPO_ROOT / "app.py"), run_name="app"))
+    finally:
+        os.chdir(cwd)
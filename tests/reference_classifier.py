@@ -0,0 +1,109 @@
+"""예전 키워드 순차 탐색 분류기와 합성 입력.
+
+app.py 의 get_mapped_category / classify_expense 가 예전 판정 순서와 같은 결과를 내는지 비교하는 기준입니다.
+"""
+import random
+
+
+def get_mapped_category_scan(app, desc, row_cat, budget_subj=""):
+    """기존 키워드 순차 탐색 분류기. 자산 키워드만 규칙 파일(app.RULES)에서 가져옵니다."""
+    desc_no_space = str(desc).replace(" ", "").strip()
+    row_cat_no_space = str(row_cat).replace(" ", "").strip()
+    budget_no_space = str(budget_subj).replace(" ", "").strip()
+
+    # [V10] 금액/적요 기반 강제 예외: 세탁용역 귀속월 보정건, 수탁자산취득비성 조달구매
+    # amount는 기존 시그니처 호환을 위해 이 함수에서는 직접 받지 않지만,
+    # desc/row_cat/budget_subj에 명확한 자산취득 키워드가 있으면 최우선 분류합니다.
+    if app.RULES.is_asset_text(desc, row_cat, budget_subj):
+        return "수탁자산취득비"
+
+    # [V5] 특수 업로드/수동 세목이 이미 관리항목명으로 들어온 경우 최우선 인정
+    # 예: 5대 용역 파일에서 "고객편의기기 관리용역"을 "공청기비데"로 변환해 저장한 행
+    for cat_name in app.CATEGORIES:
+        cat_no_space = str(cat_name).replace(" ", "")
+        if cat_no_space and (cat_no_space in row_cat_no_space or cat_no_space in budget_no_space):
+            return cat_name
+    
+    # 0. 기름/걸레/마포 관련 완벽 배제 (환경용역 15,600,000원 100% 보장)
+    if any(k in desc_no_space or k in row_cat_no_space or k in budget_no_space for k in ["기름", "걸레", "마포"]):
+        return None
+
+    # 1. 엑셀 I열(예산과목) 최우선
+    #    ※ 일반재료비는 상하수도요금 등 세부 적요와 관계없이 모두 일반재료비로 집계
+    #       기존에는 적요에 '상하수도'가 있으면 먼저 상하수도로 빠져 일반재료비 집계에서 누락됨
+    if budget_no_space:
+        if "일반재료비" in budget_no_space: return "일반재료비"
+        if "상품매입비" in budget_no_space: return "상품매입비"
+        if "수탁자산취득비" in budget_no_space: return "수탁자산취득비"
+        if "자체소수선" in budget_no_space: return "자체소수선"
+        
+    # 2. 특수 공과금 (수도) - 예산과목이 없는 자료에서만 별도 분류
+    if any(k in desc_no_space or k in row_cat_no_space for k in ["상하수도요금", "수도요금", "수도료", "수도대금", "상하수도", "상수도", "하수도"]):
+        return "상하수도"
+        
+    # 2-1. 특수 공과금 (전기요금)
+    if any(k in desc_no_space or k in row_cat_no_space for k in ["전기요금", "전기료", "한전", "한국전력", "전력요금"]):
+        if not any(k in desc_no_space for k in ["공사", "대행", "수수료", "충전", "전기차", "수리", "교체"]):
+            return "전기요금"
+            
+    # 1-2. 미디어실
+    if "미디어" in desc_no_space and any(k in desc_no_space for k in ["제습", "습기"]):
+        return "미디어실제습기"
+
+    # 2-2. 수탁자산취득비: 예산과목 컬럼이 없는 지출명령 자료는 적요 키워드로 보완 분류
+    # 예: 자동심장충격기 조달구매, 포충기 조달구매, 방화벽/보안장비 조달구매 등
+    if app.RULES.is_asset_text(desc, row_cat, budget_subj):
+        return "수탁자산취득비"
+
+    # 3. 명시적 카테고리명 일치
+    safe_categories = ["환경용역", "상품매입비", "세탁용역", "일반재료비", "자체소수선", "부서업무비"]
+    for cat_name in safe_categories:
+        if cat_name in row_cat_no_space or cat_name in desc_no_space:
+            return cat_name
+
+    # 4. 세부 키워드 매핑
+    keyword_map = {
+        "통신요금": ["통신요금", "통신비", "인터넷", "케이블"],
+        "복합기임대": ["복합기임대", "복합기렌탈"], 
+        "공청기비데": ["고객편의기기관리용역", "고객편의기기", "공기청정기렌탈", "공기청정기", "공청기", "비데렌탈", "비데"],
+        "무인경비": ["무인경비용역"],
+        "승강기점검": ["승강기유지보수", "승강기점검"], 
+        "신용카드수수료": ["신용카드수수료"], 
+        "환경용역": ["청소용역", "미화용역"],
+        "세탁용역": ["세탁"],
+        "야간경비": ["야간경비용역", "당직용역"],
+        "상품매입비": ["상품매입", "자판기식음료", "종량제봉투"]
+    }
+    
+    for m_cat, kws in keyword_map.items():
+        if any(k in desc_no_space for k in kws):
+            return m_cat
+            
+    return None
+
+
+def make_synthetic_category_cases(app, n_cases=20000, seed=0):
+    """(적요, 세목, 예산과목, 금액) 조합. 규칙 파일의 모든 키워드를 공백/빈값과 섞어 만듭니다."""
+    rules = app.RULES
+    rng = random.Random(seed)
+    words = list(app.CATEGORIES) + rules.asset_keywords + list(rules.exclude_keywords) + list(rules.budget_priority)
+    words += list(rules.water_keywords) + list(rules.electric_keywords) + list(rules.electric_exclude_keywords)
+    words += [rules.media_keywords[0]] + list(rules.media_keywords[1]) + list(rules.safe_categories)
+    words += [k for _, kws in rules.keyword_map for k in kws]
+    words += ["2026년 3월", "구입", "지급", "cctv", "물사용료", "일반 재료비", " ", ""]
+    blanks = [None, float("nan"), "", "nan"]
+
+    def text(max_words):
+        if rng.random() < 0.15:
+            return rng.choice(blanks)
+        picked = [rng.choice(words) for _ in range(rng.randint(0, max_words))]
+        # 키워드를 공백으로 쪼개 붙여 공백 제거 후에만 맞는 경우도 섞습니다.
+        return "".join(w if rng.random() < 0.7 else " ".join(w) for w in picked)
+
+    amounts = [0, 1500000, "12,000원", None]
+    forced_amounts = sorted(set(rules.forced_amount_categories) | {amount for _, amount in rules.accrual_splits})
+    forced_amounts += [f"{a:,}" for a in forced_amounts] + [a + 0.4 for a in forced_amounts]
+
+    def amount():
+        return rng.choice(forced_amounts if rng.random() < 0.05 else amounts)
+    return [(text(3), text(2), text(2), amount()) for _ in range(n_cases)]
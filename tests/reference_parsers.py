@@ -0,0 +1,275 @@
+"""예전 행 단위 파서와 합성 시트.
+
+app.py 의 열 단위(벡터) 파서가 예전 결과와 완전히 같은지 비교하는 기준으로만 씁니다.
+앱 전역(RULES, clean_numeric 등)은 conftest 의 app 네임스페이스로 받습니다.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def parse_expense_excel_rowwise(app, df_raw):
+    """기존 행 단위 지출명령 파서."""
+    header_idx = -1; found_cols = {}
+    keyword_detect = {
+        '집행일자': ['지급일자','지급일','지급명령일자','일자','날짜','집행일','결의일자'], 
+        '적요': ['적요','내용','품명','건명'], 
+        '집행금액': ['지급명령금액','지급액','지출금액','금액','집행액','지출액','결재금액'],
+        '예산과목': ['예산과목', '과목명', '항목', '예산항목', '편성목']
+    }
+    
+    for i in range(min(25, len(df_raw))):
+        row_vals = [re.sub(r'\s+', '', str(v)) for v in df_raw.iloc[i]]
+        temp_map = {}
+        for k, kws in keyword_detect.items():
+            for idx, val in enumerate(row_vals):
+                if any(kw in val for kw in kws): temp_map[k] = idx; break
+        if len(temp_map) >= 3: 
+            header_idx = i; found_cols = temp_map; break
+            
+    if header_idx == -1:
+        # [V10] 헤더 인식 실패 대비: A=지급일자, B=적요, C=지급명령금액 형태의 단순 지출명령 자료 보완
+        fallback_rows = []
+        for _, row in df_raw.iterrows():
+            row_arr = row.values
+            if len(row_arr) < 3:
+                continue
+            date_val = str(row_arr[0]).strip() if pd.notna(row_arr[0]) else ""
+            desc = str(row_arr[1]).strip() if pd.notna(row_arr[1]) else ""
+            amt_val = app.clean_numeric(row_arr[2])
+            if not desc or "합계" in desc or amt_val <= 0:
+                continue
+            forced_cat = app.force_mapped_category_for_known_cases(desc, "", "", amt_val)
+            if forced_cat:
+                fallback_rows.append({
+                    "세목": forced_cat,
+                    "집행일자": date_val,
+                    "적요": desc,
+                    "집행금액": amt_val,
+                    "예산과목": forced_cat
+                })
+        return fallback_rows if fallback_rows else None
+        
+    data_rows = df_raw.iloc[header_idx+1:].copy()
+    new_processed = []
+    
+    row_header_vals = [re.sub(r'\s+', '', str(v)) for v in df_raw.iloc[header_idx]]
+    fallback_semok_idx = -1
+    for idx, val in enumerate(row_header_vals):
+        if any(kw in val for kw in ['세목','과목','항목']): fallback_semok_idx = idx; break
+
+    for _, row in data_rows.iterrows():
+        row_arr = row.values
+        desc_idx = found_cols.get('적요', -1)
+        desc = str(row_arr[desc_idx]).strip() if desc_idx != -1 and pd.notna(row_arr[desc_idx]) else ""
+        if not desc or "합계" in desc: continue
+        
+        b_val = str(row_arr[1]).strip() if len(row_arr) > 1 and pd.notna(row_arr[1]) else ""
+        f_val = str(row_arr[5]).strip() if len(row_arr) > 5 and pd.notna(row_arr[5]) else ""
+        g_val = str(row_arr[6]).strip() if len(row_arr) > 6 and pd.notna(row_arr[6]) else ""
+        
+        budget_idx = found_cols.get('예산과목', -1)
+        if budget_idx != -1 and len(row_arr) > budget_idx:
+            budget_subj = str(row_arr[budget_idx]).strip() if pd.notna(row_arr[budget_idx]) else ""
+        else:
+            budget_subj = str(row_arr[8]).strip() if len(row_arr) > 8 and pd.notna(row_arr[8]) else ""
+        
+        # [V292 절대 명령 반영] I열 값이 일반재료비면 확보
+        col_i_val = str(row_arr[8]).replace(" ", "") if len(row_arr) > 8 and pd.notna(row_arr[8]) else ""
+        if "일반재료비" in col_i_val:
+            budget_subj = "일반재료비"
+
+        semok_str = ""
+        if b_val and (not f_val or not g_val):
+            if b_val in app.RULES.budget_mapping: f_val, g_val = app.RULES.budget_mapping[b_val]
+        
+        if re.match(r'^\d+(-\d+)?$', b_val) and f_val and g_val:
+            b_prefix = b_val.split('-')[0]
+            semok_str = f"[{b_prefix}]{f_val} - [{b_val}]{g_val}"
+        else:
+            if fallback_semok_idx != -1 and pd.notna(row_arr[fallback_semok_idx]):
+                semok_str = str(row_arr[fallback_semok_idx]).strip()
+            elif re.match(r'^\d+(-\d+)?$', b_val):
+                semok_str = b_val
+        
+        date_idx = found_cols.get('집행일자', -1)
+        date_val = str(row_arr[date_idx]).strip() if date_idx != -1 and pd.notna(row_arr[date_idx]) else ""
+        amt_idx = found_cols.get('집행금액', -1)
+        amt_val = app.clean_numeric(row_arr[amt_idx]) if amt_idx != -1 else 0
+        
+        if semok_str in ["nan", "NaT", "None"]: semok_str = ""
+        if date_val in ["nan", "NaT", "None"]: date_val = ""
+        if desc in ["nan", "NaT", "None"]: desc = ""
+        if budget_subj in ["nan", "NaT", "None"]: budget_subj = ""
+
+        forced_cat = app.force_mapped_category_for_known_cases(desc, semok_str, budget_subj, amt_val)
+        if forced_cat == "수탁자산취득비":
+            semok_str = "수탁자산취득비"
+            budget_subj = "수탁자산취득비"
+        elif forced_cat == "세탁용역":
+            semok_str = "세탁용역"
+            budget_subj = "세탁용역"
+        
+        new_processed.append({
+            "세목": semok_str, 
+            "집행일자": date_val, 
+            "적요": desc, 
+            "집행금액": amt_val,
+            "예산과목": budget_subj
+        })
+        
+    return new_processed
+
+
+def make_synthetic_expense_sheet(app, n_rows=50000, seed=0):
+    """지출명령 시트. 코드/금액/예산과목 표기를 실제 자료처럼 섞어서 만듭니다."""
+    rng = np.random.default_rng(seed)
+    codes = list(app.RULES.budget_mapping.keys()) + ["201-13", "x", ""]
+    descs = ["2026년 3월 전기요금", "상하수도요금", "포충기 조달구매", "인터넷 통신요금", "복합기임대료",
+             "자판기식음료 구입", "기름걸레 구입", "세탁 용역 비용", "신용카드수수료", "부서업무비", "합계", None]
+    amounts = np.array(["1,234,000", "4781810", "#REF", "12,000원", None, 4781810.0, -500, 35000], dtype=object)
+    budgets = ["일반재료비", "공공운영비", "", "  일반 재료비 ", "수탁자산취득비", None]
+    header = [["일상경비 지출명령 내역"] + [None] * 11,
+              ["지급일자", "과목코드", "적요", "지급명령금액", "비고", "항", "목", None, "예산과목", None, None, None]]
+    body = pd.DataFrame({
+        0: [f"2026-{m:02d}-{d:02d}" for m, d in zip(rng.integers(1, 13, n_rows), rng.integers(1, 29, n_rows))],
+        1: rng.choice(np.array(codes, dtype=object), n_rows),
+        2: rng.choice(np.array(descs, dtype=object), n_rows),
+        3: amounts[rng.integers(0, len(amounts), n_rows)],
+        5: rng.choice(np.array([None, "재료비", "일반운영비"], dtype=object), n_rows),
+        6: rng.choice(np.array([None, "일반재료비", "공공운영비"], dtype=object), n_rows),
+        8: rng.choice(np.array(budgets, dtype=object), n_rows),
+    }).reindex(columns=range(12))
+    return pd.concat([pd.DataFrame(header), body.astype(object)], ignore_index=True)
+
+
+def map_special_category(app, title):
+    """예전 행 단위 5대 항목 분류. (벡터 파서는 special_category_masks 사용)"""
+    t = app.normalize_special_text(title)
+    if not t:
+        return ""
+    # 5대 특수항목 강제 분류
+    for category, groups in app.SPECIAL_CATEGORY_RULES:
+        if any(all(kw in t for kw in group) for group in groups):
+            return category
+    return ""
+
+
+def parse_special_expense_excel_rowwise(app, df_raw):
+    """기존 행 단위 5대 용역/수수료 파서."""
+    normalize_text = app.normalize_special_text
+    parse_month_from_value = app.parse_special_month
+
+    # 금액 컬럼 위치 탐색
+    header_idx = -1
+    amt_idx = -1
+    for i in range(min(30, len(df_raw))):
+        row_vals = [normalize_text(v) for v in df_raw.iloc[i]]
+        for idx, val in enumerate(row_vals):
+            if any(kw in val for kw in ['금액', '집행액', '지출액', '결재금액', '청구액', '지급액']):
+                header_idx = i
+                amt_idx = idx
+                break
+        if header_idx != -1:
+            break
+
+    # header가 잡히면 그 다음 행부터, 아니면 전체 행 검사
+    data_rows = df_raw.iloc[header_idx+1:].copy() if header_idx != -1 else df_raw.copy()
+    new_processed = []
+
+    for _, row in data_rows.iterrows():
+        row_arr = row.values
+        if len(row_arr) <= 10:
+            continue
+
+        month_raw = row_arr[1]       # B열 지급월
+        title_raw = row_arr[10]      # K열 문서제목
+        title_val = str(title_raw).strip() if not pd.isna(title_raw) else ""
+        title_no_space = normalize_text(title_raw)
+
+        if not title_no_space or "합계" in title_no_space:
+            continue
+
+        # 기름걸레 등 다른 비용이 특수항목으로 섞이는 것 방지
+        if "기름" in title_no_space and "걸레" in title_no_space:
+            continue
+
+        mapped_cat = map_special_category(app, title_val)
+        if not mapped_cat:
+            continue
+
+        # 월은 B열 지급월을 최우선 사용. B열이 비어 있거나 무효일 때만 제목 보조 사용.
+        month = parse_month_from_value(month_raw)
+        if month == 0:
+            month = parse_month_from_value(title_val)
+        # [V5] 제목이 "2026년 0월"이고 B열도 비정상인 경우, 행 앞쪽의 다른 월 후보를 보조 탐색
+        if month == 0:
+            for x in list(row_arr[:10]):
+                m_try = parse_month_from_value(x)
+                if 1 <= m_try <= 12:
+                    month = m_try
+                    break
+        if month == 0 or not (1 <= month <= 12):
+            continue
+
+        # 금액 추출: 금액 헤더 우선, 실패 시 L열 이후, 그래도 실패 시 전체 행에서 후보 탐색
+        amt_val = 0.0
+        if amt_idx != -1 and len(row_arr) > amt_idx:
+            amt_val = app.clean_numeric(row_arr[amt_idx])
+
+        if amt_val <= 0:
+            # 보통 K열 제목 다음 L열 이후에 금액이 있는 경우
+            nums = []
+            for x in row_arr[11:]:
+                n = app.clean_numeric(x)
+                if n > 0:
+                    nums.append(n)
+            if nums:
+                amt_val = max(nums)
+
+        if amt_val <= 0:
+            # 금액이 K열 앞쪽에 있는 양식 보완. 월/연도처럼 작은 숫자는 제외.
+            nums = []
+            for idx, x in enumerate(row_arr):
+                if idx in [1, 10]:
+                    continue
+                n = app.clean_numeric(x)
+                if n >= 1000:  # 2026, 월 숫자 등 오인 방지
+                    nums.append(n)
+            if nums:
+                amt_val = max(nums)
+
+        if amt_val <= 0:
+            continue
+
+        date_str = f"2026-{month:02d}-01"
+        new_processed.append({
+            "세목": mapped_cat,
+            "집행일자": date_str,
+            "적요": title_val,
+            "집행금액": amt_val,
+            "예산과목": mapped_cat,
+            "업로드구분": "5대용역수수료"
+        })
+
+    return new_processed
+
+
+def make_synthetic_special_sheet(n_rows=5000, seed=0):
+    """5대 용역/수수료 시트. 지급월/제목/금액 표기를 실제 자료처럼 섞어서 만듭니다."""
+    rng = np.random.default_rng(seed)
+    months = np.array([1, "2월", "2026-03-15", "2026.04.", "2026년 5월", "0", None, pd.Timestamp(2026, 6, 1), "12.0", "abc"], dtype=object)
+    titles = np.array(["신용카드 수수료 1월", "무인경비 용역", "고객편의기기 관리용역", "공기청정기 렌탈", "야간경비 용역",
+                       "청소용역", "환경용역 2026년 0월", "기름 걸레 청소용역", "합계", None, "기타 용역"], dtype=object)
+    amounts = np.array([350000, "1,200,000", None, 0, "#N/A", 98000.0], dtype=object)
+    body = pd.DataFrame({
+        0: np.arange(n_rows),
+        1: months[rng.integers(0, len(months), n_rows)],
+        4: np.array([None, 5000, "12,345"], dtype=object)[rng.integers(0, 3, n_rows)],
+        10: titles[rng.integers(0, len(titles), n_rows)],
+        11: np.array([None, 1500, "3,000"], dtype=object)[rng.integers(0, 3, n_rows)],
+        12: amounts[rng.integers(0, len(amounts), n_rows)],
+    }).reindex(columns=range(14))
+    header = [["5대 용역"] + [None] * 13, ["번호", "지급월"] + [None] * 8 + ["문서제목", None, "지급액", None]]
+    return pd.concat([pd.DataFrame(header), body.astype(object)], ignore_index=True)
@@ -0,0 +1,56 @@
+"""관리항목 분류기(classify_expense)가 예전 순차 탐색 분류기와 같은 결과를 내는지 확인합니다."""
+import time
+
+import pytest
+
+from reference_classifier import get_mapped_category_scan, make_synthetic_category_cases
+
+
+def _cases(app, n_cases, seed=0):
+    rules = app.RULES
+    cases = make_synthetic_category_cases(app, n_cases, seed=seed)
+    cases += [(r["적요"], r["세목"], r["예산과목"], r["집행금액"]) for r in rules.manual_asset_rows + rules.manual_laundry_rows]
+    return cases
+
+
+def _expected(app, cases):
+    return [app.forced_category_for_amount(c[3], app.RULES) or get_mapped_category_scan(app, *c[:3]) for c in cases]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_classifier_matches_scan(app, seed):
+    cases = _cases(app, 20000, seed)
+    expected = _expected(app, cases)
+    app.clear_category_memo()
+    assert [app.classify_expense(*c) for c in cases] == expected
+    # 두 번째는 메모에서 나옵니다.
+    assert [app.classify_expense(*c) for c in cases] == expected
+
+
+def test_get_mapped_category_matches_scan(app):
+    cases = _cases(app, 5000, seed=2)
+    app.clear_category_memo()
+    assert [app.get_mapped_category(*c[:3]) for c in cases] == [get_mapped_category_scan(app, *c[:3]) for c in cases]
+
+
+def test_classifier_benchmark(app):
+    """메모 없이/메모로 분류한 시간을 순차 탐색과 비교합니다. (-s 로 실행하면 시간 출력)"""
+    cases = _cases(app, 20000)
+    start = time.perf_counter(); expected = _expected(app, cases)
+    scan_sec = time.perf_counter() - start
+    app.clear_category_memo()
+    start = time.perf_counter(); cold = [app.classify_expense(*c) for c in cases]
+    cold_sec = time.perf_counter() - start
+    start = time.perf_counter(); warm = [app.classify_expense(*c) for c in cases]
+    memo_sec = time.perf_counter() - start
+    print(f"분류 {len(cases):,}건 · 순차 {scan_sec:.3f}초 · 메모 없이 {cold_sec:.3f}초 · 메모 {memo_sec:.3f}초")
+    assert cold == warm == expected
+    assert memo_sec < scan_sec
+
+
+def test_keyword_matcher_matches_substring_checks(app):
+    keywords = ["상하수도요금", "수도요금", "상하수도", "하수도", "수도", "요금", "전기", "전기요금", "기요"]
+    matcher = app.KeywordMatcher(keywords)
+    texts = ["상하수도요금", "전기요금및수도", "하수도전기", "", "기요금요"]
+    for text, found in zip(texts, matcher.find(*texts)):
+        assert found == {k for k in keywords + [""] if k in text}
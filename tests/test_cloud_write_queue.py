@@ -0,0 +1,92 @@
+"""클라우드 지연 쓰기 큐(CloudWriteQueue)의 batch 분리, 재시도 한도, 재시작 후 이어 쓰기를 확인합니다."""
+import time
+
+
+class FakeDoc:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def _check(self, kind):
+        if self.path in self.db.broken:
+            raise ValueError(f"400 invalid {kind}: {self.path}")
+
+    def set(self, payload, timeout=None):
+        self._check("set")
+        self.db.docs[self.path] = payload
+
+    def update(self, payload, timeout=None):
+        self._check("update")
+        self.db.docs.setdefault(self.path, {}).update(payload)
+
+    def delete(self, timeout=None):
+        self._check("delete")
+        self.db.docs.pop(self.path, None)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def set(self, ref, payload): self.ops.append((ref.set, payload))
+    def update(self, ref, payload): self.ops.append((ref.update, payload))
+    def delete(self, ref): self.ops.append((ref.delete, None))
+
+    def commit(self, timeout=None):
+        self.db.commits += 1
+        if any(fn.__self__.path in self.db.broken for fn, _ in self.ops):
+            raise ValueError("400 batch rejected")  # Firestore batch 는 한 건이라도 틀리면 모두 실패
+        for fn, payload in self.ops:
+            fn() if payload is None else fn(payload)
+
+
+class FakeFirestore:
+    def __init__(self, broken=()):
+        self.docs = {}
+        self.broken = set(broken)
+        self.commits = 0
+
+    def document(self, path): return FakeDoc(self, path)
+    def batch(self): return FakeBatch(self)
+
+
+def wait_until(cond, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "시간 안에 끝나지 않았습니다"
+        time.sleep(0.02)
+
+
+def make_queue(app, client, **kwargs):
+    return app.CloudWriteQueue(client, app.CloudCircuitBreaker(), coalesce_seconds=0.01, max_delay_seconds=0.05,
+                               retry_max_seconds=0.01, **kwargs)
+
+
+def test_bad_write_does_not_block_its_batch(app):
+    client = FakeFirestore(broken={"c/bad"})
+    queue = make_queue(app, client, max_attempts=3)
+    queue.enqueue_many([(client.document(f"c/ok{i}"), "set", {"n": i}) for i in range(3)]
+                       + [(client.document("c/bad"), "update", {"n": -1})])
+    wait_until(lambda: queue.dead_count == 1 and queue.pending_count() == 0)
+    assert client.docs == {f"c/ok{i}": {"n": i} for i in range(3)}
+    assert queue.dead_letters[0]["path"] == "c/bad" and queue.dead_letters[0]["attempts"] == 3
+    assert queue.error_seq == 3 and "400" in str(queue.last_error)  # batch 를 나눈 뒤 bad 만 3번 실패
+
+
+def test_pending_writes_survive_restart(app, tmp_path):
+    store = app.LocalStore(str(tmp_path / "store.db"))
+    client = FakeFirestore()
+    offline = make_queue(app, client)
+    offline.breaker.state, offline.breaker.open_until = "open", time.monotonic() + 3600  # 차단 중이라 보내지 못하는 상태
+    offline.bind_store(store)
+    offline.enqueue(client.document("c/master"), "set", {"cells": {"a": 1}})
+    offline.enqueue(client.document("c/master"), "update", {"cells.b": 2})
+    offline.enqueue(client.document("c/old"), "delete")
+    wait_until(lambda: len(store.load_outbox()) == 2)
+
+    restarted = make_queue(app, client)
+    restarted.bind_store(store)
+    assert restarted.drain(timeout=5.0)
+    assert client.docs == {"c/master": {"cells": {"a": 1, "b": 2}}}
+    wait_until(lambda: store.load_outbox() == [])
@@ -0,0 +1,117 @@
+"""일상경비 → 원장 증분 동기화(DailySyncEngine)가 전체 재계산과 같은지 확인합니다."""
+import random
+
+import pytest
+
+DESCS = ["2026년 3월 전기요금", "상하수도요금 납부", "청소용역 2월분", "세탁 용역 비용", "인터넷 통신요금",
+         "포충기 조달구매", "기름걸레 구입", "자판기식음료 구입", "복합기임대료", "일반 사무용품"]
+SEMOKS = ["[210]일반운영비 - [210-01]사무관리비", "210-01", "[201]인건비 - [201-13]일급여", "", "공공요금"]
+BUDGETS = ["일반재료비", "공공운영비", "", "수탁자산취득비", "상품매입비"]
+
+
+def make_daily_rows(n_rows, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n_rows):
+        rows.append({
+            "세목": rng.choice(SEMOKS),
+            "집행일자": f"{rng.choice([2025, 2026])}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "적요": rng.choice(DESCS),
+            "집행금액": rng.choice([12000, 350000.0, 1500000, 4781810]),
+            "예산과목": rng.choice(BUDGETS),
+        })
+    return rows
+
+
+def build_daily_cube(app, daily):
+    """전체 재계산: 모든 행의 기여분을 처음부터 더한 {(연, 항목, 월): 금액}"""
+    cube = {}
+    for row in daily:
+        for year, cat, month, amount in app.daily_row_contributions(row):
+            cube[(year, cat, month)] = cube.get((year, cat, month), 0) + amount
+    return {cell: amount for cell, amount in cube.items() if amount != 0}
+
+
+@pytest.fixture
+def engine(app):
+    return app.DailySyncEngine()
+
+
+def _sync(app, engine, daily, delta=None):
+    if delta is None:
+        return engine.update(daily, app.RULES.stamp, app.daily_row_contributions)
+    return engine.apply_delta(delta, daily, app.RULES.stamp, app.daily_row_contributions)
+
+
+def test_full_update_matches_rebuild(app, engine):
+    daily = app.classify_daily_rows(make_daily_rows(2000))
+    assert _sync(app, engine, daily) == (2000, 0)
+    assert engine.cube == build_daily_cube(app, daily)
+    # 같은 목록이면 다시 비교하지 않습니다.
+    assert _sync(app, engine, daily) == (0, 0)
+
+
+def test_merge_delta_matches_rebuild(app, engine):
+    old = app.classify_daily_rows(make_daily_rows(1500, seed=1))
+    _sync(app, engine, old)
+    merged, (added_count,), delta = app.merge_expense_batches(old, [make_daily_rows(400, seed=2)])
+    before, added, removed = delta
+    assert before is old and len(added) == added_count + len(removed)
+    assert _sync(app, engine, merged, delta) == (len(added), len(removed))
+    assert engine.synced is merged
+    assert engine.cube == build_daily_cube(app, merged)
+
+
+def test_delete_delta_matches_rebuild(app, engine):
+    daily = app.classify_daily_rows(make_daily_rows(1500, seed=3))
+    _sync(app, engine, daily)
+    rng = random.Random(4)
+    drop = set(rng.sample(range(len(daily)), 300))
+    kept = [row for i, row in enumerate(daily) if i not in drop]
+    deleted = [row for i, row in enumerate(daily) if i in drop]
+    assert _sync(app, engine, kept, (daily, [], deleted)) == (0, 300)
+    assert engine.cube == build_daily_cube(app, kept)
+
+
+def test_stale_delta_falls_back_to_full_diff(app, engine):
+    first = app.classify_daily_rows(make_daily_rows(800, seed=5))
+    _sync(app, engine, first)
+    # 다른 세션이 저장한 목록을 새로 읽은 경우: 변경분의 이전 목록이 큐브가 반영한 목록과 다릅니다.
+    reloaded = app.classify_daily_rows(make_daily_rows(900, seed=6))
+    merged, _, delta = app.merge_expense_batches(reloaded, [make_daily_rows(50, seed=7)])
+    _sync(app, engine, merged, delta)
+    assert engine.synced is merged
+    assert engine.cube == build_daily_cube(app, merged)
+
+
+def test_row_key_ignores_int_float_amounts(app):
+    row = make_daily_rows(1)[0]
+    assert app.daily_row_key({**row, "집행금액": 12000}) == app.daily_row_key({**row, "집행금액": 12000.0})
+
+
+def test_each_session_keeps_its_own_delta_base(app, monkeypatch):
+    state = app.st.session_state
+    first = app.classify_daily_rows(make_daily_rows(600, seed=8))
+    other = app.classify_daily_rows(make_daily_rows(700, seed=9))
+    engines = []
+    for daily in (first, other):  # 세션마다 처음 실행하는 것처럼 엔진 없이 시작
+        monkeypatch.delitem(state, "daily_sync_engine", raising=False)
+        engine = app.get_daily_sync_engine()
+        assert app.get_daily_sync_engine() is engine
+        _sync(app, engine, daily)
+        engines.append((engine, daily))
+    # 다른 세션이 동기화한 뒤에도 각 세션의 변경분은 증분으로 반영됩니다.
+    for engine, daily in engines:
+        assert engine.synced is daily  # 증분 반영의 전제: 큐브가 이 세션의 목록을 반영
+        merged, (added_count,), delta = app.merge_expense_batches(daily, [make_daily_rows(30, seed=10)])
+        assert _sync(app, engine, merged, delta) == (len(delta[1]), len(delta[2]))
+        assert engine.cube == build_daily_cube(app, merged)
+    monkeypatch.delitem(state, "daily_sync_engine", raising=False)
+
+
+def test_fallback_rules_skip_sync_with_notice(app, monkeypatch):
+    fallback = app.RulePack(app.FALLBACK_RULES, source="내장 최소 규칙", fallback=True)
+    monkeypatch.setitem(app.sync_daily_to_master_auto.__globals__, "RULES", fallback)
+    monkeypatch.setitem(app.st.session_state, "daily_sync_skipped", 0)
+    assert app.sync_daily_to_master_auto() is False
+    assert app.st.session_state["daily_sync_skipped"] == 1
@@ -0,0 +1,55 @@
+"""로컬 저장소(LocalStore)의 일상경비 행 단위 저장과 스키마 이전을 확인합니다."""
+import json
+import sqlite3
+
+import pytest
+
+
+def _row(date, desc, amount, semok="[210-01]일반수용비"):
+    return {"집행일자": date, "적요": desc, "집행금액": float(amount), "세목": semok}
+
+
+def test_replace_daily_writes_only_changed_rows(app, tmp_path):
+    store = app.LocalStore(str(tmp_path / "store.db"))
+    rows = [_row("2026-03-02", "전기요금", 1000), _row("2026-03-01", "복사용지", 500), _row("2026-03-01", "복사용지", 500)]
+    assert store.replace_daily(rows) == (0, 3)
+    assert store.replace_daily(rows) == (0, 0)
+
+    new = _row("2026-03-03", "수도요금", 700)
+    edited = {**rows[0], "세목": "[210-02]공공요금"}
+    after = [new, edited, rows[1]]
+    assert store.replace_daily(after) == (1, 2)
+    assert store.load_daily() == after
+
+
+def test_v1_store_is_migrated_in_order(app, tmp_path):
+    path = str(tmp_path / "store.db")
+    rows = [_row("2026-03-02", "전기요금", 1000), _row("2026-03-01", "복사용지", 500), _row("2026-03-01", "복사용지", 500)]
+    conn = sqlite3.connect(path)
+    conn.executescript(app.LOCAL_DB_SCHEMA[0])
+    conn.executemany("INSERT INTO daily_expenses (pos, exec_date, semok, amount, data) VALUES (?, ?, ?, ?, ?)",
+                     [(i, r["집행일자"], r["세목"], r["집행금액"], json.dumps(r, ensure_ascii=False)) for i, r in enumerate(rows)])
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    store = app.LocalStore(path)
+    assert store.conn().execute("PRAGMA user_version").fetchone()[0] == len(app.LOCAL_DB_SCHEMA)
+    assert store.load_daily() == rows
+
+
+def test_failed_legacy_import_is_retried(app, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "store.db")
+    (tmp_path / "local_daily.json").write_text(json.dumps({"expenses": ["깨진 행"]}), encoding="utf-8")
+    with pytest.raises(AttributeError):
+        app.LocalStore(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+
+    rows = [_row("2026-03-01", "복사용지", 500)]
+    (tmp_path / "local_daily.json").write_text(json.dumps({"expenses": rows}, ensure_ascii=False), encoding="utf-8")
+    store = app.LocalStore(path)
+    assert store.conn().execute("PRAGMA user_version").fetchone()[0] == len(app.LOCAL_DB_SCHEMA)
+    assert store.load_daily() == rows
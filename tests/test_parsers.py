@@ -0,0 +1,59 @@
+"""열 단위(벡터) 엑셀 파서가 예전 행 단위 파서와 같은 결과를 내는지 확인합니다."""
+import time
+
+import pytest
+
+from reference_parsers import (
+    make_synthetic_expense_sheet,
+    make_synthetic_special_sheet,
+    parse_expense_excel_rowwise,
+    parse_special_expense_excel_rowwise,
+)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_expense_parser_matches_rowwise(app, seed):
+    df_raw = make_synthetic_expense_sheet(app, 5000, seed=seed)
+    assert app.parse_expense_excel(df_raw) == parse_expense_excel_rowwise(app, df_raw)
+
+
+def test_expense_parser_headerless_fallback_matches_rowwise(app):
+    # 헤더 행을 떼어 A=지급일자, B=적요, C=지급명령금액 보완 경로를 타게 합니다.
+    df_raw = make_synthetic_expense_sheet(app, 2000, seed=3).iloc[2:, [0, 2, 3]].reset_index(drop=True)
+    df_raw.columns = range(df_raw.shape[1])
+    assert app.parse_expense_excel(df_raw) == parse_expense_excel_rowwise(app, df_raw)
+
+
+def test_expense_parser_benchmark(app):
+    """5만 행 합성 시트에서 결과가 같고 벡터 파서가 더 빠른지 봅니다. (-s 로 실행하면 시간 출력)"""
+    df_raw = make_synthetic_expense_sheet(app, 50000)
+    start = time.perf_counter(); expected = parse_expense_excel_rowwise(app, df_raw)
+    rowwise_sec = time.perf_counter() - start
+    start = time.perf_counter(); actual = app.parse_expense_excel(df_raw)
+    vectorized_sec = time.perf_counter() - start
+    print(f"지출명령 {len(df_raw):,}행 · 행 단위 {rowwise_sec:.2f}초 → 벡터 {vectorized_sec:.2f}초")
+    assert actual == expected
+    assert vectorized_sec < rowwise_sec
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_special_parser_matches_rowwise(app, seed):
+    df_raw = make_synthetic_special_sheet(3000, seed=seed)
+    assert app.parse_special_expense_excel(df_raw) == parse_special_expense_excel_rowwise(app, df_raw)
+
+
+def test_special_parser_without_amount_header_matches_rowwise(app):
+    # 지급액 헤더가 없으면 L열 이후/전체 행의 숫자 후보로 금액을 찾습니다.
+    df_raw = make_synthetic_special_sheet(3000, seed=4).iloc[2:].reset_index(drop=True)
+    assert app.parse_special_expense_excel(df_raw) == parse_special_expense_excel_rowwise(app, df_raw)
+
+
+def test_special_parser_benchmark(app):
+    df_raw = make_synthetic_special_sheet(5000)
+    start = time.perf_counter(); expected = parse_special_expense_excel_rowwise(app, df_raw)
+    rowwise_sec = time.perf_counter() - start
+    start = time.perf_counter(); actual = app.parse_special_expense_excel(df_raw)
+    vectorized_sec = time.perf_counter() - start
+    print(f"5대 용역 {len(df_raw):,}행 · 행 단위 {rowwise_sec:.2f}초 → 벡터 {vectorized_sec:.2f}초")
+    assert actual == expected
+    assert vectorized_sec < rowwise_sec
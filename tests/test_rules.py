@@ -0,0 +1,37 @@
+"""분류 규칙 파일(category_rules.json) 읽기와 최소 규칙 대체를 확인합니다."""
+import json
+import shutil
+
+
+def test_repo_rule_file_is_loaded(app):
+    assert not app.RULES.fallback
+    assert app.RULES.source == app.RULES_FILE_PATH
+    assert app.RULES.budget_mapping and app.RULES.asset_keywords and app.RULES.manual_asset_rows
+
+
+def test_missing_file_uses_fallback_with_error(app, tmp_path):
+    store = app.RuleStore(str(tmp_path / "category_rules.json"))
+    pack, _ = store.refresh()
+    assert pack.fallback and store.error
+    assert app._mapped_category(pack, "2026년 3월 전기요금", "", "") is None
+
+
+def test_invalid_or_partial_file_uses_fallback(app, tmp_path):
+    path = tmp_path / "category_rules.json"
+    for text in ("{ 잘못된 JSON", json.dumps({"version": "x", "budget_mapping": {}})):
+        path.write_text(text, encoding="utf-8")
+        store = app.RuleStore(str(path))
+        pack, _ = store.refresh()
+        assert pack.fallback and store.error
+
+
+def test_broken_edit_keeps_previous_rules(app, tmp_path):
+    path = tmp_path / "category_rules.json"
+    shutil.copy(app.RULES_FILE_PATH, path)
+    store = app.RuleStore(str(path))
+    good, changed = store.refresh()
+    assert changed and not good.fallback and store.error is None
+    path.write_text("{", encoding="utf-8")
+    store.mtime = None  # 같은 시각 안에 다시 쓴 경우도 다시 읽게
+    pack, changed = store.refresh()
+    assert pack is good and not changed and store.error
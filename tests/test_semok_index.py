@@ -0,0 +1,36 @@
+"""세목 표기 색인(SemokIndex)이 현재 행만 따르고, 화면 표시에서는 로컬 저장소에 쓰지 않는지 확인합니다."""
+
+SHORT = "[999-01]잡비"
+LONG = "[999-01]잡비 (지운 행에만 있던 긴 표기)"
+
+
+def _row(semok, desc="복사용지", amount=500):
+    return {"집행일자": "2026-03-01", "적요": desc, "집행금액": float(amount), "세목": semok, "예산과목": ""}
+
+
+def test_deleted_rows_do_not_keep_their_names(app):
+    try:
+        assert app.save_daily_expenses([_row(LONG, "행1"), _row(SHORT, "행2")])
+        assert app.get_semok_index().best("999-01") == LONG
+        # 긴 표기가 있던 행을 지우면 남은 행의 표기만 씁니다.
+        assert app.save_daily_expenses([_row(SHORT, "행2")])
+        assert app.get_semok_index().best("999-01") == SHORT
+        assert app.normalize_semok_rows([_row(SHORT, "행3")], only=[0])[0]["세목"] == SHORT
+
+        assert app.save_daily_expenses([])
+        assert app.get_local_store().get_meta("semok_index") == "{}"
+        assert app.normalize_semok_rows([_row(SHORT, "행4")], only=[0])[0]["세목"] == SHORT
+    finally:
+        app.save_daily_expenses([])
+
+
+def test_view_does_not_write_index(app):
+    store = app.get_local_store()
+    store.set_meta("semok_index", "기록 전")
+    rows = [_row(LONG, "행1"), _row(SHORT, "행2")]
+    view = app.classified_daily(rows)
+    assert [r["세목"] for r in view] == [LONG, LONG]
+    assert store.get_meta("semok_index") == "기록 전"
+    # 다른 목록을 보면 색인도 그 목록만 따릅니다.
+    assert app.classified_daily([_row(SHORT, "행3")])[0]["세목"] == SHORT
+    app.save_daily_expenses([])
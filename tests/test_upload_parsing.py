@@ -0,0 +1,124 @@
+"""여러 시트 워크북의 업로드 파싱이 시트 파싱 프로세스 풀과 순차 경로에서 같은 결과를 내는지 확인합니다."""
+import io
+import multiprocessing
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+from conftest import REPO_ROOT
+from reference_parsers import make_synthetic_expense_sheet, make_synthetic_special_sheet
+
+
+def workbook_bytes(sheets):
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, header=False, index=False)
+    return buf.getvalue()
+
+
+def memo_sheet():
+    return pd.DataFrame([["2026년 지출 현황"], ["담당: 시설팀"], [None], ["비고: 월별 시트 참고"]])
+
+
+@pytest.fixture(scope="module")
+def monkeypatch_module():
+    with pytest.MonkeyPatch.context() as mp:
+        yield mp
+
+
+@pytest.fixture(scope="module")
+def sheet_pool(app, monkeypatch_module):
+    # spawn 워커는 app._parse_sheet_worker 를 이름으로 찾으므로, 테스트용 app 전역을 모듈로 등록합니다.
+    module = types.ModuleType("app")
+    module.__dict__.update(vars(app))
+    monkeypatch_module.setitem(sys.modules, "app", module)
+    monkeypatch_module.syspath_prepend(str(REPO_ROOT))
+    pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.parametrize("kind, sheets", [
+    ("general", lambda app: {"안내": memo_sheet(), "1월": make_synthetic_expense_sheet(app, 1500, seed=5),
+                             "2월": make_synthetic_expense_sheet(app, 1500, seed=6)}),
+    ("general", lambda app: {"안내": memo_sheet(),  # 헤더가 없어 모든 시트를 다시 읽는 경우
+                             "자료": make_synthetic_expense_sheet(app, 1500, seed=7).iloc[2:, [0, 2, 3]]}),
+    ("special", lambda app: {"안내": memo_sheet(), "상반기": make_synthetic_special_sheet(800, seed=1),
+                             "하반기": make_synthetic_special_sheet(1200, seed=2)}),
+])
+def test_pool_matches_sequential(app, sheet_pool, kind, sheets):
+    data = workbook_bytes(sheets(app))
+    parse = app.parse_general_from_uploaded_file if kind == "general" else app.parse_special_from_uploaded_file
+
+    pooled = app.parse_sheets_in_pool(sheet_pool, app.NamedBytesIO(data, "book.xlsx"), kind)
+    assert pooled is not None  # 순차 파싱으로 넘어가지 않고 풀에서 파싱했는지
+    sequential = parse(app.NamedBytesIO(data, "book.xlsx"))
+    assert parse(app.NamedBytesIO(data, "book.xlsx"), pool=sheet_pool) == sequential
+    assert sequential[1]
+
+
+def header_below_sniff_sheet(n_rows=40):
+    """안내 문구 32행 아래에 헤더가 있는 A=지급일자, B=적요, C=지급명령금액 양식 (헤더 없는 양식 보완으로 읽힘)"""
+    notes = [[f"안내 {i + 1}", None, None] for i in range(32)]
+    header = [["지급일자", "적요", "지급명령금액"]]
+    body = [[f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}", ["포충기 조달구매", "CCTV 장비구매", "복사용지"][i % 3], 10000 + i * 10]
+            for i in range(n_rows)]
+    return pd.DataFrame(notes + header + body)
+
+
+@pytest.mark.parametrize("use_pool", [False, True])
+def test_header_below_sniff_rows_still_parses(app, sheet_pool, use_pool):
+    # 첫 시트는 헤더만 있어 sniff 는 통과하지만 자료가 없고, 자료 시트는 헤더가 30행 아래라 sniff 를 통과하지 못합니다.
+    header_only = make_synthetic_expense_sheet(app, 0)
+    sheets = {"양식": header_only, "자료": header_below_sniff_sheet()}
+    data = workbook_bytes(sheets)
+    baseline = next(((name, parsed) for name, df in pd.read_excel(io.BytesIO(data), sheet_name=None, header=None).items()
+                     if (parsed := app.parse_expense_excel(df))), (None, None))
+    assert baseline[0] == "자료" and baseline[1]
+
+    sheet_name, parsed, attempts = app.parse_general_from_uploaded_file(app.NamedBytesIO(data, "book.xlsx"),
+                                                                        pool=sheet_pool if use_pool else None)
+    assert (sheet_name, parsed) == baseline
+    assert [name for name, _ in attempts] == ["양식", "자료"]
+
+
+def test_single_sheet_workbook_stays_sequential(app, sheet_pool):
+    data = workbook_bytes({"1월": make_synthetic_expense_sheet(app, 200)})
+    assert app.parse_sheets_in_pool(sheet_pool, app.NamedBytesIO(data, "book.xlsx"), "general") is None
+
+
+def make_uploads(app, seed):
+    books = [
+        ("1월.xlsx", "general", {"1월": make_synthetic_expense_sheet(app, 600, seed=seed)}),
+        ("용역.xlsx", "special", {"안내": memo_sheet(), "용역": make_synthetic_special_sheet(500, seed=seed)}),
+        ("2월.xlsx", "general", {"안내": memo_sheet(), "2월": make_synthetic_expense_sheet(app, 400, seed=seed + 1)}),
+        ("3월.xlsx", "general", {"3월": make_synthetic_expense_sheet(app, 300, seed=seed + 2)}),
+    ]
+    uploads = []
+    for name, kind, sheets in books:
+        data = workbook_bytes(sheets)
+        uploads.append({"file": name, "kind": kind, "data": data, "hash": app.hashlib.md5(data).hexdigest()})
+    return uploads
+
+
+@pytest.mark.parametrize("use_pool, seed", [(False, 20), (True, 30)])
+def test_batch_keeps_order_and_mixes_cache_hits(app, sheet_pool, use_pool, seed):
+    uploads = make_uploads(app, seed)
+    expected = [app.UPLOAD_PARSERS[up["kind"]][0](app.NamedBytesIO(up["data"], up["file"])) for up in uploads]
+    if use_pool:  # 파일 단위 작업이 워커 프로세스에서 그대로 돌아가는지
+        up = uploads[0]
+        assert sheet_pool.submit(app._parse_upload_file, up["kind"], up["file"], up["data"], app.RULES.stamp).result()[:3] == expected[0]
+    for i in (1, 3):  # 두 파일은 미리 캐시에 넣어 둡니다
+        app.parse_upload_cached(uploads[i]["kind"], app.NamedBytesIO(uploads[i]["data"], uploads[i]["file"]), uploads[i]["hash"])
+
+    results = app.parse_uploads_batch(uploads, pool=sheet_pool if use_pool else None)
+    assert [r["file"] for r in results] == [up["file"] for up in uploads]
+    assert [r["cached"] for r in results] == [False, True, False, True]
+    assert [(r["sheet"], r["rows"], r["attempts"]) for r in results] == [(s, rows, a) for s, rows, a in expected]
+
+    again = app.parse_uploads_batch(uploads, pool=sheet_pool if use_pool else None)
+    assert all(r["cached"] for r in again)
+    assert [r["rows"] for r in again] == [r["rows"] for r in results]